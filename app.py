@@ -1,61 +1,150 @@
 import io
 import base64
-from flask import Flask, make_response, render_template, request, send_file, url_for, redirect, session, flash , send_from_directory
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
+from flask import Flask, Response, make_response, render_template, request, send_file, url_for, redirect, session, flash , send_from_directory
 import os
 from werkzeug.security import generate_password_hash, check_password_hash
 import json
 import uuid
+import hmac
+import shutil
+import tempfile
 from datetime import datetime
-import bcrypt
-
-# Try to load scientific packages for machine learning
-try:
-    import pandas as pd
-    import joblib
-    HAS_ML = True
-except ImportError:
-    HAS_ML = False
+import atexit
+from importlib.util import find_spec
+from storage import open_storage
+from security import PasswordHasher, HasherBusy, LoginThrottle
+from batch_scoring import detect_format, read_rows, rows_per_sec, score_rows, format_results, predict_patients
+from input_schema import PATIENT_SCHEMA, InputError, patient_inputs, parse_patient
+from inference import BatchDispatcher, ParallelPredictor, prediction_pool
+from lite_runtime import LITE_FILE
+from model_registry import ModelRegistry
+from rules import rule_based_predictions
+from prediction_cache import PredictionCache
+from pdf_cache import ReportPdfCache, pdf_key
+from report_pdf import REPORT_PDF_VERSION, build_report_pdf
+from treatment_plans import recommended_path, plan_key, report_for_record
 
 app = Flask(__name__)
 # Secure secret key - uses env variable or generates a secure random one
 app.secret_key = os.environ.get('SECRET_KEY', os.urandom(24))
 
-# Local JSON file storage
+# Storage configuration ('json' files by default, or a shared 'sqlite' database)
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'json')
+SQLITE_PATH = os.environ.get('SQLITE_PATH', 'mindgen.db')
 USERS_FILE = 'users.json'
-RESULTS_FILE = 'results.json'
-
-def read_json(filename):
-    if os.path.exists(filename):
-        with open(filename, 'r') as f:
-            return json.load(f)
-    return []
+RESULTS_FILE = 'results.json'          # legacy single-array format, converted on first start
+RESULTS_LOG_FILE = 'results.jsonl'     # append-only results log (one record per line)
+PLANS_FILE = 'plans.json'              # shared treatment plan text, referenced by plan_key
+ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', 'archive')  # compressed segments of old results
+RESULTS_FSYNC = os.environ.get('RESULTS_FSYNC', 'interval')  # always | interval | never
+# Writes arriving within this window are coalesced into one commit (group commit)
+WRITE_COMMIT_WINDOW_MS = float(os.environ.get('WRITE_COMMIT_WINDOW_MS', '2'))
+
+store = open_storage(STORAGE_BACKEND, USERS_FILE, RESULTS_LOG_FILE, legacy_results_file=RESULTS_FILE,
+                     sqlite_path=SQLITE_PATH, fsync=RESULTS_FSYNC,
+                     commit_window=WRITE_COMMIT_WINDOW_MS / 1000, plans_file=PLANS_FILE,
+                     archive_dir=ARCHIVE_DIR)
+atexit.register(store.close)
+
+# Password hashing runs on a bounded pool so login bursts can't starve other requests
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '12'))
+HASH_WORKERS = int(os.environ.get('HASH_WORKERS', '2'))
+HASH_QUEUE_DEPTH = int(os.environ.get('HASH_QUEUE_DEPTH', '16'))
+hasher = PasswordHasher(workers=HASH_WORKERS, max_queue=HASH_QUEUE_DEPTH, rounds=BCRYPT_ROUNDS)
+
+# Failed login / password reset attempts allowed per username and per client address within the window
+login_throttle = LoginThrottle(max_user_failures=int(os.environ.get('LOGIN_MAX_FAILURES_PER_USER', '5')),
+                               max_ip_failures=int(os.environ.get('LOGIN_MAX_FAILURES_PER_IP', '20')),
+                               window=float(os.environ.get('LOGIN_FAILURE_WINDOW', '60')))
+
+def throttled(template, username):
+    # Checked before any bcrypt work so brute-force traffic stays cheap to turn away
+    retry_after = login_throttle.check(username, request.remote_addr)
+    if retry_after:
+        flash(f'Too many failed attempts. Please try again in {retry_after} seconds.', 'danger')
+        return render_template(template), 429, {'Retry-After': str(retry_after)}
+    return None
+
+# Concurrent /analyze requests are batched into one predict() per model for up to this long
+# (0 disables batching and predicts inline)
+INFERENCE_BATCH_WAIT_MS = float(os.environ.get('INFERENCE_BATCH_WAIT_MS', '2'))
+INFERENCE_MAX_BATCH = int(os.environ.get('INFERENCE_MAX_BATCH', '32'))
+# Without batching, the three models of a request run side by side on this many shared threads
+# (0 runs them one after another)
+INFERENCE_WORKERS = int(os.environ.get('INFERENCE_WORKERS', '3'))
+# Repeat submissions of the same panel reuse earlier predictions (0 entries disables the cache)
+PREDICTION_CACHE_ENTRIES = int(os.environ.get('PREDICTION_CACHE_ENTRIES', '1024'))
+PREDICTION_CACHE_BYTES = int(os.environ.get('PREDICTION_CACHE_BYTES', str(1 << 20)))
+PREDICTION_CACHE_TTL = float(os.environ.get('PREDICTION_CACHE_TTL', '3600'))
+
+# Retrained artifacts dropped into MODEL_DIR are validated and swapped in without a restart
+# (checked every MODEL_RELOAD_INTERVAL seconds; 0 disables reloading)
+MODEL_DIR = os.environ.get('MODEL_DIR', 'backend/models')
+MODEL_RELOAD_INTERVAL = float(os.environ.get('MODEL_RELOAD_INTERVAL', '5'))
+# 'r' memory-maps the numpy arrays of uncompressed artifacts so forked workers share the pages
+MODEL_MMAP_MODE = os.environ.get('MODEL_MMAP_MODE') or None
+# Load the six artifacts on parallel threads; only faster when they are not already in the page cache
+MODEL_CONCURRENT_LOAD = os.environ.get('MODEL_CONCURRENT_LOAD', '0').lower() in ('1', 'true', 'yes')
+# 'auto' serves a matching lite_models.npz export (numpy only, see lite_runtime.py) when present; 'off' never does
+LITE_RUNTIME = os.environ.get('LITE_RUNTIME', 'auto')
+# Generated report PDFs are kept on disk, least recently downloaded evicted first (0 bytes disables the cache)
+REPORT_CACHE_DIR = os.environ.get('REPORT_CACHE_DIR', 'report_cache')
+REPORT_CACHE_BYTES = int(os.environ.get('REPORT_CACHE_BYTES', str(64 << 20)))
+# Rows per vectorized predict() when scoring an uploaded cohort
+BATCH_SCORE_CHUNK_SIZE = int(os.environ.get('BATCH_SCORE_CHUNK_SIZE', '1000'))
+
+# Internal services call /api/v1/analyze with "Authorization: Bearer <token>".
+# API_TOKENS is a comma-separated list of name:token pairs; with none configured the API is closed.
+API_TOKENS = {token: name for name, _, token in
+              (entry.strip().partition(':') for entry in os.environ.get('API_TOKENS', '').split(',')) if token}
+# Which registered users each service may save assessments for: comma-separated name:username pairs, with
+# name:* for any registered user. A service with no entry can only call the API with ?persist=0.
+API_TOKEN_USERS = {(name, username) for name, _, username in
+                   (entry.strip().partition(':') for entry in os.environ.get('API_TOKEN_USERS', '').split(','))
+                   if username}
+API_MAX_PATIENTS = int(os.environ.get('API_MAX_PATIENTS', '1000'))
+# /metrics needs one of the API tokens too, unless it is explicitly made public (e.g. behind a private network)
+METRICS_PUBLIC = os.environ.get('METRICS_PUBLIC', '0').lower() in ('1', 'true', 'yes')
+
+# Models can be loaded with joblib, or from a lite export with nothing but numpy
+HAS_ML = find_spec('joblib') is not None or (
+    LITE_RUNTIME != 'off' and os.path.exists(os.path.join(MODEL_DIR, LITE_FILE)))
+
+report_cache = ReportPdfCache(REPORT_CACHE_DIR, REPORT_CACHE_BYTES) if REPORT_CACHE_BYTES > 0 else None
+
+prediction_executor = prediction_pool(INFERENCE_WORKERS) if INFERENCE_BATCH_WAIT_MS <= 0 else None
+
+
+def make_runner(models):
+    if INFERENCE_BATCH_WAIT_MS > 0:
+        return BatchDispatcher(models, max_wait=INFERENCE_BATCH_WAIT_MS / 1000, max_batch=INFERENCE_MAX_BATCH)
+    return ParallelPredictor(models, workers=INFERENCE_WORKERS, executor=prediction_executor)
 
-def write_json(filename, data):
-    with open(filename, 'w') as f:
-        json.dump(data, f, indent=4)
 
 # Load models and metadata at startup
-HAS_MODELS = False
+registry = None
+prediction_cache = None
 if HAS_ML:
+    registry = ModelRegistry(MODEL_DIR, make_runner, interval=MODEL_RELOAD_INTERVAL, mmap_mode=MODEL_MMAP_MODE,
+                             lite=LITE_RUNTIME, concurrent_load=MODEL_CONCURRENT_LOAD)
     try:
-        depression_model = joblib.load("backend/models/DepressionModel.joblib")
-        depression_encoder = joblib.load("backend/models/DepressionEncoder.joblib")
-        BD_model = joblib.load("backend/models/BDModel.joblib")
-        BD_label_encoder = joblib.load("backend/models/BD_label_encoder.joblib")
-        anxiety_model = joblib.load("backend/models/AnxietyModel.joblib")
-        anxiety_metadata = joblib.load("backend/models/AnxietyMetadata.joblib")
-        anxiety_columns = anxiety_metadata['columns']
-        anxiety_mappings = anxiety_metadata['category_mappings']
-        HAS_MODELS = True
-        print("Machine learning models loaded successfully!")
+        registry.load()
+        print(f"Machine learning models loaded successfully! (version {registry.active.version}, "
+              f"{registry.active.runtime} runtime, "
+              f"{registry.active.load_seconds:.2f}s load, {registry.active.warmup_seconds:.2f}s warm-up)")
     except Exception as e:
         print(f"Error loading models: {str(e)}. Falling back to pure Python clinical rules.")
+    registry.start()
+    if PREDICTION_CACHE_ENTRIES > 0:
+        prediction_cache = PredictionCache(max_entries=PREDICTION_CACHE_ENTRIES, max_bytes=PREDICTION_CACHE_BYTES,
+                                           ttl=PREDICTION_CACHE_TTL)
 else:
-    print("Pandas/Joblib missing. Running in rule-based fallback mode.")
+    print("Joblib missing and no lite model export. Running in rule-based fallback mode.")
+
+
+def active_bundle():
+    """The models serving right now (a hot reload may have replaced or first provided them), or None for rules."""
+    return registry.active if registry is not None else None
 
 
 @app.route('/')
@@ -63,6 +152,58 @@ def home():
     return render_template('index.html')
 
 
+@app.route('/metrics')
+def metrics():
+    # Internal cache and performance counters (no patient data, but user counts and model versions)
+    if not METRICS_PUBLIC and api_client() is None:
+        return {'error': 'A valid API token is required.'}, 401, {'WWW-Authenticate': 'Bearer'}
+    bundle = active_bundle()
+    runner = bundle.runner if bundle is not None else None
+    return {
+        'storage': store.stats(),
+        'password_hashing': hasher.stats(),
+        'login_throttle': login_throttle.stats(),
+        'models': registry.stats() if registry is not None else None,
+        'inference_batching': runner.stats if isinstance(runner, BatchDispatcher) else None,
+        'inference_timing': runner.stats() if isinstance(runner, ParallelPredictor) else None,
+        'prediction_cache': prediction_cache.stats() if prediction_cache is not None else None,
+        'report_pdf_cache': report_cache.stats() if report_cache is not None else None,
+    }
+
+
+def model_status():
+    bundle = active_bundle()
+    # Artifacts on disk that could not be loaded leave this instance serving the rule-based fallback
+    expected = registry is not None and all(os.path.exists(path) for path in registry.paths.values())
+    status = {
+        'mode': 'ml' if bundle is not None else 'rules',
+        'has_models': bundle is not None,
+        'ready': bundle is not None or not expected,
+    }
+    # The probes are unauthenticated: model versions, load times and errors only go to /metrics token holders
+    if registry is not None and (METRICS_PUBLIC or api_client() is not None):
+        status['models'] = registry.stats()
+    return status
+
+
+@app.route('/healthz')
+def healthz():
+    # Liveness: the process is up and answering
+    return {'status': 'ok', **model_status()}
+
+
+@app.route('/readyz')
+def readyz():
+    # Readiness: models are loaded and warmed, or there are none to load and the rule-based fallback is intended
+    status = model_status()
+    return status, 200 if status['ready'] else 503
+
+
+@app.errorhandler(HasherBusy)
+def hasher_busy(e):
+    return 'The server is busy, please try again in a moment.', 503, {'Retry-After': '1'}
+
+
 @app.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
@@ -77,26 +218,32 @@ def register():
             flash('Passwords do not match', 'danger')
             return redirect(url_for('register'))
             
-        users = read_json(USERS_FILE)
-        existing_user = next((user for user in users if user['username'] == username), None)
+        existing_user = store.get_user(username)
         if existing_user:
             flash('Username already exists', 'danger')
             return redirect(url_for('register'))
+
+        # API service names are reserved so that no account can be mistaken for a service
+        if username in API_TOKENS.values():
+            flash('Username is reserved', 'danger')
+            return redirect(url_for('register'))
             
-        hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
-        hashed_security_answer = bcrypt.hashpw(security_answer.encode('utf-8'), bcrypt.gensalt())
+        hashed_password = hasher.hash(password)
+        hashed_security_answer = hasher.hash(security_answer)
         
-        users.append({
+        added = store.add_user({
             'id': str(uuid.uuid4()),
             'name': name,
             'username': username,
-            'password': hashed_password.decode('utf-8'),
+            'password': hashed_password,
             'security_question': security_question,
-            'security_answer': hashed_security_answer.decode('utf-8'),
+            'security_answer': hashed_security_answer,
             'created_at': datetime.utcnow().isoformat()
         })
+        if not added:
+            flash('Username already exists', 'danger')
+            return redirect(url_for('register'))
         
-        write_json(USERS_FILE, users)
         flash('Registration successful! Please log in.', 'success')
         return redirect(url_for('login'))
         
@@ -112,10 +259,21 @@ def login():
             flash('Invalid login attempt.', 'danger')
             return redirect(url_for('login'))
 
-        users = read_json(USERS_FILE)
-        user = next((user for user in users if user['username'] == username), None)
+        rejected = throttled('login.html', username)
+        if rejected:
+            return rejected
+
+        user = store.get_user(username)
         if user:
-            if bcrypt.checkpw(password.encode('utf-8'), user['password'].encode('utf-8')):
+            if hasher.verify(password, user['password']):
+                login_throttle.record_success(username)
+                # Upgrade hashes made with a different work factor while we have the plaintext
+                if hasher.needs_rehash(user['password']):
+                    try:
+                        user['password'] = hasher.hash(password)
+                        store.update_user(user)
+                    except HasherBusy:
+                        pass  # try again on a later login
                 session['username'] = username
                 session['user_id'] = user['id']
                 flash('Login successful!', 'success')
@@ -124,6 +282,7 @@ def login():
                 flash('Invalid username or password.', 'danger')
         else:
             flash('Invalid username or password.', 'danger')
+        login_throttle.record_failure(username, request.remote_addr)
         return redirect(url_for('login'))
 
     return render_template('login.html')
@@ -146,55 +305,117 @@ def forgotpass():
         if new_password != confirm_password:
             flash('Passwords do not match!', 'danger')
             return redirect(url_for('forgotpass'))
+
+        rejected = throttled('forgotpass.html', username)
+        if rejected:
+            return rejected
             
-        users = read_json(USERS_FILE)
-        user = next((user for user in users if user['username'] == username), None)
+        user = store.get_user(username)
         if user:
             stored_answer = user['security_answer']
             is_hashed = stored_answer.startswith('$2a$') or stored_answer.startswith('$2b$')
             
             if is_hashed:
-                answer_correct = bcrypt.checkpw(security_answer.encode('utf-8'), stored_answer.encode('utf-8'))
+                answer_correct = hasher.verify(security_answer, stored_answer)
             else:
                 answer_correct = (security_answer == stored_answer)
                 
             if answer_correct:
-                hashed_password = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt())
-                user['password'] = hashed_password.decode('utf-8')
-                
-                # Update user in the list
-                for i, u in enumerate(users):
-                    if u['username'] == username:
-                        users[i] = user
-                        break
-                
-                write_json(USERS_FILE, users)
+                login_throttle.record_success(username)
+                user['password'] = hasher.hash(new_password)
+                store.update_user(user)
                 flash('Password updated successfully! Please log in.', 'success')
                 return redirect(url_for('login'))
             else:
                 flash('Security answer incorrect.', 'danger')
         else:
             flash('Username not found.', 'danger')
+        login_throttle.record_failure(username, request.remote_addr)
         return redirect(url_for('forgotpass'))
     return render_template('forgotpass.html')
 
+# History pagination (keyset cursor = timestamp|id of the last report on the previous page)
+HISTORY_PAGE_SIZE = 20
+MAX_HISTORY_PAGE_SIZE = 100
+HISTORY_FIELDS = ('id', 'timestamp', 'Depression', 'BipolarDisorder', 'Anxiety')
+
+def parse_history_cursor():
+    before = request.args.get('before')
+    cursor = tuple(before.split('|', 1)) if before and '|' in before else None
+    try:
+        limit = int(request.args.get('limit', HISTORY_PAGE_SIZE))
+    except ValueError:
+        limit = HISTORY_PAGE_SIZE
+    return cursor, max(1, min(limit, MAX_HISTORY_PAGE_SIZE))
+
+def format_history_cursor(cursor):
+    return '|'.join(cursor) if cursor else None
+
 @app.route('/previous_reports')
 def previous_reports():
     if 'user_id' not in session:
         flash('Please log in to view reports.', 'warning')
         return redirect(url_for('login'))
     
-    # Get all reports for current user
-    results = read_json(RESULTS_FILE)
-    reports = [r for r in results if r['username'] == session['username']]
+    # Get one page of reports for current user (newest first)
+    before, limit = parse_history_cursor()
+    reports, next_cursor = store.user_results_page(session['username'], before, limit)
     
-    # Convert timestamp strings to datetime objects for sorting
+    # Convert timestamp strings to datetime objects for display
     for report in reports:
         report['timestamp'] = datetime.fromisoformat(report['timestamp'])
     
-    reports.sort(key=lambda x: x['timestamp'], reverse=True)
-    
-    return render_template('previous_reports.html', reports=reports)
+    return render_template('previous_reports.html', reports=reports, limit=limit,
+                           next_cursor=format_history_cursor(next_cursor), is_first_page=before is None)
+
+@app.route('/api/history')
+def api_history():
+    if 'user_id' not in session:
+        return {'error': 'Please log in to view reports.'}, 401
+
+    before, limit = parse_history_cursor()
+    reports, next_cursor = store.user_results_page(session['username'], before, limit)
+    return {
+        'reports': [{field: report[field] for field in HISTORY_FIELDS} for report in reports],
+        'next_cursor': format_history_cursor(next_cursor),
+    }
+
+
+@app.route('/api/batch_score', methods=['POST'])
+def api_batch_score():
+    # Scores an uploaded CSV/JSONL cohort chunk by chunk and streams the results back; nothing is stored
+    if 'user_id' not in session:
+        return {'error': 'Please log in to score cohorts.'}, 401
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        return {'error': "Upload a CSV or JSONL file in the 'file' field."}, 400
+    input_format = request.form.get('format') or detect_format(upload.filename)
+    output_format = request.args.get('output', 'jsonl')
+    if input_format not in ('csv', 'jsonl') or output_format not in ('csv', 'jsonl'):
+        return {'error': "Formats must be 'csv' or 'jsonl'."}, 400
+
+    username = session['username']
+    bundle = active_bundle()
+    # The upload is closed when the view returns, before the response is streamed: keep our own spooled copy
+    spooled = tempfile.TemporaryFile()
+    shutil.copyfileobj(upload.stream, spooled)
+    spooled.seek(0)
+    stats = {}
+
+    def generate():
+        with io.TextIOWrapper(spooled, encoding='utf-8', newline='') as stream:
+            results = score_rows(read_rows(stream, input_format), bundle, BATCH_SCORE_CHUNK_SIZE, stats)
+            yield from format_results(results, output_format)
+        print(f"Batch scoring for {username}: {stats['rows']} rows ({stats['errors']} errors) "
+              f"in {stats['seconds']:.2f}s, {rows_per_sec(stats)} rows/sec")
+        if output_format == 'jsonl':
+            yield json.dumps({'summary': {'rows': stats['rows'], 'errors': stats['errors'],
+                                          'seconds': round(stats['seconds'], 3),
+                                          'rows_per_sec': rows_per_sec(stats)}}) + '\n'
+
+    mimetype = 'text/csv' if output_format == 'csv' else 'application/x-ndjson'
+    return Response(generate(), mimetype=mimetype)
+
 
 @app.route('/view_report/<report_id>')
 def view_report(report_id):
@@ -203,8 +424,7 @@ def view_report(report_id):
         return redirect(url_for('login'))
     
     try:
-        results = read_json(RESULTS_FILE)
-        report = next((r for r in results if r['id'] == report_id and r['username'] == session['username']), None)
+        report = store.get_result(report_id, session['username'])
         
         if not report:
             flash('Report not found or you dont have access', 'danger')
@@ -215,7 +435,7 @@ def view_report(report_id):
             "Depression": report['Depression'],
             "BipolarDisorder": report['BipolarDisorder'],
             "Anxiety": report['Anxiety'],
-            "Report": report['Report'],
+            "Plan": report_for_record(report),
             "timestamp": datetime.fromisoformat(report['timestamp'])
         }
         
@@ -232,6 +452,34 @@ def dashboard():
         return redirect(url_for('login'))
     return render_template('dashboard.html')
 
+def assessment_record(username, predictions, model_version):
+    """A new assessment, with its treatment plan, for {'depression', 'bipolar', 'anxiety'} labels."""
+    depression_pred, bipolar_pred, anxiety_pred = (predictions['depression'], predictions['bipolar'],
+                                                   predictions['anxiety'])
+    return {
+        'id': str(uuid.uuid4()),
+        'username': username,
+        'timestamp': datetime.utcnow().isoformat(),
+        'Depression': depression_pred,
+        'BipolarDisorder': bipolar_pred,
+        'Anxiety': anxiety_pred,
+        'plan_key': plan_key(depression_pred, bipolar_pred, anxiety_pred),
+        'model_version': model_version,
+        'Report': recommended_path(depression_pred, bipolar_pred, anxiety_pred),
+    }
+
+
+def predict_disorders(bundle, model_inputs):
+    """{'depression', 'bipolar', 'anxiety'} labels for one patient."""
+    if bundle is None:
+        # Rule-based Clinical Fallback System (handles missing model setups)
+        return rule_based_predictions(model_inputs)
+    # Batched with concurrent requests if enabled, otherwise the three models run side by side
+    if prediction_cache is not None:
+        return prediction_cache.predict_all(bundle, model_inputs)
+    return bundle.predict_all(model_inputs)
+
+
 @app.route('/analyze', methods=['GET', 'POST'])
 def analyze():
     if 'user_id' not in session:
@@ -240,174 +488,31 @@ def analyze():
     if request.method == 'POST':
         try:
             # Collect all inputs from the form
-            shared_inputs = {
-                "Age": int(request.form['age']),
-                "SleepDuration": float(request.form['sleep_duration']),
-                "Cortisol": float(request.form['cortisol']),
-                "Vitamin_D": float(request.form['vitamin_d'])
-            }
-
-            # Depression inputs
-            depression_input = {
-                **shared_inputs,
-                "Genotype_5HTTLPR": request.form['genotype_5httlpr'],
-                "Genotype_COMT": request.form['genotype_comt'],
-                "Genotype_MAOA": request.form['genotype_maoa'],
-                "BDNF_Level": float(request.form['bdnf_level']),
-                "CRP": float(request.form['crp']),
-                "Tryptophan": float(request.form['tryptophan']),
-                "Omega3_Index": float(request.form['omega3_index']),
-                "MTHFR_Genotype": request.form['mthfr_genotype'],
-                "Neuroinflammation_Score": float(request.form['neuroinflammation_score']),
-                "Monoamine_Oxidase_Level": float(request.form['mao_level']),
-                "Serotonin_Level": float(request.form['serotonin_level']),
-                "HPA_Axis_Dysregulation": float(request.form['hpa_dysregulation']),
-                "DepressionScore_PHQ9": int(request.form['phq9_score'])
-            }
-
-            # Bipolar inputs
-            bipolar_input = {
-                "Age": shared_inputs["Age"],
-                "Sex": request.form['sex'],
-                "Family_History": request.form['family_history'],
-                "ANK3_rs10994336": request.form['ank3_rs10994336'],
-                "CACNA1C_rs1006737": request.form['cacna1c_rs1006737'],
-                "ODZ4_rs12576775": request.form['odz4_rs12576775'],
-                "Glutamate_Level": request.form['glutamate_level'],
-                "Tryptophan_Metabolites": request.form['tryptophan_metabolites'],
-                "Cortisol_Level": request.form['cortisol_level'],
-                "Circadian_Gene_Disruption": request.form['circadian_gene_disruption'],
-                "Mitochondrial_Dysfunction": request.form['mitochondrial_dysfunction'],
-                "Neuroinflammation": request.form['neuroinflammation'],
-                "Omega3_Intake": request.form['omega3_intake'],
-                "Folate_Level": request.form['folate_level'],
-                "VitaminD_Level": request.form['vitamind_level'],
-                "Average_Sleep_Hours": float(shared_inputs["SleepDuration"]),
-                "Physical_Activity_Level": request.form['physical_activity']
-            }
+            model_inputs = patient_inputs(request.form)
 
-            anxiety_input = {
-                "Age": shared_inputs["Age"],
-                "SleepDuration": shared_inputs["SleepDuration"],
-                "Genotype_5HTTLPR": request.form['genotype_5httlpr'],
-                "Genotype_COMT": request.form['genotype_comt'],
-                "Genotype_MAOA": request.form['genotype_maoa'],
-                "Cortisol": shared_inputs["Cortisol"],
-                "Alpha_Amylase": float(request.form['alpha_amylase']),
-                "HRV (Heart Rate Variability)": float(request.form['HRV']),
-                "GABA": float(request.form['gaba']),
-                "IL6": float(request.form['IL6']), 
-                "TNF_alpha": float(request.form['TNF_alpha']),
-                "Tryptophan": float(request.form['tryptophan']),
-                "Vitamin_B6": float(request.form['Vitamin_B6']), 
-                "Omega3_Index": float(request.form['omega3_index']),
-                "HPA_Axis_Dysregulation": float(request.form['hpa_dysregulation']),
-                "Sympathetic_Activation_Score": float(request.form['Sympathetic_Activation_Score']), 
-                "GABAergic_Function_Score": float(request.form['gaba_function']),
-                "AnxietyScore_GAD7": int(request.form['anxiety_score'])
-            }
+            # Check if models are loaded successfully (one bundle for the whole request, even across a reload)
+            bundle = active_bundle()
+            predictions = predict_disorders(bundle, model_inputs)
+            record = assessment_record(session['username'], predictions,
+                                       bundle.version if bundle is not None else 'rules')
 
-            # Check if models are loaded successfully
-            if HAS_MODELS:
-                # 1. Anxiety prediction (with enforced columns)
-                anxiety_df = pd.DataFrame([anxiety_input], columns=anxiety_columns)
-                anxiety_pred_code = anxiety_model.predict(anxiety_df)[0]
-                anxiety_pred = anxiety_mappings['AnxietyDiagnosis'][anxiety_pred_code]
-
-                # 2. Depression prediction (enforces columns to fix potential key ordering mismatches)
-                depression_cols = ["Age", "SleepDuration", "Cortisol", "Vitamin_D", "Genotype_5HTTLPR", 
-                                   "Genotype_COMT", "Genotype_MAOA", "BDNF_Level", "CRP", "Tryptophan", 
-                                   "Omega3_Index", "MTHFR_Genotype", "Neuroinflammation_Score", 
-                                   "Monoamine_Oxidase_Level", "Serotonin_Level", "HPA_Axis_Dysregulation", 
-                                   "DepressionScore_PHQ9"]
-                depression_df = pd.DataFrame([depression_input], columns=depression_cols)
-                depression_pred = depression_encoder.inverse_transform(
-                    depression_model.predict(depression_df)
-                )[0]
-
-                # 3. Bipolar prediction (enforces columns to fix potential key ordering mismatches)
-                bipolar_cols = ["Age", "Sex", "Family_History", "ANK3_rs10994336", "CACNA1C_rs1006737", 
-                                "ODZ4_rs12576775", "Glutamate_Level", "Tryptophan_Metabolites", "Cortisol_Level", 
-                                "Circadian_Gene_Disruption", "Mitochondrial_Dysfunction", "Neuroinflammation", 
-                                "Omega3_Intake", "Folate_Level", "VitaminD_Level", "Average_Sleep_Hours", 
-                                "Physical_Activity_Level"]
-                bipolar_df = pd.DataFrame([bipolar_input], columns=bipolar_cols)
-                bipolar_pred = BD_label_encoder.inverse_transform(
-                    BD_model.predict(bipolar_df)
-                )[0]
-            else:
-                # Rule-based Clinical Fallback System (handles missing model setups)
-                phq9 = depression_input.get("DepressionScore_PHQ9", 0)
-                gad7 = anxiety_input.get("AnxietyScore_GAD7", 0)
-                
-                # Depression subtype classification
-                if phq9 >= 20:
-                    depression_pred = "Psychotic Depression"
-                elif phq9 >= 15:
-                    depression_pred = "Major Depressive Disorder"
-                elif phq9 >= 10:
-                    if depression_input.get("Genotype_5HTTLPR") == "S/S":
-                        depression_pred = "Persistent Depressive Disorder"
-                    else:
-                        depression_pred = "Seasonal Affective Disorder"
-                elif phq9 >= 5:
-                    depression_pred = "Atypical Depression"
-                else:
-                    depression_pred = "False"
-                    
-                # Bipolar disorder classification
-                family_history = bipolar_input.get("Family_History", "No")
-                sleep_hours = bipolar_input.get("Average_Sleep_Hours", 7.0)
-                if family_history == "Yes" and sleep_hours < 5.0:
-                    bipolar_pred = "BD-I"
-                elif sleep_hours < 6.0:
-                    bipolar_pred = "BD-II"
-                elif sleep_hours > 9.0:
-                    bipolar_pred = "Cyclothymia"
-                else:
-                    bipolar_pred = "False"
-                    
-                # Anxiety classification
-                if gad7 >= 15:
-                    anxiety_pred = "Panic Disorder"
-                elif gad7 >= 10:
-                    anxiety_pred = "Generalized Anxiety Disorder"
-                elif gad7 >= 5:
-                    if anxiety_input.get("Genotype_COMT") == "Met/Met":
-                        anxiety_pred = "Social Anxiety Disorder"
-                    else:
-                        anxiety_pred = "Specific Phobia"
-                else:
-                    anxiety_pred = "False"
-
-            # Generate report
-            report = recommended_path(depression_pred, bipolar_pred, anxiety_pred)
-            report_id = str(uuid.uuid4())
-            
-            # Store results in session (includes id for download link mapping)
+            # Store results in session (includes id for download link mapping; /results reads the plan from storage)
             session['results'] = {
-                "id": report_id,
-                "Depression": depression_pred,
-                "BipolarDisorder": bipolar_pred,
-                "Anxiety": anxiety_pred,
-                "Report": report
+                "id": record['id'],
+                "Depression": record['Depression'],
+                "BipolarDisorder": record['BipolarDisorder'],
+                "Anxiety": record['Anxiety'],
             }
 
-            # Save results to JSON file
-            results = read_json(RESULTS_FILE)
-            results.append({
-                'id': report_id,
-                'username': session['username'],
-                'timestamp': datetime.utcnow().isoformat(),
-                'Depression': depression_pred,
-                'BipolarDisorder': bipolar_pred,
-                'Anxiety': anxiety_pred,
-                'Report': report
-            })
-            write_json(RESULTS_FILE, results)
-                        
+            # Save results to storage
+            store.add_result(record)
+
             return redirect(url_for('results'))
             
+        except InputError as e:
+            for name, message in e.errors.items():
+                flash(f"{PATIENT_SCHEMA.labels.get(name, name)} {message}.", "error")
+            return redirect(url_for('analyze'))
         except Exception as e:
             flash(f"Error processing your data: {str(e)}", "error")
             import traceback
@@ -416,27 +521,117 @@ def analyze():
     
     return render_template('analysis.html')
 
+
+def api_client():
+    """Name of the service presenting a valid bearer token, or None."""
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        return None
+    token = token.strip().encode('utf-8')
+    for known, name in API_TOKENS.items():
+        if hmac.compare_digest(known.encode('utf-8'), token):
+            return name
+    return None
+
+
+def may_write_for(client, username):
+    """Whether the service `client` may save assessments into `username`'s history (see API_TOKEN_USERS)."""
+    return (client, '*') in API_TOKEN_USERS or (client, username) in API_TOKEN_USERS
+
+
+@app.route('/api/v1/analyze', methods=['POST'])
+def api_analyze():
+    # JSON counterpart of /analyze for internal services: one patient object or an array of them, answered
+    # directly. Unless ?persist=0, every patient needs the 'username' of a registered user the service may
+    # write for (API_TOKEN_USERS), and the assessment is saved in that user's history.
+    client = api_client()
+    if client is None:
+        return {'error': 'A valid API token is required.'}, 401, {'WWW-Authenticate': 'Bearer'}
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, (dict, list)):
+        return {'error': 'Expected a JSON object or an array of patient objects.'}, 400
+    patients = payload if isinstance(payload, list) else [payload]
+    if len(patients) > API_MAX_PATIENTS:
+        return {'error': f'At most {API_MAX_PATIENTS} patients per request.'}, 413
+    persist = request.args.get('persist', '1').lower() not in ('0', 'false', 'no')
+
+    bundle = active_bundle()
+    version = bundle.version if bundle is not None else 'rules'
+    results, valid = [], []
+    status = 200        # for a single patient object: 400 bad input, 403 not allowed, 500 prediction failed
+    for patient in patients:
+        inputs, error = parse_patient(patient)
+        result = {'id': patient.get('id') if isinstance(patient, dict) else None}
+        owner = patient.get('username') if isinstance(patient, dict) else None
+        if error is not None:
+            result['error'] = f'invalid input: {error}'
+            result['fields'] = error.errors
+            status = 400
+        elif owner is not None and not isinstance(owner, str):
+            result['error'] = "'username' must be a string"
+            status = 400
+        elif persist and not owner:
+            result['error'] = "'username' is required to save the assessment (or use ?persist=0)"
+            status = 400
+        elif persist and (not may_write_for(client, owner) or store.get_user(owner) is None):
+            # Unknown and not-permitted usernames get the same answer, so usernames cannot be probed
+            result['error'] = f"cannot save assessments for '{owner}'"
+            status = 403
+        else:
+            valid.append((result, inputs, owner))
+        results.append(result)
+
+    if len(valid) == 1:
+        try:
+            predictions = [predict_disorders(bundle, valid[0][1])]
+        except Exception as e:
+            predictions = [e]
+    else:
+        predictions = predict_patients(bundle, [inputs for _, inputs, _ in valid]) if valid else []
+
+    records = []
+    for (result, _, owner), prediction in zip(valid, predictions):
+        if isinstance(prediction, Exception):
+            print(f"API prediction failed for {client}: {prediction}")
+            result['error'] = f'prediction failed: {prediction}'
+            status = 500
+            continue
+        result.update({
+            'Depression': prediction['depression'],
+            'BipolarDisorder': prediction['bipolar'],
+            'Anxiety': prediction['anxiety'],
+            'plan_key': plan_key(prediction['depression'], prediction['bipolar'], prediction['anxiety']),
+            'model_version': version,
+        })
+        if persist:
+            record = assessment_record(owner, prediction, version)
+            result['report_id'] = record['id']
+            records.append(record)
+    if records:
+        store.add_results(records)
+
+    if isinstance(payload, dict):
+        return results[0], status
+    return {'results': results, 'model_version': version}
+
 @app.route('/results')
 def results():
     if 'username' not in session:
         return redirect(url_for('login'))
     
-    results_data = read_json(RESULTS_FILE)
-    user_results = [r for r in results_data if r['username'] == session['username']]
-    user_results.sort(key=lambda x: x['timestamp'], reverse=True)
+    latest_result = store.latest_result(session['username'])
     
-    if not user_results:
+    if not latest_result:
         flash('No available data!', 'info')
         return render_template('output.html', results=None)
     
     # Display the latest report
-    latest_result = user_results[0]
     results_data = {
         "id": latest_result['id'],
         "Depression": latest_result['Depression'],
         "BipolarDisorder": latest_result['BipolarDisorder'],
         "Anxiety": latest_result['Anxiety'],
-        "Report": latest_result['Report'],
+        "Plan": report_for_record(latest_result),
         "timestamp": datetime.fromisoformat(latest_result['timestamp'])
     }
 
@@ -447,756 +642,37 @@ def download_report(report_id):
     if 'user_id' not in session:
         return redirect(url_for('login'))
     
-    # Fetch report from local JSON storage
-    results_data = read_json(RESULTS_FILE)
-    report = next((r for r in results_data if r['id'] == report_id and r['username'] == session['username']), None)
+    # Fetch report from storage
+    report = store.get_result(report_id, session['username'])
     
     if not report:
         flash('Report not found or access denied', 'danger')
         return redirect(url_for('previous_reports'))
     
-    from reportlab.lib.colors import HexColor
-    from reportlab.lib.styles import ParagraphStyle
-    from reportlab.platypus import Table, TableStyle
-    
-    # Create PDF report
-    buffer = io.BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=letter, rightMargin=54, leftMargin=54, topMargin=54, bottomMargin=54)
-    styles = getSampleStyleSheet()
-    story = []
-    
-    # Document Style Definitions
-    title_style = ParagraphStyle(
-        'DocTitle',
-        parent=styles['Normal'],
-        fontName='Helvetica-Bold',
-        fontSize=20,
-        leading=24,
-        textColor=HexColor('#0f172a'),
-        spaceAfter=4
-    )
-    subtitle_style = ParagraphStyle(
-        'DocSub',
-        parent=styles['Normal'],
-        fontName='Helvetica',
-        fontSize=9,
-        leading=13,
-        textColor=HexColor('#64748b'),
-        spaceAfter=12
-    )
-    section_title_style = ParagraphStyle(
-        'SectionTitle',
-        parent=styles['Normal'],
-        fontName='Helvetica-Bold',
-        fontSize=12,
-        leading=15,
-        textColor=HexColor('#1e3a8a'),
-        spaceBefore=14,
-        spaceAfter=8
-    )
-    body_style = ParagraphStyle(
-        'DocBody',
-        parent=styles['Normal'],
-        fontName='Helvetica',
-        fontSize=9,
-        leading=13,
-        textColor=HexColor('#334155'),
-        spaceAfter=4
-    )
-    bullet_style = ParagraphStyle(
-        'DocBullet',
-        parent=styles['Normal'],
-        fontName='Helvetica',
-        fontSize=9,
-        leading=13,
-        textColor=HexColor('#334155'),
-        leftIndent=15,
-        firstLineIndent=-10,
-        spaceAfter=3
-    )
-
     # Retrieve user's full name
-    users_data = read_json(USERS_FILE)
-    user_dict = next((u for u in users_data if u['username'] == report['username']), {})
+    user_dict = store.get_user(report['username']) or {}
     patient_name = user_dict.get('name', report['username'])
 
-    # Document Header Grid (2 columns: left patient details, right report tracking details)
-    header_data = [
-        [Paragraph(f"<b>Patient Name:</b> {patient_name}", body_style), Paragraph(f"<b>Date:</b> {datetime.utcnow().strftime('%Y-%m-%d')}", body_style)],
-        [Paragraph(f"<b>Username:</b> {report['username']}", body_style), Paragraph(f"<b>Assessment UUID:</b> {report['id'][:18]}...", body_style)],
-        [Paragraph(f"<b>Platform:</b> MindGen AI® Portal", body_style), Paragraph("<b>Status:</b> Completed / Verified", body_style)]
-    ]
-    header_table = Table(header_data, colWidths=[250, 254])
-    header_table.setStyle(TableStyle([
-        ('ALIGN', (0,0), (-1,-1), 'LEFT'),
-        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-        ('TOPPADDING', (0,0), (-1,-1), 2),
-        ('BOTTOMPADDING', (0,0), (-1,-1), 2),
-    ]))
-
-    story.append(Paragraph("MINDGEN AI® Assessment Report", title_style))
-    story.append(Spacer(1, 4))
-    story.append(header_table)
-    story.append(Spacer(1, 8))
-    
-    # Separator Line
-    t_sep = Table([['']], colWidths=[504], rowHeights=[1])
-    t_sep.setStyle(TableStyle([
-        ('LINEABOVE', (0,0), (-1,-1), 1, HexColor('#cbd5e1'))
-    ]))
-    story.append(t_sep)
-    story.append(Spacer(1, 10))
-    
-    # Section: Diagnostic Risk Summary
-    story.append(Paragraph("Diagnostic Risk Summary", section_title_style))
-    
-    # Define conditional styles for risk cells
-    risk_positive_style = ParagraphStyle(
-        'RiskPositive',
-        parent=body_style,
-        fontName='Helvetica-Bold',
-        textColor=HexColor('#b91c1c') # Dark red
-    )
-    risk_negative_style = ParagraphStyle(
-        'RiskNegative',
-        parent=body_style,
-        textColor=HexColor('#15803d') # Dark green
-    )
-    
-    dep_text = report['Depression']
-    bp_text = report['BipolarDisorder']
-    anx_text = report['Anxiety']
-
-    dep_p = Paragraph(dep_text, risk_positive_style) if dep_text != 'False' else Paragraph('No Risk Detected', risk_negative_style)
-    bp_p = Paragraph(bp_text, risk_positive_style) if bp_text != 'False' else Paragraph('No Risk Detected', risk_negative_style)
-    anx_p = Paragraph(anx_text, risk_positive_style) if anx_text != 'False' else Paragraph('No Risk Detected', risk_negative_style)
-    
-    table_data = [
-        [Paragraph("<b>Susceptibility Metric</b>", body_style), Paragraph("<b>Identified Risk Subtype / Assessment</b>", body_style)],
-        [Paragraph("Depression Subtype", body_style), dep_p],
-        [Paragraph("Bipolar Disorder Risk", body_style), bp_p],
-        [Paragraph("Anxiety Subtype", body_style), anx_p],
-    ]
-    
-    t_style_cmds = [
-        ('BACKGROUND', (0,0), (-1,0), HexColor('#f1f5f9')),
-        ('TEXTCOLOR', (0,0), (-1,0), HexColor('#0f172a')),
-        ('ALIGN', (0,0), (-1,-1), 'LEFT'),
-        ('BOTTOMPADDING', (0,0), (-1,-1), 5),
-        ('TOPPADDING', (0,0), (-1,-1), 5),
-        ('GRID', (0,0), (-1,-1), 0.5, HexColor('#cbd5e1')),
-    ]
-    
-    # Conditional background colors for cells based on diagnosis outcomes
-    if dep_text != 'False':
-        t_style_cmds.append(('BACKGROUND', (1,1), (1,1), HexColor('#fef2f2')))
-    else:
-        t_style_cmds.append(('BACKGROUND', (1,1), (1,1), HexColor('#f0fdf4')))
-
-    if bp_text != 'False':
-        t_style_cmds.append(('BACKGROUND', (1,2), (1,2), HexColor('#fef2f2')))
-    else:
-        t_style_cmds.append(('BACKGROUND', (1,2), (1,2), HexColor('#f0fdf4')))
-
-    if anx_text != 'False':
-        t_style_cmds.append(('BACKGROUND', (1,3), (1,3), HexColor('#fef2f2')))
-    else:
-        t_style_cmds.append(('BACKGROUND', (1,3), (1,3), HexColor('#f0fdf4')))
-        
-    summary_table = Table(table_data, colWidths=[200, 304])
-    summary_table.setStyle(TableStyle(t_style_cmds))
-    story.append(summary_table)
-    story.append(Spacer(1, 10))
-    
-    # Section: Personalized Recommended Path
-    story.append(Paragraph("Personalized Intervention Path", section_title_style))
-    
-    # Parse the textual treatment plan report lines
-    report_text = report['Report']
-    
-    # Skip ASCII header dividers if they exist to keep the PDF printable and clean
-    lines = report_text.split('\n')
-    for line in lines:
-        cleaned_line = line.strip()
-        if not cleaned_line:
-            continue
-        if cleaned_line.startswith('===') or cleaned_line.startswith('---'):
-            continue
-        if cleaned_line == "MINDGEN AI® PERSONALIZED TREATMENT PLAN REPORT" or cleaned_line == "END OF REPORT":
-            continue
-            
-        if cleaned_line.isupper() and len(cleaned_line) > 3:
-            # This is a section title
-            story.append(Paragraph(cleaned_line, section_title_style))
-        elif cleaned_line.startswith('•') or cleaned_line.startswith('-') or cleaned_line.startswith('*'):
-            # bullet point
-            content = cleaned_line.lstrip('•-* ').strip()
-            story.append(Paragraph(f"• {content}", bullet_style))
-        elif len(cleaned_line) > 2 and cleaned_line[0].isdigit() and (cleaned_line[1] == '.' or (cleaned_line[2] == '.' if len(cleaned_line) > 2 else False)):
-            # numbered list
-            story.append(Paragraph(cleaned_line, bullet_style))
-        else:
-            # general text
-            story.append(Paragraph(cleaned_line, body_style))
-            
-    # Add clinician signature table
-    story.append(Spacer(1, 15))
-    sig_data = [
-        [Paragraph("<b>Clinician Signature:</b> ___________________________", body_style), Paragraph("<b>MindGen AI® Authorization:</b> Verified", body_style)]
-    ]
-    sig_table = Table(sig_data, colWidths=[300, 204])
-    sig_table.setStyle(TableStyle([
-        ('ALIGN', (0,0), (-1,-1), 'LEFT'),
-        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-        ('TOPPADDING', (0,0), (-1,-1), 2),
-        ('BOTTOMPADDING', (0,0), (-1,-1), 2),
-    ]))
-    story.append(sig_table)
-    
-    # Add clinical disclaimer footer
-    story.append(Spacer(1, 15))
-    story.append(t_sep)
-    story.append(Spacer(1, 6))
-    disclaimer_style = ParagraphStyle(
-        'DocDisclaimer',
-        parent=styles['Normal'],
-        fontName='Helvetica-Oblique',
-        fontSize=7,
-        leading=10,
-        textColor=HexColor('#94a3b8'),
-        spaceAfter=4
-    )
-    story.append(Paragraph("<b>Disclaimer:</b> This report is generated dynamically by MindGen AI for informational and educational purposes. It does not constitute medical advice or a clinical diagnosis. Always consult a licensed healthcare professional or psychiatrist before changing treatment plans, diets, or medication regimens.", disclaimer_style))
-    
-    doc.build(story)
-    buffer.seek(0)
-    
-    return send_file(
-        buffer,
-        as_attachment=True,
-        download_name=f"MindGen_Report_{report_id[:8]}.pdf",
-        mimetype='application/pdf'
-    )
-
-def recommended_path(depression_pred, bipolar_pred, anxiety_pred):
-    """
-    Generates a comprehensive, formatted treatment plan report based on predicted mental health conditions.
-    """
-    # Generate the treatment plan dictionary (using the previous function's logic)
-    treatment_plan = generate_treatment_plan_dict(depression_pred, bipolar_pred, anxiety_pred)
-
-    # Create the formatted report
-    report = []
-
-    # Header
-    report.append("="*80)
-    report.append("MINDGEN AI® PERSONALIZED TREATMENT PLAN REPORT")
-    report.append("="*80)
-    report.append("\n")
-
-    # Overview section
-    report.append("OVERVIEW")
-    report.append("-"*80)
-    report.append(treatment_plan["Overview"])
-    report.append("\n")
-
-    # Conditions Detected
-    report.append("CONDITIONS IDENTIFIED")
-    report.append("-"*80)
-    if depression_pred != "False":
-        report.append(f"- {depression_pred}")
-    if bipolar_pred != "False":
-        report.append(f"- {bipolar_pred}")
-    if anxiety_pred != "False":
-        report.append(f"- {anxiety_pred}")
-    if depression_pred == "False" and bipolar_pred == "False" and anxiety_pred == "False":
-        report.append("- No significant mental health conditions detected")
-    report.append("\n")
-
-    # Genetic Considerations
-    if treatment_plan["Genetic_Considerations"]:
-        report.append("GENETIC CONSIDERATIONS")
-        report.append("-"*80)
-        for item in treatment_plan["Genetic_Considerations"]:
-            report.append(f"• {item}")
-        report.append("\n")
-
-    # Diagnostic Confirmation
-    if treatment_plan["Diagnostic_Confirmation"]:
-        report.append("DIAGNOSTIC CONFIRMATION STEPS")
-        report.append("-"*80)
-        for item in treatment_plan["Diagnostic_Confirmation"]:
-            report.append(f"• {item}")
-        report.append("\n")
-
-    # Personalized Interventions
-    if treatment_plan["Personalized_Interventions"]:
-        report.append("PERSONALIZED INTERVENTIONS")
-        report.append("-"*80)
-        for i, item in enumerate(treatment_plan["Personalized_Interventions"], 1):
-            report.append(f"{i}. {item}")
-        report.append("\n")
-
-    # Pharmacological Approach
-    if treatment_plan["Pharmacological_Approach"]:
-        report.append("PHARMACOLOGICAL APPROACH")
-        report.append("-"*80)
-        for i, item in enumerate(treatment_plan["Pharmacological_Approach"], 1):
-            report.append(f"{i}. {item}")
-        report.append("\n")
-
-    # Nutrigenomic Recommendations
-    if treatment_plan["Nutrigenomic_Recommendations"]:
-        report.append("NUTRIGENOMIC RECOMMENDATIONS")
-        report.append("-"*80)
-        for item in treatment_plan["Nutrigenomic_Recommendations"]:
-            report.append(f"• {item}")
-        report.append("\n")
-
-    # Lifestyle Modifications
-    if treatment_plan["Lifestyle_Modifications"]:
-        report.append("LIFESTYLE MODIFICATIONS")
-        report.append("-"*80)
-        for item in treatment_plan["Lifestyle_Modifications"]:
-            report.append(f"• {item}")
-        report.append("\n")
-
-    # Therapeutic Approaches
-    if treatment_plan["Therapeutic_Approaches"]:
-        report.append("THERAPEUTIC APPROACHES")
-        report.append("-"*80)
-        for i, item in enumerate(treatment_plan["Therapeutic_Approaches"], 1):
-            report.append(f"{i}. {item}")
-        report.append("\n")
-
-    # Monitoring and Follow-up
-    if treatment_plan["Monitoring_and_Followup"]:
-        report.append("MONITORING AND FOLLOW-UP PLAN")
-        report.append("-"*80)
-        for item in treatment_plan["Monitoring_and_Followup"]:
-            report.append(f"• {item}")
-        report.append("\n")
-
-    # Special Considerations
-    if treatment_plan["Special_Considerations"]:
-        report.append("SPECIAL CONSIDERATIONS")
-        report.append("-"*80)
-        for item in treatment_plan["Special_Considerations"]:
-            report.append(f"⚠️ {item}")
-        report.append("\n")
-
-    # Footer
-    report.append("="*80)
-    report.append("END OF REPORT")
-    report.append("="*80)
-
-    # Join all lines with newlines and return
-    return "\n".join(report)
-
-
-def generate_treatment_plan_dict(depression_pred, bipolar_pred, anxiety_pred):
-    """
-    Provides a customized treatment plan based on predicted mental health conditions.
-
-    Parameters:
-    - depression_pred: One of the depression types or 'False'
-    - bipolar_pred: One of the bipolar disorder types or 'False'
-    - anxiety_pred: One of the anxiety types or 'False'
-
-    Returns:
-    - A detailed treatment plan dictionary with sections for each condition and combined recommendations
-    """
-
-    # Initialize the treatment plan
-    treatment_plan = {
-        "Overview": "",
-        "Genetic_Considerations": [],
-        "Diagnostic_Confirmation": [],
-        "Personalized_Interventions": [],
-        "Pharmacological_Approach": [],
-        "Nutrigenomic_Recommendations": [],
-        "Lifestyle_Modifications": [],
-        "Therapeutic_Approaches": [],
-        "Monitoring_and_Followup": [],
-        "Special_Considerations": []
-    }
-
-    # Helper function to add unique items to a section
-    def add_unique(section, items):
-        for item in items:
-            if item not in treatment_plan[section]:
-                treatment_plan[section].append(item)
-
-    # Overview section
-    conditions = []
-    if depression_pred != "False":
-        conditions.append(depression_pred)
-    if bipolar_pred != "False":
-        conditions.append(bipolar_pred)
-    if anxiety_pred != "False":
-        conditions.append(anxiety_pred)
-
-    if not conditions:
-        treatment_plan["Overview"] = "No significant mental health conditions detected. Maintain current wellness practices."
-        return treatment_plan
+    # A stored report never changes: the ETag covers the renderer version and everything printed on the page
+    etag = pdf_key(report['id'], REPORT_PDF_VERSION, patient_name, report['username'], report['timestamp'],
+                   report['Depression'], report['BipolarDisorder'], report['Anxiety'],
+                   report.get('plan_key') or report.get('Report', ''))
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
     else:
-        treatment_plan["Overview"] = f"Comprehensive treatment plan for: {', '.join(conditions)}"
-
-    # ========================
-    # DEPRESSION RECOMMENDATIONS
-    # ========================
-    if depression_pred != "False":
-        # Genetic considerations for depression
-        dep_genetic = [
-            "Review 5-HTTLPR, COMT, and MAOA genotypes for serotonin metabolism insights",
-            "Assess BDNF levels and genetic variants for neuroplasticity impact",
-            "Evaluate MTHFR status for folate metabolism implications"
-        ]
-        add_unique("Genetic_Considerations", dep_genetic)
-
-        # Diagnostic confirmation for depression
-        dep_diagnostic = [
-            "Confirm diagnosis with structured clinical interview (e.g., SCID)",
-            "Assess severity using PHQ-9 and clinician-rated scales",
-            "Evaluate for comorbid medical conditions affecting mood"
-        ]
-        add_unique("Diagnostic_Confirmation", dep_diagnostic)
-
-        # Depression-specific interventions
-        if depression_pred == "Major Depressive Disorder":
-            dep_interventions = [
-                "Initiate evidence-based psychotherapy (CBT or IPT)",
-                "Consider pharmacogenomic testing for antidepressant selection",
-                "Implement mood monitoring system",
-                "Assess suicide risk and develop safety plan"
-            ]
-        elif depression_pred == "Persistent Depressive Disorder":
-            dep_interventions = [
-                "Long-term psychotherapy approach (CBT or psychodynamic)",
-                "Consider combination treatment with medication and therapy",
-                "Focus on building resilience and coping strategies",
-                "Address chronic stressors and interpersonal factors"
-            ]
-        elif depression_pred == "Atypical Depression":
-            dep_interventions = [
-                "Prioritize MAOIs or SSRIs with noradrenergic effects",
-                "Focus on regulating sleep and appetite patterns",
-                "Behavioral activation to counteract lethargy",
-                "Address rejection sensitivity in therapy"
-            ]
-        elif depression_pred == "Psychotic Depression":
-            dep_interventions = [
-                "Requires combination of antidepressant and antipsychotic",
-                "Close monitoring for safety concerns",
-                "Consider inpatient care if severe",
-                "Family education and support"
-            ]
-        elif depression_pred == "Seasonal Affective Disorder":
-            dep_interventions = [
-                "Light therapy (10,000 lux for 30-45 min daily)",
-                "Consider vitamin D supplementation",
-                "Timed melatonin administration",
-                "Cognitive-behavioral therapy adapted for SAD"
-            ]
-        add_unique("Personalized_Interventions", dep_interventions)
-
-        # Pharmacological approach for depression
-        dep_pharma = [
-            "Select antidepressant based on genetic profile and subtype",
-            "Consider SSRI first-line unless contraindicated",
-            "Monitor for 4-6 weeks before assessing efficacy",
-            "Adjust dose based on therapeutic drug monitoring if available"
-        ]
-        add_unique("Pharmacological_Approach", dep_pharma)
-
-        # Nutrigenomic recommendations for depression
-        dep_nutri = [
-            "Ensure adequate tryptophan intake (precursor to serotonin)",
-            "Optimize omega-3 fatty acids (EPA/DHA 1-2g daily)",
-            "Consider methylfolate if MTHFR variants present",
-            "Address potential micronutrient deficiencies (B12, zinc, magnesium)"
-        ]
-        add_unique("Nutrigenomic_Recommendations", dep_nutri)
-
-        # Lifestyle modifications for depression
-        dep_lifestyle = [
-            "Regular aerobic exercise (3-5x/week)",
-            "Sleep hygiene education and regulation",
-            "Structured daily routine",
-            "Social connection and support system building"
-        ]
-        add_unique("Lifestyle_Modifications", dep_lifestyle)
-
-    # ========================
-    # BIPOLAR DISORDER RECOMMENDATIONS
-    # ========================
-    if bipolar_pred != "False":
-        # Genetic considerations for bipolar
-        bp_genetic = [
-            "Review ANK3, CACNA1C, and ODZ4 variants for calcium channel insights",
-            "Assess circadian gene polymorphisms",
-            "Evaluate mitochondrial DNA variants if dysfunction suspected"
-        ]
-        add_unique("Genetic_Considerations", bp_genetic)
-
-        # Diagnostic confirmation for bipolar
-        bp_diagnostic = [
-            "Confirm diagnosis with MINI or SCID",
-            "Detailed mood episode history and family history",
-            "Rule out substance-induced mood episodes",
-            "Assess for mixed features"
-        ]
-        add_unique("Diagnostic_Confirmation", bp_diagnostic)
-
-        # Bipolar-specific interventions
-        if bipolar_pred == "BD-I":
-            bp_interventions = [
-                "Mood stabilizer as foundation (lithium, valproate, or lamotrigine)",
-                "Monitor for manic/hypomanic symptoms closely",
-                "Psychoeducation about illness course",
-                "Develop relapse prevention plan"
-            ]
-        elif bipolar_pred == "BD-II":
-            bp_interventions = [
-                "Lamotrigine or quetiapine as first-line",
-                "Focus on depression prevention",
-                "Careful monitoring for hypomania with antidepressants",
-                "Address interpersonal and social rhythm disruptions"
-            ]
-        elif bipolar_pred == "Cyclothymia":
-            bp_interventions = [
-                "Consider low-dose mood stabilizer if impairing",
-                "Focus on lifestyle regularity",
-                "Cognitive therapy for mood swings",
-                "Monitor for progression to BD-I or II"
-            ]
-        add_unique("Personalized_Interventions", bp_interventions)
-
-        # Pharmacological approach for bipolar
-        bp_pharma = [
-            "Avoid antidepressants without mood stabilizer in BD-I",
-            "Consider lithium for suicide prevention in BD",
-            "Monitor valproate levels in women of childbearing age",
-            "Adjust treatment based on phase (acute vs maintenance)"
-        ]
-        add_unique("Pharmacological_Approach", bp_pharma)
-
-        # Nutrigenomic recommendations for bipolar
-        bp_nutri = [
-            "Ensure adequate omega-3 intake (may have mood stabilizing effects)",
-            "Consider N-acetylcysteine as adjunctive",
-            "Monitor homocysteine levels (may relate to folate metabolism)",
-            "Address circadian-related nutrition (timed meals, caffeine management)"
-        ]
-        add_unique("Nutrigenomic_Recommendations", bp_nutri)
-
-        # Lifestyle modifications for bipolar
-        bp_lifestyle = [
-            "Strict sleep-wake cycle maintenance",
-            "Social rhythm therapy to stabilize daily patterns",
-            "Stress reduction techniques",
-            "Avoidance of substances and sleep deprivation"
-        ]
-        add_unique("Lifestyle_Modifications", bp_lifestyle)
-
-    # ========================
-    # ANXIETY DISORDER RECOMMENDATIONS
-    # ========================
-    if anxiety_pred != "False":
-        # Genetic considerations for anxiety
-        anx_genetic = [
-            "Review SLC6A4 and other serotonin transporter variants",
-            "Assess COMT Val158Met for stress response impact",
-            "Evaluate GABA receptor polymorphisms if panic features present"
-        ]
-        add_unique("Genetic_Considerations", anx_genetic)
-
-        # Diagnostic confirmation for anxiety
-        anx_diagnostic = [
-            "Confirm diagnosis with ADIS or similar structured interview",
-            "Assess avoidance behaviors and functional impact",
-            "Rule out medical causes (hyperthyroidism, etc.)",
-            "Evaluate for trauma history if relevant"
-        ]
-        add_unique("Diagnostic_Confirmation", anx_diagnostic)
-
-        # Anxiety-specific interventions
-        if anxiety_pred == "Generalized Anxiety Disorder":
-            anx_interventions = [
-                "CBT with worry exposure and cognitive restructuring",
-                "Mindfulness-based stress reduction",
-                "Address intolerance of uncertainty",
-                "Problem-solving skills training"
-            ]
-        elif anxiety_pred == "Panic Disorder":
-            anx_interventions = [
-                "Interoceptive exposure therapy",
-                "Cognitive restructuring of catastrophic interpretations",
-                "Breathing retraining",
-                "Gradual exposure to avoided situations"
-            ]
-        elif anxiety_pred == "Social Anxiety Disorder":
-            anx_interventions = [
-                "Social skills training if deficits present",
-                "Cognitive restructuring of negative beliefs",
-                "Exposure to social situations",
-                "Attention retraining for self-focused attention"
-            ]
-        elif anxiety_pred == "Agoraphobia":
-            anx_interventions = [
-                "In vivo exposure hierarchy development",
-                "Cognitive challenging of safety behaviors",
-                "Gradual expansion of safe zone",
-                "Partner/family involvement if helpful"
-            ]
-        elif anxiety_pred == "Specific Phobia":
-            anx_interventions = [
-                "Exposure therapy tailored to phobic stimulus",
-                "Systematic desensitization",
-                "Cognitive restructuring of threat appraisal",
-                "Modeling and reinforcement techniques"
-            ]
-        add_unique("Personalized_Interventions", anx_interventions)
-
-        # Pharmacological approach for anxiety
-        anx_pharma = [
-            "Consider SSRI/SNRI as first-line pharmacotherapy",
-            "Short-term benzodiazepine only if severe impairment",
-            "Monitor for initial anxiety exacerbation with SSRIs",
-            "Consider buspirone for GAD if SSRI not tolerated"
-        ]
-        add_unique("Pharmacological_Approach", anx_pharma)
-
-        # Nutrigenomic recommendations for anxiety
-        anx_nutri = [
-            "Ensure balanced blood sugar (avoid hypoglycemia triggers)",
-            "Consider L-theanine and magnesium for relaxation",
-            "Monitor caffeine and alcohol intake",
-            "Adequate protein intake for amino acid precursors"
-        ]
-        add_unique("Nutrigenomic_Recommendations", anx_nutri)
-
-        # Lifestyle modifications for anxiety
-        anx_lifestyle = [
-            "Regular exercise (yoga can be particularly helpful)",
-            "Breathing and relaxation practice",
-            "Stimulant reduction (caffeine, nicotine)",
-            "Sleep hygiene optimization"
-        ]
-        add_unique("Lifestyle_Modifications", anx_lifestyle)
-
-    # ========================
-    # COMBINATION CONSIDERATIONS
-    # ========================
-
-    # Special considerations for combinations
-    combo_special = []
-
-    # Depression + Anxiety
-    if depression_pred != "False" and anxiety_pred != "False":
-        combo_special.extend([
-            "Address depression first if severe as it may limit anxiety treatment engagement",
-            "Consider SNRIs that treat both conditions",
-            "Modify CBT to address both disorders simultaneously",
-            "Monitor for increased suicide risk with mixed depression/anxiety"
-        ])
-
-    # Bipolar + Anxiety
-    if bipolar_pred != "False" and anxiety_pred != "False":
-        combo_special.extend([
-            "Stabilize mood first before aggressively treating anxiety",
-            "Avoid benzodiazepines if possible (risk of misuse, worsening depression)",
-            "Consider quetiapine or lurasidone which may help both",
-            "Address anxiety in context of mood stability"
-        ])
-
-    # Bipolar + Depression
-    if bipolar_pred != "False" and depression_pred != "False":
-        combo_special.extend([
-            "Differentiate between unipolar and bipolar depression in treatment approach",
-            "Caution with antidepressants - use only with mood stabilizer",
-            "Consider lamotrigine for bipolar depression",
-            "Monitor closely for switching to hypomania/mania"
-        ])
-
-    # All three conditions
-    if (depression_pred != "False" and bipolar_pred != "False"
-        and anxiety_pred != "False"):
-        combo_special.extend([
-            "Prioritize mood stabilization as foundation",
-            "Sequential treatment approach - bipolar stability first, then depression, then anxiety",
-            "Consider comprehensive DBT approach for emotion regulation",
-            "Multidisciplinary team management essential"
-        ])
-
-    add_unique("Special_Considerations", combo_special)
-
-    # ========================
-    # THERAPEUTIC APPROACHES
-    # ========================
-    therapies = []
-
-    # Common evidence-based therapies
-    therapies.extend([
-        "Cognitive Behavioral Therapy (tailored to primary diagnosis)",
-        "Psychoeducation about condition(s) and treatment",
-        "Mindfulness-based interventions",
-        "Behavioral activation (especially for depression)"
-    ])
-
-    # Condition-specific therapies
-    if bipolar_pred != "False":
-        therapies.extend([
-            "Interpersonal and Social Rhythm Therapy (IPSRT)",
-            "Family-focused therapy for bipolar disorder"
-        ])
-
-    if anxiety_pred != "False":
-        therapies.extend([
-            "Exposure-based therapies",
-            "Acceptance and Commitment Therapy (ACT)"
-        ])
-
-    if depression_pred != "False":
-        therapies.extend([
-            "Behavioral Activation",
-            "Problem-Solving Therapy"
-        ])
-
-    add_unique("Therapeutic_Approaches", therapies)
-
-    # ========================
-    # MONITORING AND FOLLOWUP
-    # ========================
-    monitoring = [
-        "Regular clinical follow-up (frequency depends on severity)",
-        "Standardized symptom tracking (e.g., mood charts, anxiety diaries)",
-        "Routine labs as needed (lithium levels, metabolic monitoring)",
-        "Periodic re-assessment of treatment plan efficacy",
-        "Functional outcome assessment (work, relationships, quality of life)"
-    ]
-
-    if bipolar_pred != "False":
-        monitoring.extend([
-            "Mood episode symptom monitoring",
-            "Early warning sign identification plan"
-        ])
-
-    if depression_pred != "False":
-        monitoring.extend([
-            "Suicide risk reassessment at each contact",
-            "PHQ-9 tracking over time"
-        ])
-
-    if anxiety_pred != "False":
-        monitoring.extend([
-            "Exposure hierarchy progress tracking",
-            "Anxiety diary review"
-        ])
-
-    add_unique("Monitoring_and_Followup", monitoring)
-
-    return treatment_plan
+        def build():
+            return build_report_pdf(report, patient_name, report_for_record(report))
+        pdf = report_cache.get_or_build(etag, build) if report_cache is not None else build()
+        response = send_file(
+            io.BytesIO(pdf),
+            as_attachment=True,
+            download_name=f"MindGen_Report_{report_id[:8]}.pdf",
+            mimetype='application/pdf'
+        )
+    response.set_etag(etag)
+    # Per-user content: browsers may keep it but must revalidate, which costs only the 304
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,171 @@
+"""
+Compressed archive segments for old assessment results.
+
+The compaction job moves results older than a retention age out of the hot
+results store into immutable segment files:
+
+    archive/results-<created>.jsonl.gz    (or .jsonl.xz with lzma)
+    archive/results-<created>.idx.json    [[username, id, timestamp, line], ...]
+
+Only the small index files are loaded at startup. A segment is decompressed
+when one of its reports is actually requested, and the few most recently used
+segments are kept decompressed in memory.
+
+Usage:
+    python storage.py archive --older-than-days 180 [--compression gzip|lzma]
+"""
+import bisect
+import gzip
+import json
+import lzma
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+COMPRESSORS = {
+    'gzip': ('.jsonl.gz', lambda raw: gzip.GzipFile(fileobj=raw, mode='wb')),
+    'lzma': ('.jsonl.xz', lambda raw: lzma.LZMAFile(raw, mode='wb')),
+}
+
+
+def fsync_dir(directory):
+    """Make renames inside directory durable (no-op where directories cannot be opened, e.g. Windows)."""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class ResultsArchive:
+    def __init__(self, directory, cached_segments=4):
+        self.directory = directory
+        self.cached_segments = cached_segments
+        self._lock = threading.Lock()
+        self._by_id = {}        # report id -> (segment path, line number)
+        self._by_user = {}      # username -> sorted list of (timestamp, report id)
+        self._loaded = set()    # index files already loaded
+        self._dir_mtime = None
+        self._segments = OrderedDict()  # segment path -> list of raw lines (LRU)
+
+    def _refresh(self, force=False):
+        """Load indexes of segments written since the last check (including by other processes)."""
+        try:
+            mtime = os.stat(self.directory).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._dir_mtime and not force:
+            return
+        self._dir_mtime = mtime
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith('.idx.json') or name in self._loaded:
+                continue
+            with open(os.path.join(self.directory, name), 'r') as f:
+                index = json.load(f)
+            segment = os.path.join(self.directory, index['segment'])
+            for username, report_id, timestamp, line in index['entries']:
+                if report_id not in self._by_id:
+                    bisect.insort(self._by_user.setdefault(username, []), (timestamp, report_id))
+                self._by_id[report_id] = (segment, line)
+            self._loaded.add(name)
+
+    def _segment_lines(self, segment):
+        lines = self._segments.get(segment)
+        if lines is None:
+            opener = gzip.open if segment.endswith('.gz') else lzma.open
+            with opener(segment, 'rb') as f:
+                lines = f.read().splitlines()
+            self._segments[segment] = lines
+            while len(self._segments) > self.cached_segments:
+                self._segments.popitem(last=False)
+        else:
+            self._segments.move_to_end(segment)
+        return lines
+
+    def write_segment(self, records, compression='gzip'):
+        """
+        Write records to a new immutable segment. The index is written last and marks it complete. Both
+        files, and their directory entries, are on disk before this returns, so the caller can then drop
+        the records from the hot store.
+        """
+        if compression not in COMPRESSORS:
+            raise ValueError(f"Unknown compression '{compression}', expected one of {tuple(COMPRESSORS)}")
+        if not records:
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        suffix, opener = COMPRESSORS[compression]
+        base = 'results-' + datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')
+        segment = os.path.join(self.directory, base + suffix)
+
+        entries = []
+        with open(segment + '.tmp', 'wb') as raw:
+            with opener(raw) as f:
+                for line, record in enumerate(records):
+                    f.write((json.dumps(record) + '\n').encode('utf-8'))
+                    entries.append([record['username'], record['id'], record['timestamp'], line])
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(segment + '.tmp', segment)
+        fsync_dir(self.directory)
+
+        index_path = os.path.join(self.directory, base + '.idx.json')
+        with open(index_path + '.tmp', 'w') as f:
+            json.dump({'segment': os.path.basename(segment), 'compression': compression, 'entries': entries}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(index_path + '.tmp', index_path)
+        fsync_dir(self.directory)
+        return segment
+
+    def get(self, report_id):
+        with self._lock:
+            self._refresh()
+            location = self._by_id.get(report_id)
+            if location is None:
+                self._refresh(force=True)
+                location = self._by_id.get(report_id)
+            if location is None:
+                return None
+            segment, line = location
+            return json.loads(self._segment_lines(segment)[line])
+
+    def get_for_user(self, report_id, username):
+        record = self.get(report_id)
+        if record is None or record['username'] != username:
+            return None
+        return record
+
+    def user_entries(self, username):
+        """(timestamp, report id) pairs for a user, oldest first."""
+        with self._lock:
+            self._refresh()
+            return list(self._by_user.get(username, ()))
+
+    def user_entries_before(self, username, before=None, limit=20):
+        """Up to `limit` (timestamp, report id) keys of a user that sort before `before`, oldest first."""
+        with self._lock:
+            self._refresh()
+            entries = self._by_user.get(username, ())
+            end = bisect.bisect_left(entries, before) if before else len(entries)
+            return list(entries[max(0, end - limit):end])
+
+    def for_user(self, username):
+        """Archived records for a user, newest first."""
+        return [self.get(report_id) for _, report_id in reversed(self.user_entries(username))]
+
+    def __contains__(self, report_id):
+        with self._lock:
+            self._refresh()
+            return report_id in self._by_id
+
+    def stats(self):
+        with self._lock:
+            self._refresh()
+            return {'segments': len(self._loaded), 'records': len(self._by_id),
+                    'segments_in_memory': len(self._segments)}
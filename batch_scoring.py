@@ -0,0 +1,191 @@
+"""
+Streaming batch scoring for research cohorts.
+
+Reads a CSV or JSON Lines file of patients, one per row, with the same field
+names as the /analyze form (age, sleep_duration, genotype_5httlpr, ...). An
+optional `id` column is passed through. Rows are scored in chunks: each chunk
+is one vectorized predict() per model (or the rule-based fallback when no
+models are loaded), and every result carries the plan key of its treatment
+plan. Results are written out as each chunk finishes, so memory use depends on
+the chunk size, not on the size of the file. Scored rows are not stored as
+assessments.
+
+Rows that cannot be parsed or scored produce an error line instead of stopping
+the run.
+
+Usage:
+    python batch_scoring.py cohort.csv [-o scored.jsonl] [--chunk-size 1000] [--model-dir backend/models]
+"""
+import argparse
+import csv
+import io
+import json
+import sys
+import time
+from itertools import islice
+
+from input_schema import parse_patient
+from rules import rule_based_predictions_many
+from treatment_plans import plan_key
+
+RESULT_FIELDS = ['row', 'id', 'Depression', 'BipolarDisorder', 'Anxiety', 'plan_key', 'model_version', 'error']
+
+
+def detect_format(filename, default='csv'):
+    name = (filename or '').lower()
+    if name.endswith(('.jsonl', '.ndjson', '.json')):
+        return 'jsonl'
+    if name.endswith('.csv'):
+        return 'csv'
+    return default
+
+
+def read_rows(stream, fmt):
+    """Patient rows (dicts) from a text stream, one at a time."""
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+    else:
+        for line in stream:
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    yield e     # reported as an error row, the rest of the file is still scored
+
+
+def predict_patients(bundle, inputs):
+    """
+    {'depression', 'bipolar', 'anxiety'} labels for each of a list of patient inputs: one vectorized
+    predict per model, or the rule-based fallback when bundle is None. If the vectorized call fails the
+    patients are retried one by one, and a patient that still fails gets the Exception in its place.
+    """
+    if bundle is None:
+        return rule_based_predictions_many(inputs)
+    try:
+        columns = {name: model.predict_rows([patient[name] for patient in inputs])
+                   for name, model in bundle.models.items()}
+        return [{name: labels[i] for name, labels in columns.items()} for i in range(len(inputs))]
+    except Exception:
+        if len(inputs) == 1:
+            raise
+        results = []
+        for patient in inputs:
+            try:
+                results.append(predict_patients(bundle, [patient])[0])
+            except Exception as e:
+                results.append(e)
+        return results
+
+
+def score_rows(rows, bundle=None, chunk_size=1000, stats=None):
+    """
+    Yield one result dict per input row, in input order.
+
+    bundle is the active ModelBundle, or None for the rule-based fallback. stats, if given, is
+    updated in place with rows, errors and seconds as scoring progresses.
+    """
+    version = bundle.version if bundle is not None else 'rules'
+    stats = stats if stats is not None else {}
+    stats.update(rows=0, errors=0, seconds=0.0)
+    start = time.perf_counter()
+    rows = iter(rows)
+    row_number = 0
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        parsed, results = [], []
+        for raw in chunk:
+            row_number += 1
+            result = {'row': row_number, 'id': raw.get('id') if isinstance(raw, dict) else None}
+            results.append(result)
+            if isinstance(raw, Exception):
+                result['error'] = f'invalid JSON: {raw}'
+                continue
+            inputs, error = parse_patient(raw)
+            if error is not None:
+                result['error'] = f'invalid input: {error}'
+            else:
+                parsed.append((result, inputs))
+
+        predictions = predict_patients(bundle, [inputs for _, inputs in parsed]) if parsed else []
+        for (result, _), prediction in zip(parsed, predictions):
+            if isinstance(prediction, Exception):
+                result['error'] = f'prediction failed: {prediction}'
+                continue
+            result.update({
+                'Depression': prediction['depression'],
+                'BipolarDisorder': prediction['bipolar'],
+                'Anxiety': prediction['anxiety'],
+                'plan_key': plan_key(prediction['depression'], prediction['bipolar'], prediction['anxiety']),
+                'model_version': version,
+            })
+
+        for result in results:
+            stats['rows'] += 1
+            if 'error' in result:
+                stats['errors'] += 1
+            yield result
+        stats['seconds'] = time.perf_counter() - start
+
+
+def rows_per_sec(stats):
+    return round(stats['rows'] / stats['seconds'], 1) if stats.get('seconds') else 0.0
+
+
+def format_results(results, fmt):
+    """Serialized output, one chunk of text per result (CSV output starts with a header)."""
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=RESULT_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        for result in results:
+            writer.writerow(result)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    else:
+        for result in results:
+            yield json.dumps(result) + '\n'
+
+
+def _load_bundle(model_dir):
+    from inference import ParallelPredictor
+    from model_registry import ModelRegistry
+    registry = ModelRegistry(model_dir, lambda models: ParallelPredictor(models), interval=0)
+    try:
+        return registry.load()
+    except Exception as e:
+        print(f"Could not load models from {model_dir} ({e}); using the rule-based fallback", file=sys.stderr)
+        return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Score a CSV/JSONL cohort with the MindGen models")
+    parser.add_argument('input', help="CSV or JSONL file of patients ('-' for stdin)")
+    parser.add_argument('-o', '--output', default='-', help="output file ('-' for stdout)")
+    parser.add_argument('--input-format', choices=('csv', 'jsonl'))
+    parser.add_argument('--output-format', choices=('csv', 'jsonl'))
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--model-dir', default='backend/models')
+    parser.add_argument('--rules', action='store_true', help="use the rule-based fallback even if models load")
+    args = parser.parse_args()
+
+    input_format = args.input_format or detect_format(args.input)
+    output_format = args.output_format or detect_format(args.output, default='jsonl')
+    bundle = None if args.rules else _load_bundle(args.model_dir)
+
+    stats = {}
+    src = sys.stdin if args.input == '-' else open(args.input, 'r', newline='', encoding='utf-8')
+    dst = sys.stdout if args.output == '-' else open(args.output, 'w', newline='', encoding='utf-8')
+    try:
+        results = score_rows(read_rows(src, input_format), bundle, args.chunk_size, stats)
+        for text in format_results(results, output_format):
+            dst.write(text)
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if dst is not sys.stdout:
+            dst.close()
+    print(f"Scored {stats['rows']} rows ({stats['errors']} errors) in {stats['seconds']:.2f}s: "
+          f"{rows_per_sec(stats)} rows/sec with {bundle.version if bundle else 'rules'}", file=sys.stderr)
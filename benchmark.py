@@ -0,0 +1,211 @@
+"""
+Micro-benchmarks for MindGen performance work.
+
+Usage:
+    python benchmark.py writes [--per-submitter 50]
+    python benchmark.py features [--iterations 2000]
+    python benchmark.py batching [--requests-per-client 40]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+from model_registry import SMOKE_INPUTS
+
+# One representative patient, already split into the three model input layouts
+SAMPLE_DEPRESSION = SMOKE_INPUTS['depression']
+SAMPLE_BIPOLAR = SMOKE_INPUTS['bipolar']
+SAMPLE_ANXIETY = SMOKE_INPUTS['anxiety']
+
+
+def _per_call_us(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def bench_features(args):
+    """Per-request input construction: one-row DataFrame from a dict vs compiled FeatureSchema."""
+    import numpy as np
+    import pandas as pd
+    from features import FeatureSchema, DEPRESSION_COLUMNS, BIPOLAR_COLUMNS, CATEGORICAL_FEATURES
+    try:
+        from sklearn.dummy import DummyClassifier
+    except ImportError:
+        DummyClassifier = None
+
+    anxiety_columns = list(SAMPLE_ANXIETY)
+    cases = [('depression', DEPRESSION_COLUMNS, SAMPLE_DEPRESSION),
+             ('bipolar', BIPOLAR_COLUMNS, SAMPLE_BIPOLAR),
+             ('anxiety', anxiety_columns, SAMPLE_ANXIETY)]
+
+    print(f"{'model':<12}{'path':<30}{'build us':>10}{'build+predict us':>18}")
+    for name, columns, sample in cases:
+        # Encodings for the array path: each categorical label gets an integer code
+        mappings = {col: {0: sample[col]} for col in columns if col in CATEGORICAL_FEATURES}
+        frame_model = array_model = None
+        if DummyClassifier is not None:
+            frame_model = DummyClassifier(strategy='most_frequent').fit(pd.DataFrame([sample], columns=columns), [0])
+            array_model = DummyClassifier(strategy='most_frequent').fit(np.zeros((1, len(columns))), [0])
+
+        paths = [
+            ('DataFrame([dict]) (old)', lambda: pd.DataFrame([sample], columns=columns), frame_model),
+            ('FeatureSchema (DataFrame)', lambda s=FeatureSchema(name, columns, model=frame_model):
+                s.vectorize([sample]), frame_model),
+            ('FeatureSchema (array)', lambda s=FeatureSchema(name, columns, model=array_model,
+                                                             category_mappings=mappings):
+                s.vectorize([sample]), array_model),
+        ]
+        for label, build, model in paths:
+            build_us = _per_call_us(build, args.iterations)
+            predict_us = _per_call_us(lambda: model.predict(build()), args.iterations) if model else float('nan')
+            print(f"{name:<12}{label:<30}{build_us:>10.1f}{predict_us:>18.1f}")
+
+
+def _synthetic_disorder_models(n_estimators=50):
+    """Three random-forest DisorderModels over the real column layouts, fitted on random data."""
+    import numpy as np
+    from sklearn.ensemble import RandomForestClassifier
+    from features import FeatureSchema, DEPRESSION_COLUMNS, BIPOLAR_COLUMNS, CATEGORICAL_FEATURES
+    from inference import DisorderModel
+
+    rng = np.random.default_rng(0)
+    models = {}
+    for name, columns, sample in (('depression', DEPRESSION_COLUMNS, SAMPLE_DEPRESSION),
+                                  ('bipolar', BIPOLAR_COLUMNS, SAMPLE_BIPOLAR),
+                                  ('anxiety', list(SAMPLE_ANXIETY), SAMPLE_ANXIETY)):
+        X = rng.normal(size=(500, len(columns)))
+        y = rng.integers(0, 4, size=500)
+        model = RandomForestClassifier(n_estimators=n_estimators, random_state=0).fit(X, y)
+        mappings = {col: {0: sample[col]} for col in columns if col in CATEGORICAL_FEATURES}
+        schema = FeatureSchema(name, columns, model=model, category_mappings=mappings)
+        models[name] = DisorderModel(name, model, schema, lambda codes: [f'class-{c}' for c in codes])
+    return models
+
+
+def _load_test(clients, requests_per_client, call):
+    """Run `call` from concurrent clients; returns (requests/sec, p50 ms, p99 ms)."""
+    latencies = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(clients)
+
+    def client():
+        barrier.wait()
+        mine = []
+        for _ in range(requests_per_client):
+            start = time.perf_counter()
+            call()
+            mine.append((time.perf_counter() - start) * 1000)
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return (len(latencies) / elapsed, latencies[len(latencies) // 2],
+            latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))])
+
+
+def bench_batching(args):
+    """Three-model predictions per /analyze request: sequential, parallel per request, micro-batched."""
+    from inference import BatchDispatcher, ParallelPredictor, predict_direct
+
+    models = _synthetic_disorder_models()
+    inputs = {'anxiety': SAMPLE_ANXIETY, 'depression': SAMPLE_DEPRESSION, 'bipolar': SAMPLE_BIPOLAR}
+    dispatcher = BatchDispatcher(models, max_wait=args.wait_ms / 1000, max_batch=args.max_batch)
+    parallel = ParallelPredictor(models, workers=args.workers)
+
+    print(f"{'mode':<12}{'clients':>8}{'req/sec':>10}{'p50 ms':>9}{'p99 ms':>9}")
+    for clients in (1, 8, 32):
+        for mode, call in (('direct', lambda: predict_direct(models, inputs)),
+                           ('parallel', lambda: parallel.predict_all(inputs)),
+                           ('batched', lambda: dispatcher.predict_all(inputs))):
+            rps, p50, p99 = _load_test(clients, args.requests_per_client, call)
+            print(f"{mode:<12}{clients:>8}{rps:>10.0f}{p50:>9.1f}{p99:>9.1f}")
+    print({name: stats for name, stats in dispatcher.stats.items()})
+    print({name: h['mean_ms'] for name, h in parallel.stats()['models'].items()}, parallel.stats()['slowest_model'])
+
+
+def _run_submitters(submitters, per_submitter, submit):
+    barrier = threading.Barrier(submitters)
+
+    def worker():
+        barrier.wait()
+        for _ in range(per_submitter):
+            submit({'id': str(uuid.uuid4()), 'username': f'user-{uuid.uuid4().hex[:8]}'})
+
+    threads = [threading.Thread(target=worker) for _ in range(submitters)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start
+
+
+def bench_writes(args):
+    """Writes/sec for users.json registrations: unlocked read-modify-write vs group-commit writer."""
+    from journal import JsonDocumentWriter
+    from storage import read_json, write_json
+
+    workdir = tempfile.mkdtemp(prefix='mindgen-bench-')
+    try:
+        print(f"{'mode':<14}{'submitters':>11}{'writes':>8}{'writes/sec':>12}{'lost':>6}{'commits':>9}")
+        for submitters in (1, 8, 32):
+            total = submitters * args.per_submitter
+
+            path = os.path.join(workdir, f'naive-{submitters}.json')
+            write_json(path, [])
+
+            def naive_submit(user):
+                users = list(read_json(path))
+                users.append(user)
+                write_json(path, users)
+
+            elapsed = _run_submitters(submitters, args.per_submitter, naive_submit)
+            lost = total - len(read_json(path))
+            print(f"{'naive':<14}{submitters:>11}{total:>8}{total / elapsed:>12.0f}{lost:>6}{total:>9}")
+
+            path = os.path.join(workdir, f'group-{submitters}.json')
+            write_json(path, [])
+            writer = JsonDocumentWriter(path, window=args.window_ms / 1000)
+            elapsed = _run_submitters(submitters, args.per_submitter,
+                                      lambda user: writer.submit(lambda users: users.append(user)))
+            lost = total - len(read_json(path))
+            print(f"{'group-commit':<14}{submitters:>11}{total:>8}{total / elapsed:>12.0f}{lost:>6}"
+                  f"{writer.stats['commits']:>9}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="MindGen micro-benchmarks")
+    sub = parser.add_subparsers(dest='command', required=True)
+    writes = sub.add_parser('writes', help="users.json write throughput at 1, 8 and 32 concurrent submitters")
+    writes.add_argument('--per-submitter', type=int, default=50)
+    writes.add_argument('--window-ms', type=float, default=2.0)
+    features = sub.add_parser('features', help="one-row DataFrame construction vs compiled feature schemas")
+    features.add_argument('--iterations', type=int, default=2000)
+    batching = sub.add_parser('batching', help="sequential, parallel and micro-batched inference under load")
+    batching.add_argument('--requests-per-client', type=int, default=40)
+    batching.add_argument('--wait-ms', type=float, default=2.0)
+    batching.add_argument('--max-batch', type=int, default=32)
+    batching.add_argument('--workers', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.command == 'writes':
+        bench_writes(args)
+    elif args.command == 'features':
+        bench_features(args)
+    elif args.command == 'batching':
+        bench_batching(args)
@@ -0,0 +1,104 @@
+"""
+Precompiled feature schemas for the three disorder models.
+
+A FeatureSchema is built once per model at startup from its column list,
+per-column dtypes and categorical encodings. At request time the input values
+are written straight into a preallocated row, instead of building a one-row
+pandas DataFrame from a dict for every prediction.
+
+Models fitted on plain arrays (no feature_names_in_) with fully numeric or
+encodable inputs are fed the float64 array directly. Models fitted on
+DataFrames, or which take raw category strings, keep getting a DataFrame with
+the exact columns and dtypes they were trained on.
+
+Usage:
+    python benchmark.py features
+"""
+from importlib.util import find_spec
+
+import numpy as np
+
+# pandas is only imported when a model actually needs a DataFrame
+HAS_PANDAS = find_spec('pandas') is not None
+
+DEPRESSION_COLUMNS = [
+    "Age", "SleepDuration", "Cortisol", "Vitamin_D", "Genotype_5HTTLPR",
+    "Genotype_COMT", "Genotype_MAOA", "BDNF_Level", "CRP", "Tryptophan",
+    "Omega3_Index", "MTHFR_Genotype", "Neuroinflammation_Score",
+    "Monoamine_Oxidase_Level", "Serotonin_Level", "HPA_Axis_Dysregulation",
+    "DepressionScore_PHQ9",
+]
+
+BIPOLAR_COLUMNS = [
+    "Age", "Sex", "Family_History", "ANK3_rs10994336", "CACNA1C_rs1006737",
+    "ODZ4_rs12576775", "Glutamate_Level", "Tryptophan_Metabolites", "Cortisol_Level",
+    "Circadian_Gene_Disruption", "Mitochondrial_Dysfunction", "Neuroinflammation",
+    "Omega3_Intake", "Folate_Level", "VitaminD_Level", "Average_Sleep_Hours",
+    "Physical_Activity_Level",
+]
+
+# Columns passed to the models as strings; everything else is numeric
+CATEGORICAL_FEATURES = {
+    "Genotype_5HTTLPR", "Genotype_COMT", "Genotype_MAOA", "MTHFR_Genotype",
+    "Sex", "Family_History", "ANK3_rs10994336", "CACNA1C_rs1006737", "ODZ4_rs12576775",
+    "Glutamate_Level", "Tryptophan_Metabolites", "Cortisol_Level", "Circadian_Gene_Disruption",
+    "Mitochondrial_Dysfunction", "Neuroinflammation", "Omega3_Intake", "Folate_Level",
+    "VitaminD_Level", "Physical_Activity_Level",
+}
+INTEGER_FEATURES = {"Age", "DepressionScore_PHQ9", "AnxietyScore_GAD7"}
+
+
+class FeatureSchema:
+    def __init__(self, name, columns, model=None, category_mappings=None):
+        self.name = name
+        self.columns = list(columns)
+        self.categorical = [col in CATEGORICAL_FEATURES for col in self.columns]
+        self.dtypes = [object if cat else (np.int64 if col in INTEGER_FEATURES else np.float64)
+                       for col, cat in zip(self.columns, self.categorical)]
+
+        # Metadata mappings are stored as code -> label; invert them to encode incoming labels
+        self.encodings = {}
+        for col, mapping in (category_mappings or {}).items():
+            if col in self.columns:
+                self.encodings[col] = {label: code for code, label in mapping.items()}
+
+        encodable = all(not cat or col in self.encodings for col, cat in zip(self.columns, self.categorical))
+        self.use_array = (model is not None and encodable
+                          and getattr(model, 'feature_names_in_', None) is None) or not HAS_PANDAS
+        self._slots = list(enumerate(zip(self.columns, self.categorical)))
+
+    def canonical(self, values):
+        """Column values in schema order with their model dtypes, e.g. for hashing (12 and 12.0 match)."""
+        return [str(values[col]) if dtype is object else (int(values[col]) if dtype is np.int64
+                                                          else float(values[col]))
+                for col, dtype in zip(self.columns, self.dtypes)]
+
+    def new_batch(self, n_rows):
+        """Preallocated storage for n_rows samples."""
+        return np.empty((n_rows, len(self.columns)), dtype=np.float64 if self.use_array else object)
+
+    def fill(self, batch, i, values):
+        """Write one sample (a dict keyed by column name) into row i of batch."""
+        row = batch[i]
+        if self.use_array:
+            for j, (col, cat) in self._slots:
+                row[j] = self.encodings[col][values[col]] if cat else values[col]
+        else:
+            for j, (col, _) in self._slots:
+                row[j] = values[col]
+
+    def model_input(self, batch):
+        """Turn a filled batch into what the model's predict() expects."""
+        if self.use_array:
+            return batch
+        import pandas as pd
+        return pd.DataFrame({col: batch[:, j].astype(dtype) for j, (col, dtype)
+                             in enumerate(zip(self.columns, self.dtypes))}, columns=self.columns)
+
+    def vectorize(self, rows):
+        """Model input for a list of samples."""
+        batch = self.new_batch(len(rows))
+        for i, values in enumerate(rows):
+            self.fill(batch, i, values)
+        return self.model_input(batch)
+
@@ -0,0 +1,196 @@
+"""
+Model inference for the three disorder classifiers.
+
+DisorderModel bundles a fitted model with its FeatureSchema and label
+decoding, so callers deal only in input dicts and label strings.
+
+BatchDispatcher turns many concurrent single-patient requests into a few
+batched predict() calls: each model has a worker thread that collects pending
+rows for up to max_wait seconds (or max_batch rows), runs one predict for the
+whole batch and hands each request its own label back. A single sklearn
+predict call has a large fixed overhead, so under concurrent load this costs
+far less than one call per request.
+
+ParallelPredictor is the per-request alternative: the three models of one
+request are predicted (and decoded) side by side on a shared thread pool, which
+helps because scikit-learn releases the GIL in much of its numeric code. Each
+model's time is recorded, together with which model was slowest, so the
+critical path of a request is visible at /metrics.
+
+Usage:
+    python benchmark.py batching
+"""
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from security import LatencyHistogram
+
+# Single predictions are sub-millisecond to tens of milliseconds
+PREDICT_BUCKETS_MS = (0.5, 1, 2, 5, 10, 25, 50, 100, 250)
+
+
+class DisorderModel:
+    def __init__(self, name, model, schema, decode):
+        self.name = name
+        self.model = model
+        self.schema = schema
+        self.decode = decode    # array of predicted codes -> list of label strings
+
+    def predict_rows(self, rows):
+        """Labels for a list of input dicts."""
+        return list(self.decode(self.model.predict(self.schema.vectorize(rows))))
+
+
+def predict_direct(models, inputs):
+    """Predict each model's single input inline: {name: input dict} -> {name: label}."""
+    return {name: models[name].predict_rows([row])[0] for name, row in inputs.items()}
+
+
+def prediction_pool(workers):
+    """Thread pool for ParallelPredictor, shared across model reloads; None for sequential prediction."""
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='predict') if workers > 0 else None
+
+
+class ParallelPredictor:
+    def __init__(self, models, workers=0, executor=None):
+        self.models = models
+        # workers=0 predicts the models one after another on the request thread
+        self._executor = executor if executor is not None else prediction_pool(workers)
+        self.workers = workers
+        self.histograms = {name: LatencyHistogram(PREDICT_BUCKETS_MS) for name in models}
+        self.request_histogram = LatencyHistogram(PREDICT_BUCKETS_MS)
+        self._lock = threading.Lock()
+        self.slowest = {name: 0 for name in models}
+
+    def _timed(self, name, row):
+        start = time.perf_counter()
+        label = self.models[name].predict_rows([row])[0]
+        return label, (time.perf_counter() - start) * 1000
+
+    def predict_all(self, inputs):
+        """{name: input dict} -> {name: label}."""
+        start = time.perf_counter()
+        if self._executor is None:
+            timed = {name: self._timed(name, row) for name, row in inputs.items()}
+        else:
+            futures = {name: self._executor.submit(self._timed, name, row) for name, row in inputs.items()}
+            timed = {name: future.result() for name, future in futures.items()}
+        self.request_histogram.observe((time.perf_counter() - start) * 1000)
+
+        for name, (_, elapsed_ms) in timed.items():
+            self.histograms[name].observe(elapsed_ms)
+        with self._lock:
+            self.slowest[max(timed, key=lambda name: timed[name][1])] += 1
+        return {name: label for name, (label, _) in timed.items()}
+
+    def stats(self):
+        with self._lock:
+            slowest = dict(self.slowest)
+        return {
+            'workers': self.workers,
+            'request': self.request_histogram.snapshot(),
+            'models': {name: h.snapshot() for name, h in self.histograms.items()},
+            'slowest_model': slowest,
+        }
+
+
+class _PendingRow:
+    __slots__ = ('row', 'done', 'label', 'error')
+
+    def __init__(self, row):
+        self.row = row
+        self.done = threading.Event()
+        self.label = None
+        self.error = None
+
+
+class BatchDispatcher:
+    def __init__(self, models, max_wait=0.002, max_batch=32):
+        self.models = models
+        self.max_wait = max_wait
+        self.max_batch = max_batch
+        self.stats = {name: {'batches': 0, 'rows': 0, 'max_batch_seen': 0} for name in models}
+        self._queues = {name: queue.Queue() for name in models}
+        self._closed = False
+        self._close_lock = threading.Lock()
+        for name in models:
+            threading.Thread(target=self._run, args=(name,), name=f'batcher:{name}', daemon=True).start()
+
+    def submit(self, name, row):
+        pending = _PendingRow(row)
+        with self._close_lock:
+            if not self._closed:
+                self._queues[name].put(pending)
+                return pending
+        # Retired by a model reload: requests still holding this dispatcher predict inline
+        self._predict_batch(self.models[name], [pending])
+        return pending
+
+    def close(self):
+        """Stop the workers once the rows already queued are answered."""
+        with self._close_lock:
+            self._closed = True
+            for q in self._queues.values():
+                q.put(None)
+
+    @staticmethod
+    def result(pending):
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.label
+
+    def predict(self, name, row):
+        return self.result(self.submit(name, row))
+
+    def predict_all(self, inputs):
+        """{name: input dict} -> {name: label}; all models are queued before waiting on any of them."""
+        pending = {name: self.submit(name, row) for name, row in inputs.items()}
+        return {name: self.result(p) for name, p in pending.items()}
+
+    def _run(self, name):
+        model = self.models[name]
+        q = self._queues[name]
+        stopping = False
+        while not stopping:
+            first = q.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    pending = q.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if pending is None:
+                    stopping = True
+                    break
+                batch.append(pending)
+            self._predict_batch(model, batch)
+            stats = self.stats[name]
+            stats['batches'] += 1
+            stats['rows'] += len(batch)
+            stats['max_batch_seen'] = max(stats['max_batch_seen'], len(batch))
+
+    @staticmethod
+    def _predict_batch(model, batch):
+        try:
+            labels = model.predict_rows([p.row for p in batch])
+        except Exception:
+            # One bad row must not fail everyone else's request: retry individually
+            for p in batch:
+                try:
+                    p.label = model.predict_rows([p.row])[0]
+                except Exception as e:
+                    p.error = e
+                p.done.set()
+            return
+        for p, label in zip(batch, labels):
+            p.label = label
+            p.done.set()
@@ -0,0 +1,211 @@
+"""
+Declarative schema for one patient's inputs.
+
+PATIENT_FIELDS lists every field of the /analyze form once: its type, the
+allowed range or choices (the same limits as the form), and the model columns
+it feeds. InputSchema compiles that table once at import into a parser per
+field, so a submission is parsed in a single pass: each field is converted
+and checked exactly once, then fanned out to the depression, bipolar and
+anxiety input layouts. Age, sleep, genotypes and the shared lab values
+therefore cannot disagree between the three models.
+
+Problems are collected per field rather than stopping at the first one, and
+raised together as an InputError. The form view, the JSON API and batch
+scoring all parse through PATIENT_SCHEMA, and JSON, CSV or form strings are
+all accepted ("30" and 30 are the same age).
+"""
+import math
+
+# Field types
+INT, FLOAT, CHOICE = 'int', 'float', 'choice'
+
+
+class Field:
+    def __init__(self, name, label, kind, targets, minimum=None, maximum=None, choices=None):
+        self.name = name                # form / JSON / CSV field name
+        self.label = label              # shown in error messages
+        self.kind = kind
+        self.targets = targets          # [(model, column)] that receive the parsed value
+        self.minimum = minimum
+        self.maximum = maximum
+        self.choices = choices
+
+
+def _numeric(name, label, kind, targets, minimum=0, maximum=None):
+    return Field(name, label, kind, targets, minimum=minimum, maximum=maximum)
+
+
+def _choice(name, label, targets, choices):
+    return Field(name, label, CHOICE, targets, choices=choices)
+
+
+D, B, A = 'depression', 'bipolar', 'anxiety'
+
+PATIENT_FIELDS = [
+    # Demographics and lifestyle
+    _numeric('age', 'Age', INT, [(D, 'Age'), (B, 'Age'), (A, 'Age')], 1, 120),
+    _choice('sex', 'Sex', [(B, 'Sex')], ('Male', 'Female')),
+    _choice('family_history', 'Family history', [(B, 'Family_History')], ('Yes', 'No')),
+    _choice('physical_activity', 'Physical activity', [(B, 'Physical_Activity_Level')], ('High', 'Moderate', 'Low')),
+    _numeric('sleep_duration', 'Sleep duration', FLOAT,
+             [(D, 'SleepDuration'), (B, 'Average_Sleep_Hours'), (A, 'SleepDuration')], 0, 24),
+
+    # Biomarkers (concentrations only need to be non-negative; scores use the form's ranges)
+    _numeric('cortisol', 'Cortisol', FLOAT, [(D, 'Cortisol'), (A, 'Cortisol')]),
+    _numeric('vitamin_d', 'Vitamin D', FLOAT, [(D, 'Vitamin_D')]),
+    _numeric('bdnf_level', 'BDNF level', FLOAT, [(D, 'BDNF_Level')]),
+    _numeric('crp', 'CRP', FLOAT, [(D, 'CRP')]),
+    _numeric('tryptophan', 'Tryptophan', FLOAT, [(D, 'Tryptophan'), (A, 'Tryptophan')]),
+    _numeric('omega3_index', 'Omega-3 index', FLOAT, [(D, 'Omega3_Index'), (A, 'Omega3_Index')]),
+    _numeric('mao_level', 'MAO level', FLOAT, [(D, 'Monoamine_Oxidase_Level')]),
+    _numeric('serotonin_level', 'Serotonin level', FLOAT, [(D, 'Serotonin_Level')]),
+    _numeric('hpa_dysregulation', 'HPA axis dysregulation', FLOAT,
+             [(D, 'HPA_Axis_Dysregulation'), (A, 'HPA_Axis_Dysregulation')], 0, 1),
+    _numeric('alpha_amylase', 'Alpha-amylase', FLOAT, [(A, 'Alpha_Amylase')]),
+    _numeric('HRV', 'Heart rate variability', FLOAT, [(A, 'HRV (Heart Rate Variability)')]),
+    _numeric('gaba', 'GABA', FLOAT, [(A, 'GABA')]),
+    _numeric('IL6', 'IL-6', FLOAT, [(A, 'IL6')]),
+    _numeric('TNF_alpha', 'TNF-alpha', FLOAT, [(A, 'TNF_alpha')]),
+    _numeric('Vitamin_B6', 'Vitamin B6', FLOAT, [(A, 'Vitamin_B6')]),
+    _numeric('neuroinflammation_score', 'Neuroinflammation score', FLOAT, [(D, 'Neuroinflammation_Score')], 0, 10),
+    _numeric('Sympathetic_Activation_Score', 'Sympathetic activation score', FLOAT,
+             [(A, 'Sympathetic_Activation_Score')], 0, 10),
+    _numeric('gaba_function', 'GABAergic function score', FLOAT, [(A, 'GABAergic_Function_Score')], 0, 10),
+
+    # Genetics
+    _choice('genotype_5httlpr', '5-HTTLPR genotype', [(D, 'Genotype_5HTTLPR'), (A, 'Genotype_5HTTLPR')],
+            ('S/S', 'S/L', 'L/L')),
+    _choice('genotype_comt', 'COMT genotype', [(D, 'Genotype_COMT'), (A, 'Genotype_COMT')],
+            ('Val/Val', 'Val/Met', 'Met/Met')),
+    _choice('genotype_maoa', 'MAOA genotype', [(D, 'Genotype_MAOA'), (A, 'Genotype_MAOA')], ('Low', 'High')),
+    _choice('mthfr_genotype', 'MTHFR genotype', [(D, 'MTHFR_Genotype')], ('CC', 'CT', 'TT')),
+    _choice('ank3_rs10994336', 'ANK3 rs10994336', [(B, 'ANK3_rs10994336')], ('GG', 'AG', 'AA')),
+    _choice('cacna1c_rs1006737', 'CACNA1C rs1006737', [(B, 'CACNA1C_rs1006737')], ('AA', 'AC', 'CC')),
+    _choice('odz4_rs12576775', 'ODZ4 rs12576775', [(B, 'ODZ4_rs12576775')], ('AA', 'AG', 'GG')),
+
+    # Bipolar-specific markers
+    _choice('glutamate_level', 'Glutamate level', [(B, 'Glutamate_Level')], ('Normal', 'Elevated', 'Low')),
+    _choice('tryptophan_metabolites', 'Tryptophan metabolites', [(B, 'Tryptophan_Metabolites')],
+            ('Normal', 'Disrupted')),
+    _choice('cortisol_level', 'Cortisol level', [(B, 'Cortisol_Level')], ('Normal', 'Elevated', 'Low')),
+    _choice('circadian_gene_disruption', 'Circadian gene disruption', [(B, 'Circadian_Gene_Disruption')],
+            ('No', 'Yes')),
+    _choice('mitochondrial_dysfunction', 'Mitochondrial dysfunction', [(B, 'Mitochondrial_Dysfunction')],
+            ('No', 'Yes')),
+    _choice('neuroinflammation', 'Neuroinflammation', [(B, 'Neuroinflammation')], ('No', 'Yes')),
+    _choice('omega3_intake', 'Omega-3 intake', [(B, 'Omega3_Intake')], ('Normal', 'Low')),
+    _choice('folate_level', 'Folate level', [(B, 'Folate_Level')], ('Normal', 'Low')),
+    _choice('vitamind_level', 'Vitamin D level', [(B, 'VitaminD_Level')], ('Normal', 'Low')),
+
+    # Questionnaires
+    _numeric('phq9_score', 'PHQ-9 score', INT, [(D, 'DepressionScore_PHQ9')], 0, 27),
+    _numeric('anxiety_score', 'GAD-7 score', INT, [(A, 'AnxietyScore_GAD7')], 0, 21),
+]
+
+
+class InputError(ValueError):
+    """Invalid patient input. `errors` maps field name -> message for every field that failed."""
+
+    def __init__(self, errors, labels=None):
+        self.errors = errors
+        labels = labels or {}
+        super().__init__('; '.join(message if name == '_' else f'{labels.get(name, name)}: {message}'
+                                   for name, message in errors.items()))
+
+
+# int() and float() already ignore surrounding whitespace in strings
+
+def _parse_int(value):
+    if value is True or value is False or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError
+    return int(value)
+
+
+def _parse_float(value):
+    if value is True or value is False:
+        raise ValueError
+    value = float(value)
+    if not math.isfinite(value):
+        raise ValueError
+    return value
+
+
+def _compile_field(field):
+    """A function raw value -> parsed value, raising ValueError with the message to report."""
+    if field.kind == CHOICE:
+        choices = frozenset(field.choices)
+        expected = 'one of ' + ', '.join(field.choices)
+
+        def parse(raw):
+            value = raw.strip() if isinstance(raw, str) else raw
+            if not isinstance(value, str) or value not in choices:
+                raise ValueError(f'must be {expected}')
+            return value
+        return parse
+
+    convert, noun = (_parse_int, 'a whole number') if field.kind == INT else (_parse_float, 'a number')
+    low, high = field.minimum, field.maximum
+    if low is not None and high is not None:
+        bounds = f'between {low} and {high}'
+    elif low is not None:
+        bounds = f'at least {low}'
+    else:
+        bounds = f'at most {high}'
+    lowest = low if low is not None else -math.inf
+    highest = high if high is not None else math.inf
+
+    def parse(raw):
+        try:
+            value = convert(raw)
+        except (TypeError, ValueError, OverflowError):
+            raise ValueError(f'must be {noun}') from None
+        if not lowest <= value <= highest:
+            raise ValueError(f'must be {bounds}')
+        return value
+    return parse
+
+
+class InputSchema:
+    def __init__(self, fields):
+        self.fields = list(fields)
+        self.labels = {field.name: field.label for field in self.fields}
+        self.models = sorted({model for field in self.fields for model, _ in field.targets})
+        self._compiled = [(field.name, _compile_field(field), field.targets) for field in self.fields]
+
+    def parse(self, data):
+        """{'depression', 'bipolar', 'anxiety'} model input dicts from one patient's fields, or InputError."""
+        if not hasattr(data, 'get'):
+            raise InputError({'_': 'expected an object of patient fields'})
+        inputs = {model: {} for model in self.models}
+        errors = {}
+        for name, parse, targets in self._compiled:
+            raw = data.get(name)
+            if raw is None or raw == '' or (isinstance(raw, str) and raw.isspace()):
+                errors[name] = 'is required'
+                continue
+            try:
+                value = parse(raw)
+            except ValueError as e:
+                errors[name] = str(e)
+                continue
+            for model, column in targets:
+                inputs[model][column] = value
+        if errors:
+            raise InputError(errors, self.labels)
+        return inputs
+
+
+PATIENT_SCHEMA = InputSchema(PATIENT_FIELDS)
+
+
+def patient_inputs(data):
+    """The three model input dicts for one patient (form, JSON object or CSV row); raises InputError."""
+    return PATIENT_SCHEMA.parse(data)
+
+
+def parse_patient(raw):
+    """(model inputs, None) for a patient record, or (None, InputError) if it cannot be used."""
+    try:
+        return patient_inputs(raw), None
+    except InputError as e:
+        return None, e
@@ -0,0 +1,186 @@
+"""
+Single-writer journal with group commit for the JSON data files.
+
+Every mutation of users.json / results.jsonl is handed to a writer thread
+instead of being applied inline by the request. The writer waits a short
+window for more mutations to arrive, then applies the whole batch as one
+commit while holding an exclusive file lock, so concurrent threads *and*
+concurrent worker processes never lose each other's updates, and a burst of
+N submissions costs one rewrite instead of N.
+
+JSON documents are written to a temporary file and atomically renamed over
+the original, so readers never see a half-written file.
+"""
+import json
+import os
+import queue
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+
+class FileLock:
+    """Exclusive lock shared by threads (threading.Lock) and processes (flock on <path>.lock)."""
+
+    def __init__(self, path):
+        self.lock_path = path + '.lock'
+        self._thread_lock = threading.Lock()
+        self._fd = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if fcntl is not None:
+            self._fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+        self._thread_lock.release()
+
+
+def atomic_write_json(filename, data, fsync=True):
+    """Write data to a temp file next to filename and rename it into place."""
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(filename) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=4)
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp, filename)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+class _Pending:
+    __slots__ = ('op', 'done', 'result', 'error')
+
+    def __init__(self, op):
+        self.op = op
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class GroupCommitWriter:
+    """
+    Runs commit_fn(ops) on a dedicated thread, batching ops submitted within `window` seconds
+    (up to max_batch per commit). commit_fn returns one result per op; an op's result may be an
+    Exception instance, which is re-raised in the submitting thread.
+    """
+
+    def __init__(self, commit_fn, window=0.002, max_batch=256, name='group-commit'):
+        self.commit_fn = commit_fn
+        self.window = window
+        self.max_batch = max_batch
+        self.stats = {'commits': 0, 'ops': 0, 'max_batch_seen': 0}
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, op):
+        pending = _Pending(op)
+        self._queue.put(pending)
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def submit_many(self, ops):
+        """Queue several ops at once (so they can share commits) and wait for all of them."""
+        pendings = [_Pending(op) for op in ops]
+        for pending in pendings:
+            self._queue.put(pending)
+        for pending in pendings:
+            pending.done.wait()
+        for pending in pendings:
+            if pending.error is not None:
+                raise pending.error
+        return [pending.result for pending in pendings]
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._commit(batch)
+
+    def _commit(self, batch):
+        try:
+            results = self.commit_fn([p.op for p in batch])
+        except Exception as e:
+            results = [e] * len(batch)
+        for pending, result in zip(batch, results):
+            if isinstance(result, Exception):
+                pending.error = result
+            else:
+                pending.result = result
+            pending.done.set()
+        self.stats['commits'] += 1
+        self.stats['ops'] += len(batch)
+        self.stats['max_batch_seen'] = max(self.stats['max_batch_seen'], len(batch))
+
+
+class JsonDocumentWriter:
+    """
+    Group-committed read-modify-write of a JSON document.
+
+    submit(mutation) calls mutation(data) on the freshly loaded document under the file lock and
+    returns its result. Mutations should check their preconditions before changing anything; if a
+    mutation raises, the error is returned to its caller and the rest of the batch still commits.
+    on_commit(path, data) is called after each commit while the lock is still held.
+    """
+
+    def __init__(self, path, window=0.002, max_batch=256, fsync=True, on_commit=None, default=list):
+        self.path = path
+        self.default = default
+        self.fsync = fsync
+        self.on_commit = on_commit
+        self.lock = FileLock(path)
+        self._writer = GroupCommitWriter(self._commit, window=window, max_batch=max_batch,
+                                         name=f'writer:{os.path.basename(path)}')
+
+    @property
+    def stats(self):
+        return self._writer.stats
+
+    def submit(self, mutation):
+        return self._writer.submit(mutation)
+
+    def _commit(self, mutations):
+        with self.lock:
+            if os.path.exists(self.path):
+                with open(self.path, 'r') as f:
+                    data = json.load(f)
+            else:
+                data = self.default()
+            results = []
+            for mutation in mutations:
+                try:
+                    results.append(mutation(data))
+                except Exception as e:
+                    results.append(e)
+            atomic_write_json(self.path, data, fsync=self.fsync)
+            if self.on_commit:
+                # Still under the lock, so the file on disk is exactly `data`
+                self.on_commit(self.path, data)
+        return results
@@ -0,0 +1,377 @@
+"""
+numpy-only inference for the three disorder models.
+
+`python lite_runtime.py export` converts the fitted estimators in
+backend/models/ into plain arrays in backend/models/lite_models.npz, together
+with each model's input columns, categorical encodings and label decoding
+(the LabelEncoder classes and the anxiety mappings). Loading that file needs
+only numpy, so a worker that uses it never imports scikit-learn, pandas or
+joblib.
+
+Supported estimators:
+    DummyClassifier         constant / most_frequent / prior strategies
+    DecisionTreeClassifier, RandomForestClassifier, ExtraTreesClassifier
+    LogisticRegression, LinearSVC, RidgeClassifier, SGDClassifier (linear)
+Anything else (pipelines, gradient boosting, ...) is refused at export time,
+and the app keeps using the joblib artifacts. Trees and linear models need
+numeric inputs: every categorical column must have an encoding in the
+metadata, and a model fitted on a DataFrame must have seen the columns in the
+schema's order. Arrays of Python objects (e.g. classes_ from a model fitted on
+a pandas Series of strings) are refused too, since the loader never unpickles.
+
+The export records the checksum of the artifacts it was made from. The model
+registry only uses the file while that checksum still matches, so retrained
+artifacts that have not been re-exported are served by scikit-learn.
+
+Usage:
+    python lite_runtime.py export [--model-dir backend/models]
+    python lite_runtime.py check [--model-dir backend/models] [--samples 2000]
+    python lite_runtime.py compare [--model-dir backend/models]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from features import FeatureSchema, DEPRESSION_COLUMNS, BIPOLAR_COLUMNS, CATEGORICAL_FEATURES
+
+LITE_FILE = 'lite_models.npz'
+FORMAT_VERSION = 1
+
+
+class LiteSchema(FeatureSchema):
+    """FeatureSchema that always builds the float array; models that ignore their input get no columns."""
+
+    def __init__(self, name, columns, category_mappings=None, needs_features=True):
+        super().__init__(name, columns, category_mappings=category_mappings)
+        self.use_array = True
+        self.needs_features = needs_features
+
+    def vectorize(self, rows):
+        if not self.needs_features:
+            return np.empty((len(rows), 0))
+        return super().vectorize(rows)
+
+
+class LiteConstant:
+    feature_names_in_ = None
+
+    def __init__(self, code):
+        self.code = code
+
+    def predict(self, X):
+        return np.full(len(X), self.code)
+
+
+class LiteLinear:
+    feature_names_in_ = None
+
+    def __init__(self, coef, intercept, classes):
+        self.coef = coef
+        self.intercept = intercept
+        self.classes = classes
+
+    def predict(self, X):
+        scores = X @ self.coef.T + self.intercept
+        if scores.shape[1] == 1:
+            return self.classes[(scores[:, 0] > 0).astype(int)]
+        return self.classes[np.argmax(scores, axis=1)]
+
+
+class LiteTrees:
+    """
+    One or more decision trees stored as flat node arrays, children as absolute indices. Leaves point to
+    themselves, so every tree can be walked at once, level by level, for the whole batch: after `depth`
+    steps each walk has reached its leaf. Leaf class fractions are averaged over trees like predict_proba
+    of a forest.
+    """
+    feature_names_in_ = None
+
+    def __init__(self, left, right, feature, threshold, value, roots, depth, classes):
+        self.left = left
+        self.right = right
+        self.feature = feature
+        self.threshold = threshold
+        self.value = value
+        self.roots = roots
+        self.depth = int(depth)
+        self.classes = classes
+
+    def predict(self, X):
+        # Trees compare float32 features against float64 thresholds, as scikit-learn does
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), len(self.roots))).copy()
+        for _ in range(self.depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        proba = self.value[nodes].mean(axis=1)
+        return self.classes[np.argmax(proba, axis=1)]
+
+
+# Export (needs scikit-learn and joblib)
+
+def _tree_arrays(trees):
+    left, right, feature, threshold, value, roots = [], [], [], [], [], []
+    offset = 0
+    depth = 0
+    for tree in trees:
+        t = tree.tree_
+        n = t.node_count
+        is_leaf = t.children_left == -1
+        own = np.arange(n) + offset
+        left.append(np.where(is_leaf, own, t.children_left + offset))
+        right.append(np.where(is_leaf, own, t.children_right + offset))
+        feature.append(np.where(is_leaf, 0, t.feature))
+        threshold.append(t.threshold)
+        fractions = t.value[:, 0, :]
+        value.append(fractions / fractions.sum(axis=1, keepdims=True))
+        roots.append(offset)
+        offset += n
+        depth = max(depth, t.max_depth)
+    return {
+        'left': np.concatenate(left).astype(np.int64),
+        'right': np.concatenate(right).astype(np.int64),
+        'feature': np.concatenate(feature).astype(np.int64),
+        'threshold': np.concatenate(threshold).astype(np.float64),
+        'value': np.concatenate(value).astype(np.float64),
+        'roots': np.array(roots, dtype=np.int64),
+        'depth': np.array(depth),
+    }
+
+
+def export_estimator(model):
+    """(kind, {array name: array}) for a fitted estimator, or ValueError if it is not supported."""
+    from sklearn.dummy import DummyClassifier
+    from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+    from sklearn.linear_model import LogisticRegression, RidgeClassifier, SGDClassifier
+    from sklearn.svm import LinearSVC
+    from sklearn.tree import DecisionTreeClassifier
+
+    if isinstance(model, DummyClassifier):
+        if model.strategy == 'constant':
+            code = np.asarray(model.constant).reshape(-1)[0]
+        elif model.strategy in ('most_frequent', 'prior'):
+            code = model.classes_[np.argmax(model.class_prior_)]
+        else:
+            raise ValueError(f"DummyClassifier strategy '{model.strategy}' is random and cannot be exported")
+        return 'constant', {'code': np.asarray(code)}
+    if isinstance(model, (RandomForestClassifier, ExtraTreesClassifier)):
+        if getattr(model, 'n_outputs_', 1) != 1:
+            raise ValueError('multi-output forests are not supported')
+        return 'trees', {**_tree_arrays(model.estimators_), 'classes': np.asarray(model.classes_)}
+    if isinstance(model, DecisionTreeClassifier):
+        if getattr(model, 'n_outputs_', 1) != 1:
+            raise ValueError('multi-output trees are not supported')
+        return 'trees', {**_tree_arrays([model]), 'classes': np.asarray(model.classes_)}
+    if isinstance(model, (LogisticRegression, LinearSVC, RidgeClassifier, SGDClassifier)):
+        return 'linear', {'coef': np.asarray(model.coef_, dtype=np.float64),
+                          'intercept': np.asarray(model.intercept_, dtype=np.float64).reshape(-1),
+                          'classes': np.asarray(model.classes_)}
+    raise ValueError(f'{type(model).__name__} is not supported by the lite runtime')
+
+
+def export_models(model_dir, out_path=None):
+    """Write the lite file for the artifacts in model_dir; returns its path."""
+    from model_registry import artifact_paths, artifacts_checksum, load_artifacts
+
+    paths = artifact_paths(model_dir)
+    version = artifacts_checksum(paths)
+    artifacts, _ = load_artifacts(paths)
+    anxiety_metadata = artifacts['anxiety_metadata']
+    anxiety_mappings = anxiety_metadata['category_mappings']
+
+    specs = {
+        'depression': (artifacts['depression_model'], DEPRESSION_COLUMNS, {},
+                       dict(enumerate(artifacts['depression_encoder'].classes_.tolist()))),
+        'bipolar': (artifacts['bipolar_model'], BIPOLAR_COLUMNS, {},
+                    dict(enumerate(artifacts['bipolar_encoder'].classes_.tolist()))),
+        'anxiety': (artifacts['anxiety_model'], anxiety_metadata['columns'], anxiety_mappings,
+                    anxiety_mappings['AnxietyDiagnosis']),
+    }
+    arrays = {}
+    meta = {'format': FORMAT_VERSION, 'source_version': version, 'models': {}}
+    for name, (model, columns, mappings, labels) in specs.items():
+        kind, model_arrays = export_estimator(model)
+        columns = list(columns)
+        needs_features = kind != 'constant'
+        mappings = {col: {str(code): label for code, label in mapping.items()}
+                    for col, mapping in mappings.items() if col in columns}
+        if needs_features:
+            unencoded = [col for col in columns if col in CATEGORICAL_FEATURES and col not in mappings]
+            if unencoded:
+                raise ValueError(f"{name}: categorical columns without an encoding: {', '.join(unencoded)}")
+            n_features = getattr(model, 'n_features_in_', len(columns))
+            if n_features != len(columns):
+                raise ValueError(f'{name}: model expects {n_features} features, schema has {len(columns)}')
+            # The lite runtime feeds a plain array in schema order, so a DataFrame fit must use the same order
+            fitted_names = getattr(model, 'feature_names_in_', None)
+            if fitted_names is not None and list(fitted_names) != columns:
+                raise ValueError(f'{name}: model was fitted on columns in a different order than the schema')
+        for key, array in model_arrays.items():
+            if array.dtype == object:
+                raise ValueError(f'{name}: {key} is an array of Python objects, which the lite file cannot hold')
+            arrays[f'{name}/{key}'] = array
+        meta['models'][name] = {
+            'kind': kind,
+            'columns': columns,
+            'category_mappings': mappings,
+            'needs_features': needs_features,
+            'labels': [[code, label] for code, label in
+                       ((c.item() if hasattr(c, 'item') else c, l) for c, l in labels.items())],
+        }
+    arrays['__meta__'] = np.array(json.dumps(meta))
+
+    out_path = out_path or os.path.join(model_dir, LITE_FILE)
+    tmp = out_path + '.tmp.npz'
+    np.savez(tmp, **arrays)
+    os.replace(tmp, out_path)
+    return out_path
+
+
+# Loading (numpy only)
+
+def _mapping_keys(mapping):
+    """Encodings were written with string codes; restore the numeric codes the models were fitted on."""
+    restored = {}
+    for code, label in mapping.items():
+        try:
+            restored[int(code)] = label
+        except ValueError:
+            restored[code] = label
+    return restored
+
+
+def read_meta(path):
+    with np.load(path, allow_pickle=False) as data:
+        return json.loads(str(data['__meta__']))
+
+
+def load_lite_models(path):
+    """(source version, {name: DisorderModel}) from a lite file."""
+    from inference import DisorderModel
+
+    models = {}
+    with np.load(path, allow_pickle=False) as data:
+        meta = json.loads(str(data['__meta__']))
+        if meta.get('format') != FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported lite format {meta.get('format')}")
+        for name, spec in meta['models'].items():
+            arrays = {key.split('/', 1)[1]: data[key] for key in data.files if key.startswith(name + '/')}
+            kind = spec['kind']
+            if kind == 'constant':
+                estimator = LiteConstant(arrays['code'][()])
+            elif kind == 'linear':
+                estimator = LiteLinear(arrays['coef'], arrays['intercept'], arrays['classes'])
+            else:
+                estimator = LiteTrees(arrays['left'], arrays['right'], arrays['feature'], arrays['threshold'],
+                                      arrays['value'], arrays['roots'], arrays['depth'], arrays['classes'])
+            schema = LiteSchema(name, spec['columns'],
+                                {col: _mapping_keys(m) for col, m in spec['category_mappings'].items()},
+                                needs_features=spec['needs_features'])
+            labels = {code: label for code, label in spec['labels']}
+            models[name] = DisorderModel(name, estimator, schema,
+                                         lambda codes, labels=labels: [labels[c] for c in codes.tolist()])
+    return meta['source_version'], models
+
+
+# Parity and resource checks
+
+def _random_inputs(schema, n, rng):
+    """n synthetic patients around the smoke input: numeric fields scaled, categoricals drawn from encodings."""
+    from model_registry import SMOKE_INPUTS
+    base = SMOKE_INPUTS[schema.name]
+    rows = []
+    for _ in range(n):
+        row = {}
+        for col, categorical in zip(schema.columns, schema.categorical):
+            if categorical:
+                choices = list(schema.encodings.get(col, {base[col]: 0}))
+                row[col] = choices[rng.integers(len(choices))]
+            elif col in ('Age', 'DepressionScore_PHQ9', 'AnxietyScore_GAD7'):
+                row[col] = int(rng.integers(0, 2 * max(1, base[col]) + 1))
+            else:
+                row[col] = float(base[col]) * float(rng.uniform(0, 2))
+        rows.append(row)
+    return rows
+
+
+def check_parity(model_dir, samples=2000, seed=0):
+    """Compare lite predictions with the scikit-learn models on random inputs; returns True on a full match."""
+    from model_registry import artifact_paths, build_disorder_models, load_artifacts
+
+    version, lite = load_lite_models(os.path.join(model_dir, LITE_FILE))
+    artifacts, _ = load_artifacts(artifact_paths(model_dir))
+    reference = build_disorder_models(artifacts)
+    rng = np.random.default_rng(seed)
+    ok = True
+    for name, lite_model in lite.items():
+        rows = _random_inputs(lite_model.schema, samples, rng)
+        expected = reference[name].predict_rows(rows)
+        got = lite_model.predict_rows(rows)
+        mismatches = sum(a != b for a, b in zip(expected, got))
+        ok = ok and mismatches == 0
+        print(f"{name:<12}{type(reference[name].model).__name__:<28}{samples} rows, {mismatches} mismatches")
+    return ok
+
+
+_PROBE = r'''
+import json, resource, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+from model_registry import SMOKE_INPUTS
+if {runtime!r} == 'lite':
+    from lite_runtime import load_lite_models
+    _, models = load_lite_models({lite!r})
+else:
+    from model_registry import artifact_paths, build_disorder_models, load_artifacts
+    models = build_disorder_models(load_artifacts(artifact_paths({model_dir!r}))[0])
+for name, model in models.items():
+    model.predict_rows([SMOKE_INPUTS[name]])
+startup = time.perf_counter() - start
+start = time.perf_counter()
+for _ in range(200):
+    for name, model in models.items():
+        model.predict_rows([SMOKE_INPUTS[name]])
+latency = (time.perf_counter() - start) / 200
+print(json.dumps({{'startup_s': startup, 'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                  'request_us': latency * 1e6, 'sklearn': 'sklearn' in sys.modules, 'pandas': 'pandas' in sys.modules}}))
+'''
+
+
+def compare(model_dir):
+    """Startup time, peak RSS and per-request latency of each runtime, each measured in a fresh interpreter."""
+    root = os.path.dirname(os.path.abspath(__file__))
+    print(f"{'runtime':<10}{'startup s':>10}{'RSS MB':>9}{'3 predicts us':>15}  imports")
+    for runtime in ('sklearn', 'lite'):
+        code = _PROBE.format(root=root, runtime=runtime, model_dir=model_dir,
+                             lite=os.path.join(model_dir, LITE_FILE))
+        out = json.loads(subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                                        check=True).stdout)
+        imports = ', '.join(m for m in ('sklearn', 'pandas') if out[m]) or 'numpy only'
+        print(f"{runtime:<10}{out['startup_s']:>10.2f}{out['rss_mb']:>9.0f}{out['request_us']:>15.0f}  {imports}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="numpy-only runtime for the MindGen models")
+    sub = parser.add_subparsers(dest='command', required=True)
+    for command in ('export', 'check', 'compare'):
+        p = sub.add_parser(command)
+        p.add_argument('--model-dir', default='backend/models')
+        if command == 'check':
+            p.add_argument('--samples', type=int, default=2000)
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        started = time.perf_counter()
+        path = export_models(args.model_dir)
+        print(f"Wrote {path} ({os.path.getsize(path) / 1024:.0f} KB, "
+              f"source version {read_meta(path)['source_version']}) in {time.perf_counter() - started:.2f}s")
+    elif args.command == 'check':
+        sys.exit(0 if check_parity(args.model_dir, args.samples) else 1)
+    else:
+        compare(args.model_dir)
@@ -0,0 +1,317 @@
+"""
+Hot-reloadable disorder models.
+
+ModelRegistry owns the six joblib artifacts in backend/models/. A background
+thread re-stats them every `interval` seconds. Once a change has settled (the
+same sizes and mtimes on two consecutive checks) the artifacts are
+checksummed, loaded into a new ModelBundle off the request path, and checked
+with a smoke prediction for each model. Only a bundle that passes replaces the
+active one, with a single reference assignment: a request keeps using the
+bundle it started with, so in-flight requests are never dropped. A bundle that
+fails validation is logged and its checksum is not retried until the files
+change again.
+
+The six artifacts are loaded one after another, or concurrently with
+`concurrent_load=True`. Concurrency only helps when the files have to come
+from a cold disk; with a warm page cache the loads are CPU-bound under the
+GIL and the thread pool makes them slower, so it is opt-in. Either way
+joblib's mmap_mode can be used so that the large numpy arrays inside the
+estimators are mapped from the page cache and shared between forked workers
+rather than copied into each one.
+Before a bundle is activated, a warm-up prediction goes through its runner
+(batching or thread pool), so the first real request does not pay for any
+lazy initialization. Per-artifact load times are kept for /readyz.
+
+If backend/models/lite_models.npz was exported from the current artifacts
+(see lite_runtime.py), the bundle is built from it instead: numpy-only
+evaluators, no scikit-learn, pandas or joblib. A stale export (made from other
+artifacts) is ignored, so retrained models are still picked up before they are
+re-exported, and an export that fails to load or validate is logged and the
+joblib artifacts are loaded instead. Either way the bundle's version is the
+artifacts checksum.
+
+The active bundle's version (a checksum of all artifacts) is stored on every
+result as `model_version`.
+"""
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from features import FeatureSchema, DEPRESSION_COLUMNS, BIPOLAR_COLUMNS
+from inference import DisorderModel, predict_direct
+from lite_runtime import LITE_FILE, load_lite_models, read_meta
+
+ARTIFACTS = {
+    'depression_model': 'DepressionModel.joblib',
+    'depression_encoder': 'DepressionEncoder.joblib',
+    'bipolar_model': 'BDModel.joblib',
+    'bipolar_encoder': 'BD_label_encoder.joblib',
+    'anxiety_model': 'AnxietyModel.joblib',
+    'anxiety_metadata': 'AnxietyMetadata.joblib',
+}
+
+# One representative patient in each model's input layout, used to validate new artifacts
+SMOKE_INPUTS = {
+    'depression': {
+        "Age": 30, "SleepDuration": 6.5, "Cortisol": 15.0, "Vitamin_D": 20.0, "Genotype_5HTTLPR": "S/S",
+        "Genotype_COMT": "Met/Met", "Genotype_MAOA": "Low", "BDNF_Level": 20.0, "CRP": 1.0, "Tryptophan": 50.0,
+        "Omega3_Index": 5.0, "MTHFR_Genotype": "CC", "Neuroinflammation_Score": 5.0,
+        "Monoamine_Oxidase_Level": 1.0, "Serotonin_Level": 100.0, "HPA_Axis_Dysregulation": 0.5,
+        "DepressionScore_PHQ9": 12,
+    },
+    'bipolar': {
+        "Age": 30, "Sex": "Male", "Family_History": "Yes", "ANK3_rs10994336": "GG", "CACNA1C_rs1006737": "AA",
+        "ODZ4_rs12576775": "AA", "Glutamate_Level": "Normal", "Tryptophan_Metabolites": "Normal",
+        "Cortisol_Level": "Normal", "Circadian_Gene_Disruption": "No", "Mitochondrial_Dysfunction": "No",
+        "Neuroinflammation": "No", "Omega3_Intake": "Normal", "Folate_Level": "Normal", "VitaminD_Level": "Normal",
+        "Average_Sleep_Hours": 6.5, "Physical_Activity_Level": "Low",
+    },
+    'anxiety': {
+        "Age": 30, "SleepDuration": 6.5, "Genotype_5HTTLPR": "S/S", "Genotype_COMT": "Met/Met",
+        "Genotype_MAOA": "Low", "Cortisol": 15.0, "Alpha_Amylase": 50.0, "HRV (Heart Rate Variability)": 50.0,
+        "GABA": 1.0, "IL6": 2.0, "TNF_alpha": 2.0, "Tryptophan": 50.0, "Vitamin_B6": 10.0, "Omega3_Index": 5.0,
+        "HPA_Axis_Dysregulation": 0.5, "Sympathetic_Activation_Score": 5.0, "GABAergic_Function_Score": 5.0,
+        "AnxietyScore_GAD7": 7,
+    },
+}
+
+
+def artifact_paths(directory):
+    return {key: os.path.join(directory, filename) for key, filename in ARTIFACTS.items()}
+
+
+def artifacts_checksum(paths):
+    """Version string: SHA-256 over the contents of every artifact."""
+    h = hashlib.sha256()
+    for key in sorted(paths):
+        h.update(key.encode('utf-8'))
+        with open(paths[key], 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+    return h.hexdigest()[:12]
+
+
+def build_disorder_models(artifacts):
+    """DisorderModels (with compiled feature schemas and label decoding) from loaded artifacts."""
+    anxiety_metadata = artifacts['anxiety_metadata']
+    anxiety_mappings = anxiety_metadata['category_mappings']
+    depression_encoder = artifacts['depression_encoder']
+    bipolar_encoder = artifacts['bipolar_encoder']
+
+    depression_schema = FeatureSchema('depression', DEPRESSION_COLUMNS, model=artifacts['depression_model'])
+    bipolar_schema = FeatureSchema('bipolar', BIPOLAR_COLUMNS, model=artifacts['bipolar_model'])
+    anxiety_schema = FeatureSchema('anxiety', anxiety_metadata['columns'], model=artifacts['anxiety_model'],
+                                   category_mappings=anxiety_mappings)
+    return {
+        'anxiety': DisorderModel('anxiety', artifacts['anxiety_model'], anxiety_schema,
+                                 lambda codes: [anxiety_mappings['AnxietyDiagnosis'][c] for c in codes]),
+        'depression': DisorderModel('depression', artifacts['depression_model'], depression_schema,
+                                    lambda codes: depression_encoder.inverse_transform(codes).tolist()),
+        'bipolar': DisorderModel('bipolar', artifacts['bipolar_model'], bipolar_schema,
+                                 lambda codes: bipolar_encoder.inverse_transform(codes).tolist()),
+    }
+
+
+def validate_models(models):
+    """Raise ValueError unless every model turns the smoke input into a non-empty label."""
+    predictions = predict_direct(models, SMOKE_INPUTS)
+    for name, label in predictions.items():
+        if not isinstance(label, str) or not label:
+            raise ValueError(f"{name} model returned {label!r} for the smoke input")
+    return predictions
+
+
+def load_artifacts(paths, mmap_mode=None, concurrent=False):
+    """Load every artifact, on a thread per file if concurrent: ({key: object}, {key: seconds})."""
+    import joblib
+
+    def load(path):
+        start = time.perf_counter()
+        return joblib.load(path, mmap_mode=mmap_mode), time.perf_counter() - start
+
+    if concurrent:
+        with ThreadPoolExecutor(max_workers=len(paths), thread_name_prefix='model-load') as executor:
+            futures = {key: executor.submit(load, path) for key, path in paths.items()}
+            loaded = {key: future.result() for key, future in futures.items()}
+    else:
+        loaded = {key: load(path) for key, path in paths.items()}
+    return ({key: obj for key, (obj, _) in loaded.items()},
+            {key: seconds for key, (_, seconds) in loaded.items()})
+
+
+class ModelBundle:
+    def __init__(self, version, models, runner, load_seconds, artifact_seconds=None, warmup_seconds=None,
+                 runtime='sklearn'):
+        self.version = version
+        self.models = models
+        self.runner = runner            # BatchDispatcher or ParallelPredictor over these models
+        self.runtime = runtime          # 'sklearn' (joblib artifacts) or 'lite' (numpy export)
+        self.load_seconds = load_seconds
+        self.artifact_seconds = artifact_seconds or {}
+        self.warmup_seconds = warmup_seconds
+        self.loaded_at = time.time()
+
+    @property
+    def schemas(self):
+        return {name: model.schema for name, model in self.models.items()}
+
+    def predict_all(self, inputs):
+        return self.runner.predict_all(inputs)
+
+
+class ModelRegistry:
+    def __init__(self, directory, make_runner, interval=5.0, mmap_mode=None, lite='auto', concurrent_load=False):
+        self.directory = directory
+        self.paths = artifact_paths(directory)
+        self.lite_path = os.path.join(directory, LITE_FILE) if lite != 'off' else None
+        self.make_runner = make_runner  # models -> runner with predict_all(inputs)
+        self.interval = interval
+        self.mmap_mode = mmap_mode      # e.g. 'r'; only effective for artifacts saved without compression
+        self.concurrent_load = concurrent_load  # one thread per artifact; only faster from a cold disk
+        self.active = None
+        self._reload_lock = threading.Lock()
+        self._signature = None
+        self._pending = None
+        self._failed_version = None
+        self.counters = {'reloads': 0, 'failed_reloads': 0, 'lite_fallbacks': 0}
+        self.last_error = None
+
+    def _stat_signature(self):
+        try:
+            signature = tuple((key, os.stat(path).st_size, os.stat(path).st_mtime_ns)
+                              for key, path in sorted(self.paths.items()))
+        except FileNotFoundError:
+            return None
+        if self.lite_path and os.path.exists(self.lite_path):
+            stat = os.stat(self.lite_path)
+            signature += (('lite', stat.st_size, stat.st_mtime_ns),)
+        return signature
+
+    def _runtime(self, version):
+        """'lite' if there is a lite export of exactly these artifacts, else 'sklearn'."""
+        if not self.lite_path or not os.path.exists(self.lite_path):
+            return 'sklearn'
+        try:
+            return 'lite' if read_meta(self.lite_path).get('source_version') == version else 'sklearn'
+        except Exception as e:
+            print(f"Ignoring unreadable {self.lite_path}: {e}")
+            return 'sklearn'
+
+    def _load_bundle(self, version, runtime):
+        if runtime == 'lite':
+            try:
+                return self._build_bundle(version, 'lite')
+            except Exception as e:
+                self.counters['lite_fallbacks'] += 1
+                self.last_error = f'{self.lite_path}: {e}'
+                print(f"Lite models unusable ({self.last_error}); loading the joblib artifacts instead")
+        return self._build_bundle(version, 'sklearn')
+
+    def _build_bundle(self, version, runtime):
+        start = time.perf_counter()
+        if runtime == 'lite':
+            _, models = load_lite_models(self.lite_path)
+            artifact_seconds = {'lite_models': time.perf_counter() - start}
+        else:
+            artifacts, artifact_seconds = load_artifacts(self.paths, self.mmap_mode, self.concurrent_load)
+            models = build_disorder_models(artifacts)
+        validate_models(models)
+        load_seconds = time.perf_counter() - start
+
+        runner = self.make_runner(models)
+        start = time.perf_counter()
+        try:
+            runner.predict_all(SMOKE_INPUTS)
+        except Exception:
+            if hasattr(runner, 'close'):
+                runner.close()
+            raise
+        return ModelBundle(version, models, runner, load_seconds, artifact_seconds, time.perf_counter() - start,
+                           runtime)
+
+    def _swap(self, bundle):
+        previous, self.active = self.active, bundle
+        if previous is not None and hasattr(previous.runner, 'close'):
+            previous.runner.close()
+
+    def load(self):
+        """Load and activate the current artifacts on the calling thread; raises if they are unusable."""
+        with self._reload_lock:
+            self._signature = self._stat_signature()
+            version = artifacts_checksum(self.paths)
+            try:
+                bundle = self._load_bundle(version, self._runtime(version))
+            except Exception as e:
+                self.last_error = str(e)
+                raise
+            self._swap(bundle)
+            return bundle
+
+    def check(self):
+        """Reload if the artifacts changed and have settled. Returns True when a new bundle was swapped in."""
+        with self._reload_lock:
+            signature = self._stat_signature()
+            if signature is None or signature == self._signature:
+                self._pending = None
+                return False
+            # Wait for one more check with the same sizes and mtimes, so a half-copied file is never loaded
+            if signature != self._pending:
+                self._pending = signature
+                return False
+            self._pending = None
+            self._signature = signature
+
+            version = artifacts_checksum(self.paths)
+            runtime = self._runtime(version)
+            if self.active is not None and (version, runtime) == (self.active.version, self.active.runtime):
+                return False
+            if (version, runtime) == self._failed_version:
+                return False
+            try:
+                bundle = self._load_bundle(version, runtime)
+            except Exception as e:
+                self._failed_version = (version, runtime)
+                self.counters['failed_reloads'] += 1
+                self.last_error = f'{version}: {e}'
+                print(f"Model reload rejected ({self.last_error}); keeping "
+                      f"{self.active.version if self.active else 'no models'}")
+                return False
+            self._swap(bundle)
+            self.counters['reloads'] += 1
+            print(f"Models reloaded: version {version} ({runtime}) in {bundle.load_seconds:.2f}s")
+            return True
+
+    def start(self):
+        if self.interval <= 0:
+            return
+
+        def watch():
+            while True:
+                time.sleep(self.interval)
+                try:
+                    self.check()
+                except Exception as e:
+                    self.last_error = str(e)
+                    print(f"Model watcher error: {e}")
+
+        threading.Thread(target=watch, name='model-watcher', daemon=True).start()
+
+    def stats(self):
+        bundle = self.active
+        return {
+            'version': bundle.version if bundle else None,
+            'runtime': bundle.runtime if bundle else None,
+            'loaded_at': datetime.utcfromtimestamp(bundle.loaded_at).isoformat() if bundle else None,
+            'load_seconds': round(bundle.load_seconds, 3) if bundle else None,
+            'warmup_seconds': round(bundle.warmup_seconds, 3) if bundle else None,
+            'artifact_seconds': ({key: round(seconds, 4) for key, seconds in bundle.artifact_seconds.items()}
+                                 if bundle else None),
+            'mmap_mode': self.mmap_mode,
+            'concurrent_load': self.concurrent_load,
+            **self.counters,
+            'last_error': self.last_error,
+        }
+
@@ -0,0 +1,124 @@
+"""
+On-disk cache of generated report PDFs.
+
+A stored assessment never changes, so its PDF only needs to be built once.
+ReportPdfCache keeps the bytes in `directory`, one file per key. The key
+covers the report id, the renderer version (REPORT_PDF_VERSION) and a
+fingerprint of everything else printed on the page: the patient name and the
+plan. A new layout or a renamed patient therefore gets a new file rather than
+a stale one. The same key is the PDF's ETag.
+
+The directory is bounded by total size. A hit touches the file's mtime. After
+every write the directory is rescanned and, while the total is over
+`max_bytes`, the least recently used files are deleted. The scan sees files
+written by every worker sharing the directory (and counts a replaced file
+once), so each write leaves the directory within the bound; it can only be
+over it briefly, while writes from several workers overlap.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+
+
+def pdf_key(report_id, renderer_version, *fingerprint):
+    """Cache key and ETag for one rendering of a report."""
+    digest = hashlib.sha256('\0'.join(str(part) for part in fingerprint).encode('utf-8')).hexdigest()[:16]
+    # report ids are UUIDs; anything else is hashed so it cannot escape the cache directory
+    safe_id = report_id if report_id.replace('-', '').isalnum() else hashlib.sha256(report_id.encode()).hexdigest()
+    return f"{safe_id}-r{renderer_version}-{digest}"
+
+
+class ReportPdfCache:
+    def __init__(self, directory, max_bytes=64 << 20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._bytes = sum(size for _, _, size in self._scan())
+        self.counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'write_errors': 0}
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.pdf')
+
+    def _scan(self):
+        """(mtime, path, size) of every cached PDF."""
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith('.pdf'):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue    # evicted by another worker
+                    entries.append((stat.st_mtime, entry.path, stat.st_size))
+        return entries
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.counters['misses'] += 1
+            return None
+        with self._lock:
+            self.counters['hits'] += 1
+        return data
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        tmp = None
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, self._path(key))
+        except OSError as e:
+            if tmp is not None:
+                try:
+                    os.unlink(tmp)
+                except FileNotFoundError:
+                    pass
+            with self._lock:
+                self.counters['write_errors'] += 1
+            print(f"Could not cache report PDF {key}: {e}")
+            return
+        with self._lock:
+            self._evict()
+
+    def _evict(self):
+        """Rescan the directory (other workers write to it too) and delete LRU files until within max_bytes."""
+        entries = sorted(self._scan())
+        total = sum(size for _, _, size in entries)
+        for _, path, size in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                self.counters['evictions'] += 1
+            except FileNotFoundError:
+                pass
+            total -= size
+        self._bytes = total
+
+    def get_or_build(self, key, build):
+        """Cached PDF bytes for key, calling build() and storing the result on a miss."""
+        data = self.get(key)
+        if data is None:
+            data = build()
+            self.put(key, data)
+        return data
+
+    def stats(self):
+        with self._lock:
+            lookups = self.counters['hits'] + self.counters['misses']
+            return {
+                **self.counters,
+                'hit_rate': round(self.counters['hits'] / lookups, 4) if lookups else 0.0,
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+            }
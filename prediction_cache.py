@@ -0,0 +1,111 @@
+"""
+Memoized disorder predictions.
+
+Resubmitting the same panel (form corrections, page refreshes, demo accounts)
+would otherwise re-run all three models. PredictionCache maps a hash of the
+canonicalized depression/bipolar/anxiety input vectors, plus the version of
+the model bundle that produced them, to the three predicted labels.
+
+Entries expire after `ttl` seconds and the least recently used ones are
+evicted once either the entry cap or the byte cap is exceeded. When a request
+arrives with a different model version (the registry swapped in retrained
+artifacts), the whole cache is dropped.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+# Rough per-entry bookkeeping (key, OrderedDict slot, tuple) on top of the label strings
+ENTRY_OVERHEAD_BYTES = 200
+
+
+class PredictionCache:
+    def __init__(self, max_entries=1024, max_bytes=1 << 20, ttl=3600.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # key -> (expires at, size in bytes, {name: label})
+        self._bytes = 0
+        self.version = None
+        self._loaded_at = 0.0
+        self.counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+
+    @staticmethod
+    def key(bundle, inputs):
+        schemas = bundle.schemas
+        canonical = [[name, schemas[name].canonical(inputs[name])] for name in sorted(inputs)]
+        payload = json.dumps([bundle.version, canonical], separators=(',', ':'))
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _check_version(self, bundle):
+        """False for a request still finishing on a bundle older than the cached one."""
+        if bundle.version == self.version:
+            return True
+        if bundle.loaded_at < self._loaded_at:
+            return False
+        if self.version is not None:
+            self._entries.clear()
+            self._bytes = 0
+            self.counters['invalidations'] += 1
+        self.version = bundle.version
+        self._loaded_at = bundle.loaded_at
+        return True
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                self._drop(key)
+                self.counters['expirations'] += 1
+                entry = None
+            if entry is None:
+                self.counters['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.counters['hits'] += 1
+            return dict(entry[2])
+
+    def put(self, key, predictions):
+        size = len(key) + ENTRY_OVERHEAD_BYTES + sum(len(str(label)) for label in predictions.values())
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl, size, dict(predictions))
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.counters['evictions'] += 1
+
+    def _drop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def predict_all(self, bundle, inputs):
+        """Cached {name: label} for inputs, predicting with the model bundle on a miss."""
+        with self._lock:
+            current = self._check_version(bundle)
+        if not current:
+            return bundle.predict_all(inputs)
+        key = self.key(bundle, inputs)
+        predictions = self.get(key)
+        if predictions is None:
+            predictions = bundle.predict_all(inputs)
+            self.put(key, predictions)
+        return predictions
+
+    def stats(self):
+        with self._lock:
+            lookups = self.counters['hits'] + self.counters['misses']
+            return {
+                **self.counters,
+                'hit_rate': round(self.counters['hits'] / lookups, 4) if lookups else 0.0,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'model_version': self.version,
+            }
@@ -0,0 +1,223 @@
+"""
+PDF rendering of a stored assessment.
+
+build_report_pdf() lays out the header, the risk summary table and the
+treatment plan from its structured sections (see treatment_plans.
+TreatmentReport), so the stored report text is never parsed to recover
+headings and list items.
+
+The output depends only on its inputs: the header date is the assessment's
+own timestamp and ReportLab's invariant mode leaves out the creation time, so
+a PDF can be cached (pdf_cache.py). Bump REPORT_PDF_VERSION whenever the
+layout changes, so cached copies are rebuilt.
+"""
+import io
+from datetime import datetime
+
+from reportlab.lib.colors import HexColor
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+
+REPORT_PDF_VERSION = 1
+
+
+def report_date(report):
+    """The assessment's date as printed in the header (YYYY-MM-DD)."""
+    return datetime.fromisoformat(report['timestamp']).strftime('%Y-%m-%d')
+
+
+def build_report_pdf(report, patient_name, plan):
+    """PDF bytes for an assessment record, its patient's display name and its TreatmentReport."""
+    # Create PDF report
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter, rightMargin=54, leftMargin=54, topMargin=54, bottomMargin=54,
+                            invariant=1)
+    styles = getSampleStyleSheet()
+    story = []
+    
+    # Document Style Definitions
+    title_style = ParagraphStyle(
+        'DocTitle',
+        parent=styles['Normal'],
+        fontName='Helvetica-Bold',
+        fontSize=20,
+        leading=24,
+        textColor=HexColor('#0f172a'),
+        spaceAfter=4
+    )
+    subtitle_style = ParagraphStyle(
+        'DocSub',
+        parent=styles['Normal'],
+        fontName='Helvetica',
+        fontSize=9,
+        leading=13,
+        textColor=HexColor('#64748b'),
+        spaceAfter=12
+    )
+    section_title_style = ParagraphStyle(
+        'SectionTitle',
+        parent=styles['Normal'],
+        fontName='Helvetica-Bold',
+        fontSize=12,
+        leading=15,
+        textColor=HexColor('#1e3a8a'),
+        spaceBefore=14,
+        spaceAfter=8
+    )
+    body_style = ParagraphStyle(
+        'DocBody',
+        parent=styles['Normal'],
+        fontName='Helvetica',
+        fontSize=9,
+        leading=13,
+        textColor=HexColor('#334155'),
+        spaceAfter=4
+    )
+    bullet_style = ParagraphStyle(
+        'DocBullet',
+        parent=styles['Normal'],
+        fontName='Helvetica',
+        fontSize=9,
+        leading=13,
+        textColor=HexColor('#334155'),
+        leftIndent=15,
+        firstLineIndent=-10,
+        spaceAfter=3
+    )
+
+    # Document Header Grid (2 columns: left patient details, right report tracking details)
+    header_data = [
+        [Paragraph(f"<b>Patient Name:</b> {patient_name}", body_style), Paragraph(f"<b>Date:</b> {report_date(report)}", body_style)],
+        [Paragraph(f"<b>Username:</b> {report['username']}", body_style), Paragraph(f"<b>Assessment UUID:</b> {report['id'][:18]}...", body_style)],
+        [Paragraph(f"<b>Platform:</b> MindGen AI® Portal", body_style), Paragraph("<b>Status:</b> Completed / Verified", body_style)]
+    ]
+    header_table = Table(header_data, colWidths=[250, 254])
+    header_table.setStyle(TableStyle([
+        ('ALIGN', (0,0), (-1,-1), 'LEFT'),
+        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+        ('TOPPADDING', (0,0), (-1,-1), 2),
+        ('BOTTOMPADDING', (0,0), (-1,-1), 2),
+    ]))
+
+    story.append(Paragraph("MINDGEN AI® Assessment Report", title_style))
+    story.append(Spacer(1, 4))
+    story.append(header_table)
+    story.append(Spacer(1, 8))
+    
+    # Separator Line
+    t_sep = Table([['']], colWidths=[504], rowHeights=[1])
+    t_sep.setStyle(TableStyle([
+        ('LINEABOVE', (0,0), (-1,-1), 1, HexColor('#cbd5e1'))
+    ]))
+    story.append(t_sep)
+    story.append(Spacer(1, 10))
+    
+    # Section: Diagnostic Risk Summary
+    story.append(Paragraph("Diagnostic Risk Summary", section_title_style))
+    
+    # Define conditional styles for risk cells
+    risk_positive_style = ParagraphStyle(
+        'RiskPositive',
+        parent=body_style,
+        fontName='Helvetica-Bold',
+        textColor=HexColor('#b91c1c') # Dark red
+    )
+    risk_negative_style = ParagraphStyle(
+        'RiskNegative',
+        parent=body_style,
+        textColor=HexColor('#15803d') # Dark green
+    )
+    
+    dep_text = report['Depression']
+    bp_text = report['BipolarDisorder']
+    anx_text = report['Anxiety']
+
+    dep_p = Paragraph(dep_text, risk_positive_style) if dep_text != 'False' else Paragraph('No Risk Detected', risk_negative_style)
+    bp_p = Paragraph(bp_text, risk_positive_style) if bp_text != 'False' else Paragraph('No Risk Detected', risk_negative_style)
+    anx_p = Paragraph(anx_text, risk_positive_style) if anx_text != 'False' else Paragraph('No Risk Detected', risk_negative_style)
+    
+    table_data = [
+        [Paragraph("<b>Susceptibility Metric</b>", body_style), Paragraph("<b>Identified Risk Subtype / Assessment</b>", body_style)],
+        [Paragraph("Depression Subtype", body_style), dep_p],
+        [Paragraph("Bipolar Disorder Risk", body_style), bp_p],
+        [Paragraph("Anxiety Subtype", body_style), anx_p],
+    ]
+    
+    t_style_cmds = [
+        ('BACKGROUND', (0,0), (-1,0), HexColor('#f1f5f9')),
+        ('TEXTCOLOR', (0,0), (-1,0), HexColor('#0f172a')),
+        ('ALIGN', (0,0), (-1,-1), 'LEFT'),
+        ('BOTTOMPADDING', (0,0), (-1,-1), 5),
+        ('TOPPADDING', (0,0), (-1,-1), 5),
+        ('GRID', (0,0), (-1,-1), 0.5, HexColor('#cbd5e1')),
+    ]
+    
+    # Conditional background colors for cells based on diagnosis outcomes
+    if dep_text != 'False':
+        t_style_cmds.append(('BACKGROUND', (1,1), (1,1), HexColor('#fef2f2')))
+    else:
+        t_style_cmds.append(('BACKGROUND', (1,1), (1,1), HexColor('#f0fdf4')))
+
+    if bp_text != 'False':
+        t_style_cmds.append(('BACKGROUND', (1,2), (1,2), HexColor('#fef2f2')))
+    else:
+        t_style_cmds.append(('BACKGROUND', (1,2), (1,2), HexColor('#f0fdf4')))
+
+    if anx_text != 'False':
+        t_style_cmds.append(('BACKGROUND', (1,3), (1,3), HexColor('#fef2f2')))
+    else:
+        t_style_cmds.append(('BACKGROUND', (1,3), (1,3), HexColor('#f0fdf4')))
+        
+    summary_table = Table(table_data, colWidths=[200, 304])
+    summary_table.setStyle(TableStyle(t_style_cmds))
+    story.append(summary_table)
+    story.append(Spacer(1, 10))
+    
+    # Section: Personalized Recommended Path
+    story.append(Paragraph("Personalized Intervention Path", section_title_style))
+    
+    # One flowable per line of the structured plan; list styles map onto the same paragraph styles
+    for section in plan.sections:
+        story.append(Paragraph(section.title, section_title_style))
+        if section.style in ('bullet', 'dash'):
+            for item in section.items:
+                story.append(Paragraph(f"• {item}", bullet_style))
+        elif section.style == 'numbered':
+            for line in section.lines():
+                story.append(Paragraph(line, bullet_style))
+        else:
+            for line in section.lines():
+                story.append(Paragraph(line, body_style))
+
+    # Add clinician signature table
+    story.append(Spacer(1, 15))
+    sig_data = [
+        [Paragraph("<b>Clinician Signature:</b> ___________________________", body_style), Paragraph("<b>MindGen AI® Authorization:</b> Verified", body_style)]
+    ]
+    sig_table = Table(sig_data, colWidths=[300, 204])
+    sig_table.setStyle(TableStyle([
+        ('ALIGN', (0,0), (-1,-1), 'LEFT'),
+        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+        ('TOPPADDING', (0,0), (-1,-1), 2),
+        ('BOTTOMPADDING', (0,0), (-1,-1), 2),
+    ]))
+    story.append(sig_table)
+    
+    # Add clinical disclaimer footer
+    story.append(Spacer(1, 15))
+    story.append(t_sep)
+    story.append(Spacer(1, 6))
+    disclaimer_style = ParagraphStyle(
+        'DocDisclaimer',
+        parent=styles['Normal'],
+        fontName='Helvetica-Oblique',
+        fontSize=7,
+        leading=10,
+        textColor=HexColor('#94a3b8'),
+        spaceAfter=4
+    )
+    story.append(Paragraph("<b>Disclaimer:</b> This report is generated dynamically by MindGen AI for informational and educational purposes. It does not constitute medical advice or a clinical diagnosis. Always consult a licensed healthcare professional or psychiatrist before changing treatment plans, diets, or medication regimens.", disclaimer_style))
+    
+    doc.build(story)
+    return buffer.getvalue()
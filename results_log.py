@@ -0,0 +1,254 @@
+"""
+Append-only JSON Lines storage for assessment results.
+
+Each saved assessment is written as a single line at the end of the log, so
+saving a result costs one small append instead of rewriting the whole history.
+A byte-offset index (report id -> position in the file) and a per-user index
+(username -> report ids ordered by timestamp) are built once when the log is
+opened and updated on every append, so single reports are read back with one
+seek and a user's history never requires scanning other users' records.
+
+Usage (one-shot conversion of the old results.json array format):
+    python results_log.py convert results.json results.jsonl
+"""
+import bisect
+import json
+import os
+import sys
+import threading
+import time
+
+from journal import FileLock
+
+# fsync policies for appended records
+FSYNC_ALWAYS = 'always'        # fsync after every record (safest, slowest)
+FSYNC_INTERVAL = 'interval'    # fsync at most once per fsync_interval seconds
+FSYNC_NEVER = 'never'          # leave flushing to the operating system
+FSYNC_POLICIES = (FSYNC_ALWAYS, FSYNC_INTERVAL, FSYNC_NEVER)
+
+
+class ResultsLog:
+    def __init__(self, path, fsync=FSYNC_INTERVAL, fsync_interval=1.0):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy '{fsync}', expected one of {FSYNC_POLICIES}")
+        self.path = path
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self._lock = threading.Lock()
+        self._file_lock = FileLock(path)   # serializes appends across worker processes
+        self._offsets = {}      # report id -> (byte offset, line length)
+        self._by_user = {}      # username -> sorted list of (timestamp, report id)
+        self._end = 0           # byte position up to which the file has been indexed
+        self._ino = None        # inode of the indexed file; changes when the log is rewritten
+        self._last_fsync = 0.0
+        self._dirty = False
+        with self._lock:
+            self._catch_up()
+
+    def _catch_up(self):
+        """Index any lines appended since the last scan (also picks up appends by other processes)."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        if st.st_ino != self._ino or st.st_size < self._end:
+            # The log was rewritten (compaction/migration), possibly by another process: reindex
+            self._offsets = {}
+            self._by_user = {}
+            self._end = 0
+            self._ino = st.st_ino
+        if st.st_size <= self._end:
+            return
+        with open(self.path, 'rb') as f:
+            f.seek(self._end)
+            offset = self._end
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # Partial line from an interrupted write; it will be skipped until completed
+                    break
+                if line.strip():
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        print(f"Skipping corrupt line at byte {offset} in {self.path}")
+                    else:
+                        self._index_record(record, offset, len(line))
+                offset += len(line)
+            self._end = offset
+
+    def _index_record(self, record, offset, length):
+        if record['id'] not in self._offsets:
+            bisect.insort(self._by_user.setdefault(record['username'], []),
+                          (record['timestamp'], record['id']))
+        self._offsets[record['id']] = (offset, length)
+
+    def _read_at(self, offset, length):
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            return json.loads(f.read(length))
+
+    def append(self, record):
+        return self.append_many([record])[0]
+
+    def append_many(self, records):
+        """Append a batch of records with a single write and (policy permitting) a single fsync."""
+        lines = [(json.dumps(record) + '\n').encode('utf-8') for record in records]
+        with self._lock, self._file_lock:
+            self._catch_up()
+            with open(self.path, 'ab') as f:
+                offset = f.seek(0, os.SEEK_END)
+                if offset > self._end:
+                    # Previous writer died mid-line: terminate the fragment so our records start cleanly
+                    f.write(b'\n')
+                    offset += 1
+                f.write(b''.join(lines))
+                f.flush()
+                self._dirty = True
+                self._maybe_fsync(f)
+            for record, line in zip(records, lines):
+                self._index_record(record, offset, len(line))
+                offset += len(line)
+            self._end = offset
+        return records
+
+    def rewrite(self, transform):
+        """
+        Replace the whole log with transform(records) under the file lock (used by offline migrations
+        and compaction, never by requests). The new log is written to a temp file and renamed into place.
+        """
+        with self._lock, self._file_lock:
+            self._catch_up()
+            records = list(self._iter_until(self._end))
+            new_records = transform(records)
+            tmp = self.path + '.rewrite.tmp'
+            with open(tmp, 'wb') as f:
+                for record in new_records:
+                    f.write((json.dumps(record) + '\n').encode('utf-8'))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            self._ino = None
+            self._catch_up()
+        return new_records
+
+    def _maybe_fsync(self, f):
+        now = time.monotonic()
+        if self.fsync == FSYNC_ALWAYS or (
+                self.fsync == FSYNC_INTERVAL and now - self._last_fsync >= self.fsync_interval):
+            os.fsync(f.fileno())
+            self._last_fsync = now
+            self._dirty = False
+
+    def sync(self):
+        """Force any appended-but-unsynced records to disk."""
+        with self._lock:
+            if self._dirty and os.path.exists(self.path):
+                with open(self.path, 'ab') as f:
+                    os.fsync(f.fileno())
+                self._last_fsync = time.monotonic()
+                self._dirty = False
+
+    def get(self, report_id):
+        """Return a single record by id, or None. Only that record's line is read and parsed."""
+        with self._lock:
+            location = self._offsets.get(report_id)
+            if location is None:
+                self._catch_up()
+                location = self._offsets.get(report_id)
+        if location is None:
+            return None
+        return self._read_at(*location)
+
+    def get_for_user(self, report_id, username):
+        """Return a record by id only if it belongs to username, otherwise None."""
+        record = self.get(report_id)
+        if record is None or record['username'] != username:
+            return None
+        return record
+
+    def user_report_ids(self, username):
+        """Report ids for a user, newest first."""
+        with self._lock:
+            self._catch_up()
+            entries = list(self._by_user.get(username, ()))
+        return [report_id for _, report_id in reversed(entries)]
+
+    def user_entries_before(self, username, before=None, limit=20):
+        """Up to `limit` (timestamp, report id) keys of a user that sort before `before`, oldest first."""
+        with self._lock:
+            self._catch_up()
+            entries = self._by_user.get(username, ())
+            end = bisect.bisect_left(entries, before) if before else len(entries)
+            return list(entries[max(0, end - limit):end])
+
+    def for_user(self, username):
+        """Records belonging to a user, newest first."""
+        return [self.get(report_id) for report_id in self.user_report_ids(username)]
+
+    def latest_for_user(self, username):
+        """The most recent record for a user, or None."""
+        with self._lock:
+            self._catch_up()
+            entries = self._by_user.get(username)
+            if not entries:
+                return None
+            report_id = entries[-1][1]
+        return self.get(report_id)
+
+    def __contains__(self, report_id):
+        with self._lock:
+            self._catch_up()
+            return report_id in self._offsets
+
+    def __len__(self):
+        with self._lock:
+            self._catch_up()
+            return len(self._offsets)
+
+    def __iter__(self):
+        """Iterate over every record in write order."""
+        with self._lock:
+            self._catch_up()
+            end = self._end
+        return self._iter_until(end)
+
+    def _iter_until(self, end):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            offset = 0
+            for line in f:
+                offset += len(line)
+                if offset > end:
+                    break
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+
+
+def convert_json_array(src, dst, fsync=FSYNC_NEVER):
+    """One-shot conversion of a results.json array file into a JSON Lines log. Returns records written."""
+    if os.path.exists(dst) and os.path.getsize(dst) > 0:
+        raise FileExistsError(f"{dst} already exists and is not empty")
+    with open(src, 'r') as f:
+        records = json.load(f)
+
+    tmp = dst + '.tmp'
+    with open(tmp, 'w') as f:
+        for record in records:
+            f.write(json.dumps(record) + '\n')
+        f.flush()
+        if fsync != FSYNC_NEVER:
+            os.fsync(f.fileno())
+    os.replace(tmp, dst)
+    return len(records)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 4 or sys.argv[1] != 'convert':
+        print("Usage: python results_log.py convert <results.json> <results.jsonl>")
+        sys.exit(1)
+    count = convert_json_array(sys.argv[2], sys.argv[3], fsync=FSYNC_ALWAYS)
+    print(f"Converted {count} records from {sys.argv[2]} to {sys.argv[3]}")
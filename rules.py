@@ -0,0 +1,117 @@
+"""
+Rule-based clinical fallback, used when the trained models are not available.
+
+The thresholds are listed in RULES, one ordered table per model: the first
+rule whose conditions all hold gives the label, otherwise the model's default
+applies. Depression is classified from the PHQ-9 score (plus the 5-HTTLPR
+genotype in the moderate band), bipolar disorder from family history and
+average sleep, and anxiety from the GAD-7 score (plus the COMT genotype in the
+mild band).
+
+rule_based_predictions() is the hand-written if/elif form of that table, the
+fastest way to evaluate it in Python; tests/test_rules.py walks RULES and
+checks the two agree for every combination of values around each threshold.
+A change to the thresholds therefore goes into both.
+
+Batches are classified one patient at a time too. Patients arrive as dicts,
+and gathering them into numpy columns and the labels back into dicts costs
+more than the comparisons themselves: a numpy evaluator of the table managed
+1.1M patients/s against 3.0M/s for the if/elif loop.
+"""
+import operator
+
+OPERATORS = {
+    '>=': operator.ge,
+    '>': operator.gt,
+    '<': operator.lt,
+    '==': operator.eq,
+}
+
+# (model, field) -> value used when a patient does not have the field
+FIELD_DEFAULTS = {
+    ('depression', 'DepressionScore_PHQ9'): 0,
+    ('depression', 'Genotype_5HTTLPR'): None,
+    ('bipolar', 'Family_History'): 'No',
+    ('bipolar', 'Average_Sleep_Hours'): 7.0,
+    ('anxiety', 'AnxietyScore_GAD7'): 0,
+    ('anxiety', 'Genotype_COMT'): None,
+}
+
+# model -> (ordered [(conditions, label)], default label); conditions are (field, operator, value)
+RULES = {
+    'depression': ([
+        ([('DepressionScore_PHQ9', '>=', 20)], 'Psychotic Depression'),
+        ([('DepressionScore_PHQ9', '>=', 15)], 'Major Depressive Disorder'),
+        ([('DepressionScore_PHQ9', '>=', 10), ('Genotype_5HTTLPR', '==', 'S/S')], 'Persistent Depressive Disorder'),
+        ([('DepressionScore_PHQ9', '>=', 10)], 'Seasonal Affective Disorder'),
+        ([('DepressionScore_PHQ9', '>=', 5)], 'Atypical Depression'),
+    ], 'False'),
+    'bipolar': ([
+        ([('Family_History', '==', 'Yes'), ('Average_Sleep_Hours', '<', 5.0)], 'BD-I'),
+        ([('Average_Sleep_Hours', '<', 6.0)], 'BD-II'),
+        ([('Average_Sleep_Hours', '>', 9.0)], 'Cyclothymia'),
+    ], 'False'),
+    'anxiety': ([
+        ([('AnxietyScore_GAD7', '>=', 15)], 'Panic Disorder'),
+        ([('AnxietyScore_GAD7', '>=', 10)], 'Generalized Anxiety Disorder'),
+        ([('AnxietyScore_GAD7', '>=', 5), ('Genotype_COMT', '==', 'Met/Met')], 'Social Anxiety Disorder'),
+        ([('AnxietyScore_GAD7', '>=', 5)], 'Specific Phobia'),
+    ], 'False'),
+}
+
+
+def rule_based_predictions(inputs):
+    """{'depression', 'bipolar', 'anxiety'} model input dicts -> predicted label for each (the RULES table)."""
+    depression_input = inputs['depression']
+    bipolar_input = inputs['bipolar']
+    anxiety_input = inputs['anxiety']
+
+    phq9 = depression_input.get("DepressionScore_PHQ9", 0)
+    gad7 = anxiety_input.get("AnxietyScore_GAD7", 0)
+
+    # Depression subtype classification
+    if phq9 >= 20:
+        depression_pred = "Psychotic Depression"
+    elif phq9 >= 15:
+        depression_pred = "Major Depressive Disorder"
+    elif phq9 >= 10:
+        if depression_input.get("Genotype_5HTTLPR") == "S/S":
+            depression_pred = "Persistent Depressive Disorder"
+        else:
+            depression_pred = "Seasonal Affective Disorder"
+    elif phq9 >= 5:
+        depression_pred = "Atypical Depression"
+    else:
+        depression_pred = "False"
+
+    # Bipolar disorder classification
+    family_history = bipolar_input.get("Family_History", "No")
+    sleep_hours = bipolar_input.get("Average_Sleep_Hours", 7.0)
+    if family_history == "Yes" and sleep_hours < 5.0:
+        bipolar_pred = "BD-I"
+    elif sleep_hours < 6.0:
+        bipolar_pred = "BD-II"
+    elif sleep_hours > 9.0:
+        bipolar_pred = "Cyclothymia"
+    else:
+        bipolar_pred = "False"
+
+    # Anxiety classification
+    if gad7 >= 15:
+        anxiety_pred = "Panic Disorder"
+    elif gad7 >= 10:
+        anxiety_pred = "Generalized Anxiety Disorder"
+    elif gad7 >= 5:
+        if anxiety_input.get("Genotype_COMT") == "Met/Met":
+            anxiety_pred = "Social Anxiety Disorder"
+        else:
+            anxiety_pred = "Specific Phobia"
+    else:
+        anxiety_pred = "False"
+
+    return {'depression': depression_pred, 'bipolar': bipolar_pred, 'anxiety': anxiety_pred}
+
+
+def rule_based_predictions_many(inputs_list):
+    """The rule-based labels for a list of patients; same order as inputs_list."""
+    return [rule_based_predictions(inputs) for inputs in inputs_list]
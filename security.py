@@ -0,0 +1,160 @@
+"""
+Password hashing off the request threads.
+
+bcrypt is deliberately slow, so running it inline lets a burst of logins tie
+up every request worker. PasswordHasher runs hashpw/checkpw on a small,
+dedicated thread pool with a bounded queue: when the pool and its queue are
+full, new requests are rejected immediately with HasherBusy (served as a 503)
+instead of piling up behind the backlog.
+
+LoginThrottle tracks recent failed attempts per username and per client
+address, so brute-force traffic is turned away before any bcrypt work is done.
+"""
+import bisect
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import bcrypt
+
+
+class HasherBusy(Exception):
+    """The hashing pool is saturated; the caller should retry shortly."""
+
+
+class LatencyHistogram:
+    # Bucket upper bounds in milliseconds; the last bucket catches everything slower
+    BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+    def __init__(self, buckets_ms=None):
+        if buckets_ms is not None:
+            self.BUCKETS_MS = tuple(buckets_ms)
+        self._lock = threading.Lock()
+        self.counts = [0] * (len(self.BUCKETS_MS) + 1)
+        self.total_ms = 0.0
+        self.count = 0
+
+    def observe(self, elapsed_ms):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.BUCKETS_MS, elapsed_ms)] += 1
+            self.total_ms += elapsed_ms
+            self.count += 1
+
+    def snapshot(self):
+        with self._lock:
+            labels = [f'le_{b}ms' for b in self.BUCKETS_MS] + ['gt_%dms' % self.BUCKETS_MS[-1]]
+            return {
+                'count': self.count,
+                'mean_ms': round(self.total_ms / self.count, 2) if self.count else 0.0,
+                'buckets': dict(zip(labels, self.counts)),
+            }
+
+
+def bcrypt_cost(hashed):
+    """Work factor of a bcrypt hash ('$2b$12$...' -> 12), or None if it isn't a bcrypt hash."""
+    parts = hashed.split('$')
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+
+class PasswordHasher:
+    def __init__(self, workers=2, max_queue=16, rounds=12):
+        self.rounds = rounds
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+        # Admission control: at most `workers` running plus `max_queue` waiting
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self.histograms = {'hash': LatencyHistogram(), 'verify': LatencyHistogram()}
+        self.rejected = 0
+
+    def _run(self, kind, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HasherBusy()
+        start = time.perf_counter()
+        try:
+            return self._executor.submit(fn, *args).result()
+        finally:
+            self._slots.release()
+            self.histograms[kind].observe((time.perf_counter() - start) * 1000)
+
+    def hash(self, secret):
+        hashed = self._run('hash', bcrypt.hashpw, secret.encode('utf-8'), bcrypt.gensalt(self.rounds))
+        return hashed.decode('utf-8')
+
+    def verify(self, secret, hashed):
+        return self._run('verify', bcrypt.checkpw, secret.encode('utf-8'), hashed.encode('utf-8'))
+
+    def needs_rehash(self, hashed):
+        """True when a stored hash was made with a different work factor than the configured one."""
+        return bcrypt_cost(hashed) != self.rounds
+
+    def stats(self):
+        return {
+            'rounds': self.rounds,
+            'rejected': self.rejected,
+            'hash': self.histograms['hash'].snapshot(),
+            'verify': self.histograms['verify'].snapshot(),
+        }
+
+
+class LoginThrottle:
+    """
+    Sliding-window failure counter keyed by username and by client address.
+
+    check() returns how many seconds the caller must wait (0 if allowed) and costs no bcrypt work.
+    Memory is bounded: at most max_keys keys are tracked, least recently used keys are evicted first.
+    """
+
+    def __init__(self, max_user_failures=5, max_ip_failures=20, window=60.0, max_keys=10000):
+        self.limits = {'user': max_user_failures, 'ip': max_ip_failures}
+        self.window = window
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._failures = OrderedDict()  # (kind, key) -> deque of failure times
+        self.rejected = {'user': 0, 'ip': 0}
+        self.evicted = 0
+
+    def _recent(self, key, now):
+        failures = self._failures.get(key)
+        if failures is None:
+            return None
+        while failures and failures[0] <= now - self.window:
+            failures.popleft()
+        if not failures:
+            del self._failures[key]
+            return None
+        return failures
+
+    def check(self, username, address):
+        now = time.monotonic()
+        with self._lock:
+            for kind, value in (('user', username), ('ip', address)):
+                failures = self._recent((kind, value), now)
+                if failures is not None and len(failures) >= self.limits[kind]:
+                    self.rejected[kind] += 1
+                    return max(1, int(failures[0] + self.window - now) + 1)
+        return 0
+
+    def record_failure(self, username, address):
+        now = time.monotonic()
+        with self._lock:
+            for key in (('user', username), ('ip', address)):
+                failures = self._recent(key, now)
+                if failures is None:
+                    failures = self._failures[key] = deque(maxlen=max(self.limits.values()))
+                else:
+                    self._failures.move_to_end(key)
+                failures.append(now)
+            while len(self._failures) > self.max_keys:
+                self._failures.popitem(last=False)
+                self.evicted += 1
+
+    def record_success(self, username):
+        with self._lock:
+            self._failures.pop(('user', username), None)
+
+    def stats(self):
+        with self._lock:
+            return {'tracked_keys': len(self._failures), 'rejected': dict(self.rejected), 'evicted': self.evicted}
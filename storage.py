@@ -0,0 +1,597 @@
+"""
+Pluggable persistence layer for users and assessment results.
+
+Two backends share the same interface:
+  - JsonStorage:   users.json document + append-only results.jsonl log (default)
+  - SQLiteStorage: a single SQLite database in WAL mode, safe to share between
+                   several worker processes, indexed on username, id and timestamp
+
+The backend is selected with the STORAGE_BACKEND environment variable
+('json' or 'sqlite'); SQLITE_PATH sets the database file.
+
+Treatment plan text is stored once per plan key in a shared plan table
+(plans.json / the `plans` SQLite table); result records only keep their
+`plan_key` and get their `Report` text re-attached when read.
+
+Usage:
+    # import existing users.json and results.json / results.jsonl into SQLite
+    python storage.py migrate [--users users.json] [--results results.jsonl] [--db mindgen.db]
+    # move inline Report text of existing history into the shared plan table
+    python storage.py dedupe-plans [--backend json|sqlite]
+    # move results older than N days into compressed archive segments
+    python storage.py archive --older-than-days 180 [--compression gzip|lzma] [--backend json|sqlite]
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+from archive import ResultsArchive
+from journal import GroupCommitWriter, JsonDocumentWriter, atomic_write_json
+from results_log import ResultsLog, convert_json_array
+from treatment_plans import current_plan_triple, plan_key, recommended_path
+
+
+# Parsed JSON documents keyed by path, validated against the file's (inode, size, mtime_ns).
+# Callers must treat data returned by read_json as read-only and copy before mutating.
+_json_cache = {}
+_json_cache_lock = threading.Lock()
+json_cache_stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+
+def _file_key(filename):
+    st = os.stat(filename)
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def read_json(filename):
+    path = os.path.abspath(filename)
+    try:
+        key = _file_key(path)
+    except FileNotFoundError:
+        return []
+    with _json_cache_lock:
+        cached = _json_cache.get(path)
+        if cached is not None and cached[0] == key:
+            json_cache_stats['hits'] += 1
+            return cached[1]
+        json_cache_stats['misses'] += 1
+    with open(path, 'r') as f:
+        data = json.load(f)
+    with _json_cache_lock:
+        _json_cache[path] = (key, data)
+    return data
+
+
+def invalidate_json_cache(filename):
+    with _json_cache_lock:
+        if _json_cache.pop(os.path.abspath(filename), None) is not None:
+            json_cache_stats['invalidations'] += 1
+
+
+def prime_json_cache(filename, data):
+    """Cache data we just wrote to filename so the next read_json doesn't re-parse it."""
+    path = os.path.abspath(filename)
+    key = _file_key(path)
+    with _json_cache_lock:
+        _json_cache[path] = (key, data)
+
+
+def write_json(filename, data):
+    invalidate_json_cache(filename)
+    atomic_write_json(filename, data)
+
+
+def read_records(filename):
+    """Read results from either the legacy JSON array file or a JSON Lines log."""
+    if filename.endswith('.jsonl'):
+        return list(ResultsLog(filename))
+    return read_json(filename)
+
+
+def missing_plan_text(key):
+    """
+    Report text for a record whose plan row is gone: regenerated when the key is from the current plan
+    version, otherwise a visible notice (and a log line) instead of a silently empty report.
+    """
+    triple = current_plan_triple(key)
+    if triple is not None:
+        return recommended_path(*triple)
+    print(f"Treatment plan {key!r} is missing from the plan table; its report text is lost")
+    return f"Treatment plan text unavailable: plan {key} is missing from storage."
+
+
+def split_plan(record, plans, generated=None):
+    """
+    Return a copy of record with its Report text moved into plans (key -> text).
+    Records without a plan_key (written before plan deduplication) get one: the current plan key if
+    their text matches what the generator produces today, otherwise a legacy key derived from the text.
+    """
+    if 'Report' not in record:
+        return record
+    record = dict(record)
+    text = record.pop('Report')
+    key = record.get('plan_key')
+    if key is None:
+        triple = (record['Depression'], record['BipolarDisorder'], record['Anxiety'])
+        if generated is None:
+            generated = {}
+        if triple not in generated:
+            generated[triple] = recommended_path(*triple)
+        if generated[triple] == text:
+            key = plan_key(*triple)
+        else:
+            digest = hashlib.sha256(text.encode('utf-8')).hexdigest()[:12]
+            key = f"legacy-{digest}:{'|'.join(triple)}"
+        record['plan_key'] = key
+    plans.setdefault(key, text)
+    return record
+
+
+def _archive_cutoff(older_than_days):
+    return (datetime.utcnow() - timedelta(days=older_than_days)).isoformat()
+
+
+def _merge_newest_first(hot, archived):
+    """Hot results are always newer than archived ones; drop archive copies of ids still in the hot store."""
+    hot_ids = {r['id'] for r in hot}
+    return hot + [r for r in archived if r['id'] not in hot_ids]
+
+
+def _newest_keys(key_lists, limit):
+    """Merge (timestamp, id) key lists and keep the newest limit + 1 (the extra one tells us a next page exists)."""
+    return sorted(set().union(*key_lists), reverse=True)[:limit + 1]
+
+
+def _page(records, keys, limit):
+    """Return (records, next_cursor) for one keyset page; the cursor is the (timestamp, id) of the last record."""
+    if len(keys) > limit:
+        return records[:limit], keys[limit - 1]
+    return records, None
+
+
+def _size_report(before, after):
+    saved = 100.0 * (before - after) / before if before else 0.0
+    return f"{before:,} -> {after:,} bytes ({saved:.1f}% smaller)"
+
+
+class JsonStorage:
+    name = 'json'
+
+    def __init__(self, users_file, results_log_file, legacy_results_file=None, fsync='interval',
+                 commit_window=0.002, plans_file='plans.json', archive_dir='archive'):
+        self.users_file = users_file
+        self.plans_file = plans_file
+        self.archive = ResultsArchive(archive_dir)
+        # username -> user, rebuilt only when read_json hands back a different users list
+        # (i.e. after a commit or an external change to users.json)
+        self._user_table = {}
+        self._user_table_source = None
+        self._user_table_lock = threading.Lock()
+        # Convert the old results.json array into the append-only log the first time we start
+        if legacy_results_file and not os.path.exists(results_log_file) and os.path.exists(legacy_results_file):
+            converted = convert_json_array(legacy_results_file, results_log_file)
+            print(f"Converted {converted} results from {legacy_results_file} to {results_log_file}")
+        self.results = ResultsLog(results_log_file, fsync=fsync)
+        # All writes go through group-commit writers so concurrent requests/processes never lose updates
+        self.users_writer = JsonDocumentWriter(users_file, window=commit_window, on_commit=prime_json_cache)
+        self.results_writer = GroupCommitWriter(self.results.append_many, window=commit_window,
+                                                name='writer:results')
+        self.plans_writer = JsonDocumentWriter(plans_file, window=commit_window, on_commit=prime_json_cache,
+                                               default=dict)
+
+    # Users
+    def _users_by_name(self):
+        users = read_json(self.users_file)
+        with self._user_table_lock:
+            if users is not self._user_table_source:
+                self._user_table = {user['username']: user for user in users}
+                self._user_table_source = users
+            return self._user_table
+
+    def get_user(self, username):
+        user = self._users_by_name().get(username)
+        return dict(user) if user else None
+
+    def add_user(self, user):
+        """Insert a new user. Returns False if the username is already taken."""
+        def insert(users):
+            if any(u['username'] == user['username'] for u in users):
+                return False
+            users.append(user)
+            return True
+        return self.users_writer.submit(insert)
+
+    def update_user(self, user):
+        def replace(users):
+            for i, u in enumerate(users):
+                if u['username'] == user['username']:
+                    users[i] = user
+                    break
+        self.users_writer.submit(replace)
+
+    # Plans
+    def _plans(self):
+        return read_json(self.plans_file) or {}
+
+    def _save_plans(self, new_plans):
+        missing = {k: v for k, v in new_plans.items() if k not in self._plans()}
+        if missing:
+            def merge(plans):
+                for key, text in missing.items():
+                    plans.setdefault(key, text)
+            self.plans_writer.submit(merge)
+
+    def _rehydrate(self, record):
+        if record is not None and 'Report' not in record and 'plan_key' in record:
+            text = self._plans().get(record['plan_key'])
+            record['Report'] = text if text is not None else missing_plan_text(record['plan_key'])
+        return record
+
+    # Results
+    def add_result(self, record):
+        new_plans = {}
+        record = split_plan(record, new_plans)
+        self._save_plans(new_plans)
+        self.results_writer.submit(record)
+
+    def add_results(self, records):
+        new_plans = {}
+        records = [split_plan(record, new_plans) for record in records]
+        self._save_plans(new_plans)
+        self.results_writer.submit_many(records)
+
+    def get_result(self, report_id, username):
+        record = self.results.get_for_user(report_id, username)
+        if record is None:
+            record = self.archive.get_for_user(report_id, username)
+        return self._rehydrate(record)
+
+    def user_results(self, username):
+        """All results for a user, newest first (hot store, then archive segments)."""
+        records = _merge_newest_first(self.results.for_user(username), self.archive.for_user(username))
+        return [self._rehydrate(r) for r in records]
+
+    def user_results_page(self, username, before=None, limit=20):
+        """
+        One page of a user's results, newest first, strictly older than the `before` (timestamp, id) cursor.
+        Returns (records, next_cursor); next_cursor is None on the last page.
+        """
+        keys = _newest_keys([self.results.user_entries_before(username, before, limit + 1),
+                             self.archive.user_entries_before(username, before, limit + 1)], limit)
+        records = []
+        for _, report_id in keys[:limit]:
+            record = self.results.get(report_id) or self.archive.get(report_id)
+            records.append(self._rehydrate(record))
+        return _page(records, keys, limit)
+
+    def latest_result(self, username):
+        record = self.results.latest_for_user(username)
+        if record is None:
+            archived = self.archive.user_entries(username)
+            record = self.archive.get(archived[-1][1]) if archived else None
+        return self._rehydrate(record)
+
+    def archive_older_than(self, older_than_days, compression='gzip'):
+        """Compaction: move results older than the cutoff into a compressed archive segment."""
+        cutoff = _archive_cutoff(older_than_days)
+        before = os.path.getsize(self.results.path) if os.path.exists(self.results.path) else 0
+        moved = []
+
+        def transform(records):
+            old = [r for r in records if r['timestamp'] < cutoff]
+            # The segment is complete before the hot log drops the records
+            self.archive.write_segment(old, compression)
+            moved.extend(old)
+            return [r for r in records if r['timestamp'] >= cutoff]
+
+        self.results.rewrite(transform)
+        after = os.path.getsize(self.results.path)
+        print(f"Archived {len(moved)} results older than {cutoff}: hot log {_size_report(before, after)}")
+        return len(moved)
+
+    def dedupe_plans(self):
+        """Migration: move inline Report text of every stored result into the shared plan table."""
+        before = os.path.getsize(self.results.path) if os.path.exists(self.results.path) else 0
+        before += os.path.getsize(self.plans_file) if os.path.exists(self.plans_file) else 0
+        generated = {}
+
+        def transform(records):
+            new_plans = {}
+            records = [split_plan(r, new_plans, generated) for r in records]
+            # Plans must be saved before the rewritten records that reference them become visible
+            self._save_plans(new_plans)
+            return records
+
+        records = self.results.rewrite(transform)
+        after = os.path.getsize(self.results.path) + os.path.getsize(self.plans_file)
+        print(f"Deduplicated {len(records)} results into {len(self._plans())} plans: {_size_report(before, after)}")
+
+    def stats(self):
+        return {
+            'json_cache': dict(json_cache_stats),
+            'users': len(self._users_by_name()),
+            'users_writer': dict(self.users_writer.stats),
+            'results_writer': dict(self.results_writer.stats),
+            'plans': len(self._plans()),
+            'archive': self.archive.stats(),
+        }
+
+    def close(self):
+        self.results.sync()
+
+
+class SQLiteStorage:
+    name = 'sqlite'
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            id TEXT PRIMARY KEY,
+            username TEXT NOT NULL UNIQUE,
+            data TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS results (
+            id TEXT PRIMARY KEY,
+            username TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_results_username_timestamp ON results (username, timestamp);
+        CREATE INDEX IF NOT EXISTS idx_results_timestamp ON results (timestamp);
+        CREATE TABLE IF NOT EXISTS plans (
+            key TEXT PRIMARY KEY,
+            report TEXT NOT NULL
+        );
+    """
+
+    # Result rows with their plan text re-attached from the shared plan table
+    RESULT_SELECT = """
+        SELECT r.data, p.report FROM results r
+        LEFT JOIN plans p ON p.key = json_extract(r.data, '$.plan_key')
+    """
+
+    def __init__(self, path, archive_dir='archive'):
+        self.path = path
+        self.archive = ResultsArchive(archive_dir)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.executescript(self.SCHEMA)
+
+    def _conn(self):
+        # sqlite3 connections cannot be shared across threads, so each request thread gets its own
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    # Users
+    def get_user(self, username):
+        row = self._conn().execute('SELECT data FROM users WHERE username = ?', (username,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def add_user(self, user):
+        """Insert a new user. Returns False if the username is already taken."""
+        conn = self._conn()
+        try:
+            with conn:
+                conn.execute('INSERT INTO users (id, username, data) VALUES (?, ?, ?)',
+                             (user['id'], user['username'], json.dumps(user)))
+        except sqlite3.IntegrityError:
+            return False
+        return True
+
+    def update_user(self, user):
+        conn = self._conn()
+        with conn:
+            conn.execute('UPDATE users SET data = ? WHERE username = ?', (json.dumps(user), user['username']))
+
+    # Results
+    @staticmethod
+    def _rehydrate(row):
+        if row is None:
+            return None
+        record = json.loads(row[0])
+        if 'Report' not in record and 'plan_key' in record:
+            record['Report'] = row[1] if row[1] is not None else missing_plan_text(record['plan_key'])
+        return record
+
+    def _rehydrate_archived(self, record):
+        if record is not None and 'Report' not in record and 'plan_key' in record:
+            row = self._conn().execute('SELECT report FROM plans WHERE key = ?', (record['plan_key'],)).fetchone()
+            record['Report'] = row[0] if row else missing_plan_text(record['plan_key'])
+        return record
+
+    def _insert_results(self, conn, records, generated=None):
+        plans = {}
+        rows = []
+        for record in records:
+            record = split_plan(record, plans, generated)
+            rows.append((record['id'], record['username'], record['timestamp'], json.dumps(record)))
+        conn.executemany('INSERT OR IGNORE INTO plans (key, report) VALUES (?, ?)', plans.items())
+        before = conn.total_changes
+        conn.executemany('INSERT OR IGNORE INTO results (id, username, timestamp, data) VALUES (?, ?, ?, ?)', rows)
+        return conn.total_changes - before
+
+    def add_result(self, record):
+        self.add_results([record])
+
+    def add_results(self, records):
+        conn = self._conn()
+        with conn:
+            self._insert_results(conn, records)
+
+    def get_result(self, report_id, username):
+        row = self._conn().execute(self.RESULT_SELECT + ' WHERE r.id = ? AND r.username = ?',
+                                   (report_id, username)).fetchone()
+        if row is None:
+            return self._rehydrate_archived(self.archive.get_for_user(report_id, username))
+        return self._rehydrate(row)
+
+    def user_results(self, username):
+        """All results for a user, newest first (database, then archive segments)."""
+        rows = self._conn().execute(
+            self.RESULT_SELECT + ' WHERE r.username = ? ORDER BY r.timestamp DESC, r.id DESC', (username,))
+        hot = [self._rehydrate(row) for row in rows]
+        return _merge_newest_first(hot, [self._rehydrate_archived(r) for r in self.archive.for_user(username)])
+
+    def user_results_page(self, username, before=None, limit=20):
+        """
+        One page of a user's results, newest first, strictly older than the `before` (timestamp, id) cursor.
+        Returns (records, next_cursor); next_cursor is None on the last page.
+        """
+        sql = self.RESULT_SELECT + ' WHERE r.username = ?'
+        params = [username]
+        if before:
+            sql += ' AND (r.timestamp, r.id) < (?, ?)'
+            params += list(before)
+        sql += ' ORDER BY r.timestamp DESC, r.id DESC LIMIT ?'
+        params.append(limit + 1)
+        hot = [self._rehydrate(row) for row in self._conn().execute(sql, params)]
+        hot_keys = [(r['timestamp'], r['id']) for r in hot]
+        keys = _newest_keys([hot_keys, self.archive.user_entries_before(username, before, limit + 1)], limit)
+
+        by_id = {r['id']: r for r in hot}
+        records = []
+        for _, report_id in keys[:limit]:
+            record = by_id.get(report_id) or self._rehydrate_archived(self.archive.get(report_id))
+            records.append(record)
+        return _page(records, keys, limit)
+
+    def latest_result(self, username):
+        row = self._conn().execute(
+            self.RESULT_SELECT + ' WHERE r.username = ? ORDER BY r.timestamp DESC, r.id DESC LIMIT 1',
+            (username,)).fetchone()
+        if row is None:
+            archived = self.archive.user_entries(username)
+            return self._rehydrate_archived(self.archive.get(archived[-1][1])) if archived else None
+        return self._rehydrate(row)
+
+    def archive_older_than(self, older_than_days, compression='gzip'):
+        """Compaction: move results older than the cutoff into a compressed archive segment."""
+        cutoff = _archive_cutoff(older_than_days)
+        conn = self._conn()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            rows = conn.execute('SELECT id, data FROM results WHERE timestamp < ? ORDER BY timestamp, id',
+                                (cutoff,)).fetchall()
+            # The segment is complete before the rows are deleted
+            self.archive.write_segment([json.loads(data) for _, data in rows], compression)
+            conn.executemany('DELETE FROM results WHERE id = ?', ((report_id,) for report_id, _ in rows))
+        print(f"Archived {len(rows)} results older than {cutoff} from {self.path}")
+        return len(rows)
+
+    def _db_size(self, conn):
+        page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+        page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+        return page_count * page_size
+
+    def dedupe_plans(self):
+        """Migration: move inline Report text of every stored result into the shared plan table."""
+        conn = self._conn()
+        before = self._db_size(conn)
+        plans = {}
+        generated = {}
+        with conn:
+            rows = conn.execute('SELECT id, data FROM results').fetchall()
+            updates = []
+            for report_id, data in rows:
+                record = json.loads(data)
+                if 'Report' in record:
+                    updates.append((json.dumps(split_plan(record, plans, generated)), report_id))
+            conn.executemany('INSERT OR IGNORE INTO plans (key, report) VALUES (?, ?)', plans.items())
+            conn.executemany('UPDATE results SET data = ? WHERE id = ?', updates)
+        conn.execute('VACUUM')
+        after = self._db_size(conn)
+        print(f"Deduplicated {len(updates)} of {len(rows)} results into {len(plans)} plans: "
+              f"database {_size_report(before, after)}")
+
+    def stats(self):
+        return {'archive': self.archive.stats()}
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def import_data(self, users, results):
+        """Bulk import (used by the migration command). Existing ids are left untouched."""
+        conn = self._conn()
+        with conn:
+            before = conn.total_changes
+            conn.executemany('INSERT OR IGNORE INTO users (id, username, data) VALUES (?, ?, ?)',
+                             ((u['id'], u['username'], json.dumps(u)) for u in users))
+            users_added = conn.total_changes - before
+            results_added = self._insert_results(conn, results, generated={})
+        return users_added, results_added
+
+
+def open_storage(backend, users_file, results_log_file, legacy_results_file=None,
+                 sqlite_path='mindgen.db', fsync='interval', commit_window=0.002, plans_file='plans.json',
+                 archive_dir='archive'):
+    if backend == 'json':
+        return JsonStorage(users_file, results_log_file, legacy_results_file, fsync=fsync,
+                           commit_window=commit_window, plans_file=plans_file, archive_dir=archive_dir)
+    if backend == 'sqlite':
+        return SQLiteStorage(sqlite_path, archive_dir=archive_dir)
+    raise ValueError(f"Unknown storage backend '{backend}', expected 'json' or 'sqlite'")
+
+
+def migrate(users_file, results_file, db_path):
+    store = SQLiteStorage(db_path)
+    users = read_json(users_file)
+    results = read_records(results_file) if os.path.exists(results_file) else []
+    users_added, results_added = store.import_data(users, results)
+    store.close()
+    print(f"Imported {users_added}/{len(users)} users and {results_added}/{len(results)} results into {db_path}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="MindGen storage tools")
+    sub = parser.add_subparsers(dest='command', required=True)
+    migrate_cmd = sub.add_parser('migrate', help="import users.json and results.json(l) into SQLite")
+    migrate_cmd.add_argument('--users', default='users.json')
+    migrate_cmd.add_argument('--results', default=None,
+                             help="results.jsonl if present, otherwise results.json")
+    migrate_cmd.add_argument('--db', default=os.environ.get('SQLITE_PATH', 'mindgen.db'))
+    dedupe_cmd = sub.add_parser('dedupe-plans', help="store report text once per plan instead of per result")
+    dedupe_cmd.add_argument('--backend', default=os.environ.get('STORAGE_BACKEND', 'json'))
+    dedupe_cmd.add_argument('--users', default='users.json')
+    dedupe_cmd.add_argument('--results', default='results.jsonl')
+    dedupe_cmd.add_argument('--plans', default='plans.json')
+    dedupe_cmd.add_argument('--db', default=os.environ.get('SQLITE_PATH', 'mindgen.db'))
+    archive_cmd = sub.add_parser('archive', help="move old results into compressed archive segments")
+    archive_cmd.add_argument('--older-than-days', type=float,
+                             default=float(os.environ.get('ARCHIVE_AFTER_DAYS', '180')))
+    archive_cmd.add_argument('--compression', choices=('gzip', 'lzma'), default='gzip')
+    archive_cmd.add_argument('--backend', default=os.environ.get('STORAGE_BACKEND', 'json'))
+    archive_cmd.add_argument('--results', default='results.jsonl')
+    archive_cmd.add_argument('--plans', default='plans.json')
+    archive_cmd.add_argument('--db', default=os.environ.get('SQLITE_PATH', 'mindgen.db'))
+    archive_cmd.add_argument('--archive-dir', default=os.environ.get('ARCHIVE_DIR', 'archive'))
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        results_file = args.results or ('results.jsonl' if os.path.exists('results.jsonl') else 'results.json')
+        migrate(args.users, results_file, args.db)
+    elif args.command == 'dedupe-plans':
+        if args.backend == 'sqlite':
+            store = SQLiteStorage(args.db)
+        else:
+            store = JsonStorage(args.users, args.results, legacy_results_file='results.json', plans_file=args.plans)
+        store.dedupe_plans()
+        store.close()
+    elif args.command == 'archive':
+        if args.backend == 'sqlite':
+            store = SQLiteStorage(args.db, archive_dir=args.archive_dir)
+        else:
+            store = JsonStorage('users.json', args.results, legacy_results_file='results.json',
+                                plans_file=args.plans, archive_dir=args.archive_dir)
+        store.archive_older_than(args.older_than_days, args.compression)
+        store.close()
@@ -0,0 +1,51 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+# The application modules live at the top level of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# One complete, valid patient, with the field names of the /analyze form and the JSON API
+VALID_PATIENT = {
+    'age': 30, 'sex': 'Male', 'family_history': 'Yes', 'physical_activity': 'Low', 'sleep_duration': 4.5,
+    'cortisol': 15, 'vitamin_d': 20, 'bdnf_level': 20, 'crp': 1, 'tryptophan': 50, 'omega3_index': 5,
+    'mao_level': 1, 'serotonin_level': 100, 'hpa_dysregulation': 0.5, 'alpha_amylase': 50, 'HRV': 50, 'gaba': 1,
+    'IL6': 2, 'TNF_alpha': 2, 'Vitamin_B6': 10, 'neuroinflammation_score': 5, 'Sympathetic_Activation_Score': 5,
+    'gaba_function': 5, 'genotype_5httlpr': 'S/S', 'genotype_comt': 'Met/Met', 'genotype_maoa': 'Low',
+    'mthfr_genotype': 'CC', 'ank3_rs10994336': 'GG', 'cacna1c_rs1006737': 'AA', 'odz4_rs12576775': 'AA',
+    'glutamate_level': 'Normal', 'tryptophan_metabolites': 'Normal', 'cortisol_level': 'Normal',
+    'circadian_gene_disruption': 'No', 'mitochondrial_dysfunction': 'No', 'neuroinflammation': 'No',
+    'omega3_intake': 'Normal', 'folate_level': 'Normal', 'vitamind_level': 'Normal', 'phq9_score': 12,
+    'anxiety_score': 7,
+}
+
+
+@pytest.fixture
+def patient():
+    return dict(VALID_PATIENT)
+
+
+@pytest.fixture
+def load_app(tmp_path, monkeypatch):
+    """Import app fresh, with its data files in tmp_path and the given environment (config is read at import)."""
+    loaded = []
+
+    def load(**env):
+        monkeypatch.chdir(tmp_path)
+        settings = {'MODEL_DIR': str(tmp_path / 'models'), 'MODEL_RELOAD_INTERVAL': '0', 'BCRYPT_ROUNDS': '4',
+                    'SECRET_KEY': 'test', **env}
+        for name, value in settings.items():
+            monkeypatch.setenv(name, value)
+        sys.modules.pop('app', None)
+        module = importlib.import_module('app')
+        module.app.config['TESTING'] = True
+        loaded.append(module)
+        return module
+
+    yield load
+    for module in loaded:
+        module.store.close()
+    sys.modules.pop('app', None)
@@ -0,0 +1,130 @@
+"""/api/v1/analyze: bearer tokens, which users a service may write for, and per-patient errors."""
+import pytest
+
+TOKEN = {'Authorization': 'Bearer s3cret'}
+
+
+@pytest.fixture
+def api(load_app):
+    def make(grants=''):
+        app = load_app(API_TOKENS='svc:s3cret,other:0ther', API_TOKEN_USERS=grants)
+        for username in ('alice', 'bob'):
+            app.store.add_user({'id': f'{username}-id', 'name': username.title(), 'username': username,
+                                'password': 'x', 'security_question': 'q', 'security_answer': 'x',
+                                'created_at': '2024-01-01T00:00:00'})
+        return app, app.app.test_client()
+    return make
+
+
+def test_token_is_required(api, patient):
+    _, client = api()
+    assert client.post('/api/v1/analyze?persist=0', json=patient).status_code == 401
+    response = client.post('/api/v1/analyze?persist=0', json=patient, headers={'Authorization': 'Bearer nope'})
+    assert response.status_code == 401
+    assert response.headers['WWW-Authenticate'] == 'Bearer'
+
+
+def test_predictions_without_persisting(api, patient):
+    app, client = api()
+    response = client.post('/api/v1/analyze?persist=0', json=patient, headers=TOKEN)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['model_version'] == 'rules'
+    assert body['Depression'] == 'Persistent Depressive Disorder'
+    assert body['plan_key'].startswith('v')
+    assert 'report_id' not in body
+
+
+def test_saving_needs_a_username(api, patient):
+    app, client = api('svc:*')
+    response = client.post('/api/v1/analyze', json=patient, headers=TOKEN)
+    assert response.status_code == 400
+    assert 'username' in response.get_json()['error']
+    assert app.store.latest_result('svc') is None
+
+
+def test_saved_under_a_permitted_user(api, patient):
+    app, client = api('svc:alice')
+    response = client.post('/api/v1/analyze', json=dict(patient, username='alice', id='p1'), headers=TOKEN)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['id'] == 'p1'
+    record = app.store.get_result(body['report_id'], 'alice')
+    assert record['Depression'] == body['Depression']
+    assert record['model_version'] == 'rules'
+
+
+@pytest.mark.parametrize('grants, username', [
+    ('', 'alice'),              # no grant at all
+    ('svc:alice', 'bob'),       # granted someone else
+    ('other:*', 'alice'),       # another service's grant
+    ('svc:*', 'nobody'),        # not a registered user
+])
+def test_users_the_service_may_not_write_for(api, patient, grants, username):
+    app, client = api(grants)
+    response = client.post('/api/v1/analyze', json=dict(patient, username=username), headers=TOKEN)
+    assert response.status_code == 403
+    assert response.get_json()['error'] == f"cannot save assessments for '{username}'"
+    assert app.store.latest_result(username) is None
+
+
+@pytest.mark.parametrize('grants', ['svc:*', 'svc:alice'])
+@pytest.mark.parametrize('username', [['alice'], {'name': 'alice'}, 7])
+def test_username_must_be_a_string(api, patient, grants, username):
+    _, client = api(grants)
+    response = client.post('/api/v1/analyze', json=dict(patient, username=username), headers=TOKEN)
+    assert response.status_code == 400
+    assert response.get_json()['error'] == "'username' must be a string"
+    response = client.post('/api/v1/analyze?persist=0', json=dict(patient, username=username), headers=TOKEN)
+    assert response.status_code == 400
+
+
+def test_array_reports_errors_per_patient(api, patient):
+    app, client = api('svc:alice')
+    payload = [dict(patient, username='alice', id='ok'), dict(patient, username=['alice'], id='list'),
+               dict(patient, username='bob', id='bob'), dict(patient, age='old', username='alice', id='bad'),
+               'not a patient']
+    response = client.post('/api/v1/analyze', json=payload, headers=TOKEN)
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert [result['id'] for result in results] == ['ok', 'list', 'bob', 'bad', None]
+    assert 'error' not in results[0] and 'report_id' in results[0]
+    assert results[1]['error'] == "'username' must be a string"
+    assert results[2]['error'] == "cannot save assessments for 'bob'"
+    assert results[3]['fields'] == {'age': 'must be a whole number'}
+    assert 'expected an object' in results[4]['error']
+    assert app.store.get_result(results[0]['report_id'], 'alice') is not None
+
+
+def test_too_many_patients(load_app, patient):
+    app = load_app(API_TOKENS='svc:s3cret', API_MAX_PATIENTS='2')
+    response = app.app.test_client().post('/api/v1/analyze?persist=0', json=[patient] * 3, headers=TOKEN)
+    assert response.status_code == 413
+
+
+def test_prediction_failure_is_a_500(api, patient, monkeypatch):
+    app, client = api('svc:*')
+
+    def fail(bundle, inputs):
+        raise RuntimeError('model exploded')
+    monkeypatch.setattr(app, 'predict_disorders', fail)
+    response = client.post('/api/v1/analyze', json=dict(patient, username='alice'), headers=TOKEN)
+    assert response.status_code == 500
+    assert response.get_json()['error'] == 'prediction failed: model exploded'
+    assert app.store.latest_result('alice') is None
+
+
+def test_service_names_cannot_be_registered(api):
+    app, client = api()
+    response = client.post('/register', data={'name': 'S', 'username': 'svc', 'security_question': 'q',
+                                               'security_answer': 'a', 'password': 'pw', 'confirm_password': 'pw'})
+    assert response.status_code == 302
+    assert app.store.get_user('svc') is None
+
+
+def test_metrics_needs_a_token(api):
+    _, client = api()
+    assert client.get('/metrics').status_code == 401
+    response = client.get('/metrics', headers=TOKEN)
+    assert response.status_code == 200
+    assert 'storage' in response.get_json()
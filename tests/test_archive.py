@@ -0,0 +1,57 @@
+"""Archive segments: compressed round trip, lookups through the index files, and incomplete segments."""
+import os
+
+import pytest
+
+from archive import ResultsArchive
+
+
+def result(report_id, timestamp, username='alice'):
+    return {'id': report_id, 'username': username, 'timestamp': timestamp, 'Depression': 'No Depression'}
+
+
+@pytest.mark.parametrize('compression, suffix', [('gzip', '.jsonl.gz'), ('lzma', '.jsonl.xz')])
+def test_segment_round_trip(tmp_path, compression, suffix):
+    records = [result('a1', '2020-01-02'), result('b1', '2020-01-01', 'bob'), result('a0', '2020-01-01')]
+    segment = ResultsArchive(str(tmp_path)).write_segment(records, compression)
+    assert segment.endswith(suffix)
+
+    # A fresh instance (another worker, or a restart) finds the segment through its index
+    archive = ResultsArchive(str(tmp_path))
+    assert [archive.get(r['id']) for r in records] == records
+    assert archive.get_for_user('b1', 'alice') is None
+    assert archive.user_entries('alice') == [('2020-01-01', 'a0'), ('2020-01-02', 'a1')]
+    assert [r['id'] for r in archive.for_user('alice')] == ['a1', 'a0']
+    assert archive.user_entries_before('alice', ('2020-01-02', 'a1')) == [('2020-01-01', 'a0')]
+    assert archive.stats() == {'segments': 1, 'records': 3, 'segments_in_memory': 1}
+
+
+def test_segments_written_later_are_found(tmp_path):
+    archive = ResultsArchive(str(tmp_path))
+    assert archive.get('a1') is None
+    ResultsArchive(str(tmp_path)).write_segment([result('a1', '2020-01-01')])
+    assert archive.get('a1')['id'] == 'a1'
+
+
+def test_only_a_few_segments_stay_decompressed(tmp_path):
+    archive = ResultsArchive(str(tmp_path), cached_segments=2)
+    for i in range(4):
+        archive.write_segment([result(f'a{i}', f'2020-01-0{i + 1}')])
+    assert [archive.get(f'a{i}')['id'] for i in range(4)] == ['a0', 'a1', 'a2', 'a3']
+    assert archive.stats()['segments_in_memory'] == 2
+
+
+def test_segment_without_index_is_ignored(tmp_path):
+    archive = ResultsArchive(str(tmp_path))
+    archive.write_segment([result('a1', '2020-01-01')])
+    for name in os.listdir(tmp_path):
+        if name.endswith('.idx.json'):
+            os.remove(tmp_path / name)
+    assert ResultsArchive(str(tmp_path)).get('a1') is None
+
+
+def test_empty_batch_and_unknown_compression(tmp_path):
+    archive = ResultsArchive(str(tmp_path))
+    assert archive.write_segment([]) is None
+    with pytest.raises(ValueError, match='compression'):
+        archive.write_segment([result('a1', '2020-01-01')], 'zip')
@@ -0,0 +1,62 @@
+"""One compiled pass over a patient's fields: conversion, range checks and fan-out to the three models."""
+import pytest
+
+from batch_scoring import score_rows
+from input_schema import PATIENT_FIELDS, InputError, parse_patient, patient_inputs
+
+
+def test_fields_fan_out_to_every_model(patient):
+    inputs = patient_inputs(patient)
+    assert inputs['depression']['Age'] == inputs['bipolar']['Age'] == inputs['anxiety']['Age'] == 30
+    assert inputs['depression']['SleepDuration'] == inputs['bipolar']['Average_Sleep_Hours'] == 4.5
+    assert inputs['depression']['DepressionScore_PHQ9'] == 12
+    assert inputs['anxiety']['HRV (Heart Rate Variability)'] == 50.0
+    columns = {(model, column) for field in PATIENT_FIELDS for model, column in field.targets}
+    assert sum(len(values) for values in inputs.values()) == len(columns)
+
+
+def test_form_strings_parse_like_json_numbers(patient):
+    form = {name: f' {value} ' if not isinstance(value, str) else value for name, value in patient.items()}
+    assert patient_inputs(form) == patient_inputs(patient)
+
+
+@pytest.mark.parametrize('field, value, message', [
+    ('age', None, 'is required'),
+    ('age', '  ', 'is required'),
+    ('age', 30.5, 'must be a whole number'),
+    ('age', True, 'must be a whole number'),
+    ('age', 121, 'must be between 1 and 120'),
+    ('age', 10 ** 400, 'must be between 1 and 120'),
+    ('cortisol', 'abc', 'must be a number'),
+    ('cortisol', -1, 'must be at least 0'),
+    ('cortisol', float('nan'), 'must be a number'),
+    ('cortisol', float('inf'), 'must be a number'),
+    ('cortisol', 10 ** 400, 'must be a number'),
+    ('cortisol', [1], 'must be a number'),
+    ('sex', 'male', 'must be one of Male, Female'),
+    ('sex', 1, 'must be one of Male, Female'),
+])
+def test_invalid_field_is_reported(patient, field, value, message):
+    with pytest.raises(InputError) as excinfo:
+        patient_inputs(dict(patient, **{field: value}))
+    assert excinfo.value.errors == {field: message}
+
+
+def test_every_bad_field_is_reported_at_once(patient):
+    inputs, error = parse_patient(dict(patient, age='x', crp=10 ** 400, sex=None))
+    assert inputs is None
+    assert set(error.errors) == {'age', 'crp', 'sex'}
+    assert 'Age: must be a whole number' in str(error)
+
+
+def test_non_object_is_an_input_error():
+    _, error = parse_patient(['not', 'a', 'patient'])
+    assert error.errors == {'_': 'expected an object of patient fields'}
+
+
+def test_overflowing_number_fails_only_its_row_in_batch_scoring(patient):
+    rows = [dict(patient, id='a'), dict(patient, id='b', cortisol=10 ** 400), dict(patient, id='c')]
+    results = list(score_rows(rows))
+    assert [result['id'] for result in results] == ['a', 'b', 'c']
+    assert 'error' not in results[0] and 'error' not in results[2]
+    assert results[1]['error'] == 'invalid input: Cortisol: must be a number'
@@ -0,0 +1,141 @@
+"""Lite (numpy-only) predictions against the scikit-learn models they were exported from."""
+import os
+
+import numpy as np
+import pytest
+
+joblib = pytest.importorskip('joblib')
+pytest.importorskip('sklearn')
+
+from sklearn.dummy import DummyClassifier
+from sklearn.ensemble import ExtraTreesClassifier, GradientBoostingClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression, RidgeClassifier, SGDClassifier
+from sklearn.preprocessing import LabelEncoder
+from sklearn.svm import LinearSVC
+from sklearn.tree import DecisionTreeClassifier
+
+from lite_runtime import LITE_FILE, LiteSchema, _random_inputs, check_parity, export_models, load_lite_models
+from inference import ParallelPredictor
+from model_registry import ARTIFACTS, ModelRegistry, SMOKE_INPUTS, artifact_paths, artifacts_checksum
+
+ANXIETY_COLUMNS = [
+    "Age", "SleepDuration", "Genotype_5HTTLPR", "Genotype_COMT", "Genotype_MAOA",
+    "Cortisol", "Alpha_Amylase", "HRV (Heart Rate Variability)", "GABA", "IL6",
+    "TNF_alpha", "Tryptophan", "Vitamin_B6", "Omega3_Index", "HPA_Axis_Dysregulation",
+    "Sympathetic_Activation_Score", "GABAergic_Function_Score", "AnxietyScore_GAD7",
+]
+ANXIETY_LABELS = ["False", "Specific Phobia", "Generalized Anxiety Disorder", "Panic Disorder"]
+CATEGORY_MAPPINGS = {
+    'Genotype_5HTTLPR': {0: 'S/S', 1: 'S/L', 2: 'L/L'},
+    'Genotype_COMT': {0: 'Val/Val', 1: 'Val/Met', 2: 'Met/Met'},
+    'Genotype_MAOA': {0: 'Low', 1: 'High'},
+    'AnxietyDiagnosis': dict(enumerate(ANXIETY_LABELS)),
+}
+
+
+def write_artifacts(directory, anxiety_model, frame_columns=None, string_labels=False):
+    """
+    The six artifacts: constant depression and bipolar models, and anxiety_model fitted on synthetic patients
+    (on a DataFrame with frame_columns if given, and on label strings rather than codes if string_labels).
+    """
+    encoders = {}
+    for key, classes, label in (('depression', ['False', 'Atypical Depression'], 'Atypical Depression'),
+                                ('bipolar', ['False', 'BD-II'], 'BD-II')):
+        encoder = LabelEncoder().fit(classes)
+        model = DummyClassifier(strategy='constant', constant=encoder.transform([label])[0])
+        model.fit([[0]], encoder.transform([label]))
+        encoders[key] = (model, encoder)
+
+    schema = LiteSchema('anxiety', ANXIETY_COLUMNS, {col: mapping for col, mapping in CATEGORY_MAPPINGS.items()
+                                                     if col in ANXIETY_COLUMNS})
+    rows = _random_inputs(schema, 400, np.random.default_rng(1))
+    X = schema.vectorize(rows)
+    y = np.digitize([row['AnxietyScore_GAD7'] for row in rows], [5, 10, 15])
+    if frame_columns is not None or string_labels:
+        pd = pytest.importorskip('pandas')
+        frame = pd.DataFrame(X, columns=ANXIETY_COLUMNS)
+        X = frame[frame_columns] if frame_columns is not None else X
+        y = pd.Series([ANXIETY_LABELS[code] for code in y]) if string_labels else y
+    anxiety_model.fit(X, y)
+
+    objects = {
+        'depression_model': encoders['depression'][0],
+        'depression_encoder': encoders['depression'][1],
+        'bipolar_model': encoders['bipolar'][0],
+        'bipolar_encoder': encoders['bipolar'][1],
+        'anxiety_model': anxiety_model,
+        'anxiety_metadata': {'columns': ANXIETY_COLUMNS, 'category_mappings': CATEGORY_MAPPINGS},
+    }
+    for key, filename in ARTIFACTS.items():
+        joblib.dump(objects[key], os.path.join(directory, filename))
+
+
+@pytest.mark.parametrize('anxiety_model', [
+    DecisionTreeClassifier(random_state=0),
+    RandomForestClassifier(n_estimators=20, random_state=0),
+    ExtraTreesClassifier(n_estimators=20, random_state=0),
+    LogisticRegression(max_iter=2000),
+    LinearSVC(),
+    RidgeClassifier(),
+    SGDClassifier(random_state=0),
+], ids=lambda model: type(model).__name__)
+@pytest.mark.filterwarnings('ignore::sklearn.exceptions.ConvergenceWarning')
+def test_exported_models_match_scikit_learn(tmp_path, anxiety_model):
+    write_artifacts(tmp_path, anxiety_model)
+    path = export_models(str(tmp_path))
+    assert path == os.path.join(str(tmp_path), LITE_FILE)
+
+    version, models = load_lite_models(path)
+    assert version == artifacts_checksum(artifact_paths(str(tmp_path)))
+    assert set(models) == {'depression', 'bipolar', 'anxiety'}
+    # A model that always gives the same label would match trivially
+    rows = _random_inputs(models['anxiety'].schema, 200, np.random.default_rng(2))
+    assert len(set(models['anxiety'].predict_rows(rows))) > 1
+    assert check_parity(str(tmp_path), samples=1000)
+
+
+def test_unsupported_estimator_is_refused(tmp_path):
+    write_artifacts(tmp_path, GradientBoostingClassifier(n_estimators=5, random_state=0))
+    with pytest.raises(ValueError, match='not supported'):
+        export_models(str(tmp_path))
+    assert not os.path.exists(os.path.join(str(tmp_path), LITE_FILE))
+
+
+def test_columns_in_another_order_are_refused(tmp_path):
+    write_artifacts(tmp_path, DecisionTreeClassifier(random_state=0), frame_columns=ANXIETY_COLUMNS[::-1])
+    with pytest.raises(ValueError, match='different order'):
+        export_models(str(tmp_path))
+
+
+def test_object_arrays_are_refused(tmp_path):
+    write_artifacts(tmp_path, DecisionTreeClassifier(random_state=0), string_labels=True)
+    with pytest.raises(ValueError, match='Python objects'):
+        export_models(str(tmp_path))
+
+
+def registry(model_dir):
+    return ModelRegistry(str(model_dir), lambda models: ParallelPredictor(models), interval=0)
+
+
+def test_registry_serves_a_matching_export(tmp_path):
+    write_artifacts(tmp_path, DecisionTreeClassifier(random_state=0))
+    export_models(str(tmp_path))
+    bundle = registry(tmp_path).load()
+    assert bundle.runtime == 'lite'
+
+
+def test_registry_falls_back_to_joblib_when_the_export_does_not_load(tmp_path):
+    write_artifacts(tmp_path, DecisionTreeClassifier(random_state=0))
+    path = export_models(str(tmp_path))
+    # An export written before object arrays were refused: np.savez pickles them, the loader will not
+    with np.load(path) as data:
+        arrays = {key: data[key] for key in data.files}
+    arrays['anxiety/classes'] = arrays['anxiety/classes'].astype(object)
+    np.savez(path, **arrays)
+
+    models = registry(tmp_path)
+    bundle = models.load()
+    assert bundle.runtime == 'sklearn'
+    assert bundle.version == artifacts_checksum(artifact_paths(str(tmp_path)))
+    assert models.counters['lite_fallbacks'] == 1
+    assert set(bundle.predict_all(SMOKE_INPUTS)) == {'depression', 'bipolar', 'anxiety'}
@@ -0,0 +1,92 @@
+"""The on-disk report PDF cache, and download_report's ETag revalidation on top of it."""
+import os
+
+import pytest
+
+from pdf_cache import ReportPdfCache, pdf_key
+
+
+def test_get_or_build_builds_once(tmp_path):
+    cache = ReportPdfCache(str(tmp_path))
+    builds = []
+
+    def build():
+        builds.append(1)
+        return b'%PDF-1'
+
+    assert cache.get_or_build('k', build) == b'%PDF-1'
+    assert cache.get_or_build('k', build) == b'%PDF-1'
+    assert len(builds) == 1
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_least_recently_used_files_are_evicted(tmp_path):
+    cache = ReportPdfCache(str(tmp_path), max_bytes=25)
+    cache.put('a', b'x' * 10)
+    cache.put('b', b'x' * 10)
+    os.utime(tmp_path / 'a.pdf', (1, 1))
+    os.utime(tmp_path / 'b.pdf', (2, 2))
+    cache.put('c', b'x' * 10)
+    assert cache.get('a') is None and cache.get('b') is not None
+    assert cache.stats()['bytes'] == 20 and cache.stats()['evictions'] == 1
+    # Too large to ever fit: not stored at all
+    cache.put('huge', b'x' * 26)
+    assert cache.get('huge') is None
+
+
+def test_bound_holds_across_workers_sharing_the_directory(tmp_path):
+    workers = [ReportPdfCache(str(tmp_path), max_bytes=30) for _ in range(3)]
+    for i in range(12):
+        workers[i % 3].put(f'k{i}', b'x' * 10)
+        assert sum(entry.stat().st_size for entry in os.scandir(tmp_path)) <= 30
+
+
+def test_key_changes_with_what_is_printed():
+    key = pdf_key('0b7e3f0a-8c1d-4e55-9d59-1c3a2f6b7e10', 1, 'Alice', 'plan')
+    assert key.startswith('0b7e3f0a-8c1d-4e55-9d59-1c3a2f6b7e10-r1-')
+    assert pdf_key('0b7e3f0a-8c1d-4e55-9d59-1c3a2f6b7e10', 1, 'Alicia', 'plan') != key
+    assert pdf_key('0b7e3f0a-8c1d-4e55-9d59-1c3a2f6b7e10', 2, 'Alice', 'plan') != key
+    assert '/' not in pdf_key('../../etc/passwd', 1)
+
+
+@pytest.fixture
+def logged_in(load_app, patient):
+    app = load_app()
+    client = app.app.test_client()
+    client.post('/register', data={'username': 'alice', 'password': 'pw123456', 'name': 'Alice Example'})
+    with client.session_transaction() as session:
+        session['username'] = 'alice'
+        session['user_id'] = 'alice-id'
+    client.post('/analyze', data=patient)
+    report_id = app.store.latest_result('alice')['id']
+    return app, client, report_id
+
+
+def test_download_report_revalidates_with_etag(logged_in):
+    app, client, report_id = logged_in
+    first = client.get(f'/download_report/{report_id}')
+    assert first.status_code == 200 and first.data.startswith(b'%PDF')
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+    etag = first.headers['ETag']
+
+    revalidated = client.get(f'/download_report/{report_id}', headers={'If-None-Match': etag})
+    assert revalidated.status_code == 304 and revalidated.data == b''
+    assert revalidated.headers['ETag'] == etag
+
+    again = client.get(f'/download_report/{report_id}')
+    assert again.data == first.data
+    assert app.report_cache.stats()['hits'] == 1
+
+
+def test_stale_etag_gets_the_pdf(logged_in):
+    _, client, report_id = logged_in
+    response = client.get(f'/download_report/{report_id}', headers={'If-None-Match': '"stale"'})
+    assert response.status_code == 200 and response.data.startswith(b'%PDF')
+
+
+def test_other_users_reports_are_not_served(logged_in):
+    _, client, report_id = logged_in
+    with client.session_transaction() as session:
+        session['username'] = 'mallory'
+    response = client.get(f'/download_report/{report_id}', headers={'If-None-Match': '*'})
+    assert response.status_code == 302
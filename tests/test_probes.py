@@ -0,0 +1,29 @@
+"""Liveness and readiness probes: public status only, model details for token holders."""
+import pytest
+
+TOKEN = {'Authorization': 'Bearer s3cret'}
+
+
+def test_probes_hide_model_details_without_a_token(load_app):
+    app = load_app(API_TOKENS='svc:s3cret')
+    client = app.app.test_client()
+    for path in ('/healthz', '/readyz'):
+        response = client.get(path)
+        assert response.status_code == 200
+        assert response.get_json()['mode'] == 'rules'
+        assert 'models' not in response.get_json()
+        details = client.get(path, headers=TOKEN).get_json()
+        assert 'last_error' in details['models']
+
+
+def test_readyz_fails_when_present_models_do_not_load(load_app, tmp_path):
+    pytest.importorskip('joblib')
+    models = tmp_path / 'models'
+    models.mkdir()
+    for filename in ('DepressionModel.joblib', 'DepressionEncoder.joblib', 'BDModel.joblib',
+                     'BD_label_encoder.joblib', 'AnxietyModel.joblib', 'AnxietyMetadata.joblib'):
+        (models / filename).write_bytes(b'not a joblib file')
+    app = load_app(API_TOKENS='svc:s3cret')
+    response = app.app.test_client().get('/readyz')
+    assert response.status_code == 503
+    assert response.get_json() == {'mode': 'rules', 'has_models': False, 'ready': False}
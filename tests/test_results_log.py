@@ -0,0 +1,105 @@
+"""The append-only results log: its indexes, reopening, and recovery from a write torn by a crash."""
+import json
+
+import pytest
+
+from results_log import FSYNC_ALWAYS, ResultsLog, convert_json_array
+
+
+def result(report_id, username='alice', timestamp='2024-01-01T00:00:00'):
+    return {'id': report_id, 'username': username, 'timestamp': timestamp, 'Depression': 'No Depression'}
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'results.jsonl')
+
+
+def fill(log):
+    log.append(result('a1', timestamp='2024-01-02T00:00:00'))
+    log.append_many([result('b1', username='bob', timestamp='2024-01-01T00:00:00'),
+                     result('a2', timestamp='2024-01-03T00:00:00'),
+                     result('a0', timestamp='2024-01-01T00:00:00')])
+
+
+def test_records_round_trip_through_the_indexes(path):
+    log = ResultsLog(path, fsync=FSYNC_ALWAYS)
+    fill(log)
+    assert log.get('a2') == result('a2', timestamp='2024-01-03T00:00:00')
+    assert log.get('missing') is None
+    assert log.get_for_user('b1', 'alice') is None
+    assert log.user_report_ids('alice') == ['a2', 'a1', 'a0']
+    assert [r['id'] for r in log.for_user('bob')] == ['b1']
+    assert log.latest_for_user('alice')['id'] == 'a2'
+    assert log.latest_for_user('carol') is None
+    assert [r['id'] for r in log] == ['a1', 'b1', 'a2', 'a0']
+    assert len(log) == 4 and 'a0' in log
+
+
+def test_reopened_log_rebuilds_the_same_indexes(path):
+    log = ResultsLog(path)
+    fill(log)
+    log.sync()
+    reopened = ResultsLog(path)
+    assert reopened.user_report_ids('alice') == log.user_report_ids('alice')
+    assert reopened._offsets == log._offsets
+    assert [reopened.get(report_id) for report_id in ('a0', 'a1', 'a2', 'b1')] == \
+        [log.get(report_id) for report_id in ('a0', 'a1', 'a2', 'b1')]
+
+
+def test_appends_by_another_writer_are_picked_up(path):
+    reader, writer = ResultsLog(path), ResultsLog(path)
+    writer.append(result('a1'))
+    assert reader.get('a1') == result('a1')
+    assert reader.user_report_ids('alice') == ['a1']
+
+
+def test_user_entries_before_pages_backwards(path):
+    log = ResultsLog(path)
+    fill(log)
+    assert log.user_entries_before('alice', limit=2) == [('2024-01-02T00:00:00', 'a1'), ('2024-01-03T00:00:00', 'a2')]
+    assert log.user_entries_before('alice', ('2024-01-02T00:00:00', 'a1'), limit=2) == \
+        [('2024-01-01T00:00:00', 'a0')]
+
+
+def test_torn_last_line_is_skipped_then_terminated_by_the_next_append(path):
+    log = ResultsLog(path)
+    log.append(result('a1'))
+    # A crash in the middle of the next write leaves a fragment without its newline
+    with open(path, 'ab') as f:
+        f.write(json.dumps(result('torn')).encode('utf-8')[:25])
+
+    recovered = ResultsLog(path)
+    assert len(recovered) == 1 and 'torn' not in recovered
+    recovered.append(result('a2', timestamp='2024-01-02T00:00:00'))
+    assert recovered.get('a2')['id'] == 'a2'
+    assert recovered.user_report_ids('alice') == ['a2', 'a1']
+    # The fragment is now a complete (corrupt) line of its own, which a fresh scan skips
+    reopened = ResultsLog(path)
+    assert [r['id'] for r in reopened] == ['a1', 'a2']
+    assert reopened.get('a2') == recovered.get('a2')
+
+
+def test_rewrite_replaces_the_log_and_reindexes(path):
+    log = ResultsLog(path)
+    fill(log)
+    other = ResultsLog(path)
+    log.rewrite(lambda records: [r for r in records if r['username'] == 'alice'])
+    assert log.user_report_ids('bob') == []
+    assert log.get('a1')['id'] == 'a1'
+    # A second instance notices the file was replaced and reindexes from scratch
+    assert 'b1' not in other and other.user_report_ids('alice') == ['a2', 'a1', 'a0']
+
+
+def test_unknown_fsync_policy_is_rejected(path):
+    with pytest.raises(ValueError, match='fsync policy'):
+        ResultsLog(path, fsync='sometimes')
+
+
+def test_convert_json_array(tmp_path, path):
+    src = tmp_path / 'results.json'
+    src.write_text(json.dumps([result('a1'), result('b1', username='bob')]))
+    assert convert_json_array(str(src), path) == 2
+    assert [r['id'] for r in ResultsLog(path)] == ['a1', 'b1']
+    with pytest.raises(FileExistsError):
+        convert_json_array(str(src), path)
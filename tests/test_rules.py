@@ -0,0 +1,60 @@
+"""The hand-written if/elif classifier against the RULES table it implements, at every threshold boundary."""
+import itertools
+
+from rules import FIELD_DEFAULTS, OPERATORS, RULES, rule_based_predictions, rule_based_predictions_many
+
+
+def table_predictions(inputs):
+    """Walk RULES: per model, the label of the first rule whose conditions all hold, else the default."""
+    predictions = {}
+    for name, (rules, default) in RULES.items():
+        values = inputs[name]
+        predictions[name] = default
+        for conditions, label in rules:
+            if all(OPERATORS[op](values.get(field, FIELD_DEFAULTS[name, field]), value)
+                   for field, op, value in conditions):
+                predictions[name] = label
+                break
+    return predictions
+
+
+def boundary_grid():
+    """Every combination of values on, just below and just above each threshold, plus missing fields."""
+    missing = object()
+    phq9 = [-1, 0, 4, 4.5, 5, 9, 9.99, 10, 14, 15, 19, 20, 27, 28]
+    gad7 = [-1, 0, 4, 4.5, 5, 9, 10, 14, 14.5, 15, 21, 22]
+    htt = ['S/S', 'S/L', 'L/L', '', missing]
+    comt = ['Met/Met', 'Val/Met', 'Val/Val', '', missing]
+    family = ['Yes', 'No', 'yes', missing]
+    sleep = [0.0, 4.9, 5.0, 5.1, 5.9, 6.0, 6.1, 7.0, 8.9, 9.0, 9.1, 12.0, float('nan'), missing]
+    for p, h, g, c, f, s in itertools.product(phq9, htt, gad7, comt, family, sleep):
+        patient = {'depression': {'DepressionScore_PHQ9': p, 'Genotype_5HTTLPR': h},
+                   'bipolar': {'Family_History': f, 'Average_Sleep_Hours': s},
+                   'anxiety': {'AnxietyScore_GAD7': g, 'Genotype_COMT': c}}
+        yield {name: {k: v for k, v in values.items() if v is not missing} for name, values in patient.items()}
+
+
+GRID = list(boundary_grid())
+
+
+def test_table_is_well_formed():
+    for name, (rules, _) in RULES.items():
+        for conditions, _ in rules:
+            for field, op, _ in conditions:
+                assert op in OPERATORS
+                assert (name, field) in FIELD_DEFAULTS
+
+
+def test_single_patient_matches_table():
+    mismatches = [patient for patient in GRID if rule_based_predictions(patient) != table_predictions(patient)]
+    assert not mismatches, mismatches[:5]
+
+
+def test_batch_matches_table():
+    assert rule_based_predictions_many(GRID) == [table_predictions(patient) for patient in GRID]
+    assert rule_based_predictions_many([]) == []
+
+
+def test_empty_inputs_use_defaults():
+    assert rule_based_predictions({'depression': {}, 'bipolar': {}, 'anxiety': {}}) == \
+        {'depression': 'False', 'bipolar': 'False', 'anxiety': 'False'}
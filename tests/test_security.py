@@ -0,0 +1,100 @@
+"""The bcrypt pool's admission control and rehash check, and the login throttle's windows and bounds."""
+import threading
+
+import pytest
+
+from security import HasherBusy, LoginThrottle, PasswordHasher, bcrypt_cost
+
+
+def test_hash_and_verify():
+    hasher = PasswordHasher(rounds=4)
+    hashed = hasher.hash('s3cret')
+    assert bcrypt_cost(hashed) == 4
+    assert hasher.verify('s3cret', hashed)
+    assert not hasher.verify('wrong', hashed)
+    assert hasher.stats()['verify']['count'] == 2
+
+
+def test_needs_rehash_when_the_work_factor_changes():
+    hashed = PasswordHasher(rounds=4).hash('s3cret')
+    assert not PasswordHasher(rounds=4).needs_rehash(hashed)
+    assert PasswordHasher(rounds=5).needs_rehash(hashed)
+    # werkzeug hashes from before the bcrypt switch
+    assert bcrypt_cost('pbkdf2:sha256:600000$salt$digest') is None
+    assert PasswordHasher(rounds=4).needs_rehash('pbkdf2:sha256:600000$salt$digest')
+
+
+def test_full_pool_rejects_instead_of_queueing():
+    hasher = PasswordHasher(workers=1, max_queue=0, rounds=4)
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return True
+
+    thread = threading.Thread(target=hasher._run, args=('verify', slow))
+    thread.start()
+    try:
+        assert started.wait(5)
+        with pytest.raises(HasherBusy):
+            hasher.verify('s3cret', '$2b$04$' + 'a' * 53)
+        assert hasher.stats()['rejected'] == 1
+    finally:
+        release.set()
+        thread.join()
+    # The slot is released once the slow call finishes
+    assert hasher.verify('s3cret', hasher.hash('s3cret'))
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr('security.time.monotonic', clock)
+    return clock
+
+
+def test_throttle_blocks_a_user_until_the_window_passes(clock):
+    throttle = LoginThrottle(max_user_failures=3, max_ip_failures=100, window=60)
+    for _ in range(3):
+        assert throttle.check('alice', '10.0.0.1') == 0
+        throttle.record_failure('alice', '10.0.0.1')
+    assert throttle.check('alice', '10.0.0.2') == 61
+    assert throttle.check('bob', '10.0.0.1') == 0
+    clock.now += 30
+    assert throttle.check('alice', '10.0.0.1') == 31
+    clock.now += 31
+    assert throttle.check('alice', '10.0.0.1') == 0
+    assert throttle.stats()['rejected'] == {'user': 2, 'ip': 0}
+
+
+def test_throttle_blocks_an_address_across_usernames(clock):
+    throttle = LoginThrottle(max_user_failures=100, max_ip_failures=3, window=60)
+    for name in ('alice', 'bob', 'carol'):
+        throttle.record_failure(name, '10.0.0.1')
+    assert throttle.check('dave', '10.0.0.1') > 0
+    assert throttle.check('dave', '10.0.0.2') == 0
+
+
+def test_success_clears_the_user_count(clock):
+    throttle = LoginThrottle(max_user_failures=2, window=60)
+    throttle.record_failure('alice', '10.0.0.1')
+    throttle.record_success('alice')
+    throttle.record_failure('alice', '10.0.0.1')
+    assert throttle.check('alice', '10.0.0.1') == 0
+
+
+def test_tracked_keys_are_bounded(clock):
+    throttle = LoginThrottle(max_keys=10)
+    for i in range(20):
+        throttle.record_failure(f'user{i}', '10.0.0.1')
+    stats = throttle.stats()
+    assert stats['tracked_keys'] == 10 and stats['evicted'] == 11
@@ -0,0 +1,88 @@
+"""Both storage backends: keyset pagination across the hot store and the archive, and plan rehydration."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from storage import open_storage
+from treatment_plans import PLAN_TABLE, plan_key, recommended_path
+
+TRIPLE = sorted(PLAN_TABLE)[0]
+
+
+def result(report_id, timestamp, username='alice'):
+    return {'id': report_id, 'username': username, 'timestamp': timestamp, 'Depression': TRIPLE[0],
+            'BipolarDisorder': TRIPLE[1], 'Anxiety': TRIPLE[2], 'plan_key': plan_key(*TRIPLE),
+            'Report': recommended_path(*TRIPLE)}
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def store(request, tmp_path):
+    store = open_storage(request.param, str(tmp_path / 'users.json'), str(tmp_path / 'results.jsonl'),
+                         sqlite_path=str(tmp_path / 'mindgen.db'), plans_file=str(tmp_path / 'plans.json'),
+                         archive_dir=str(tmp_path / 'archive'))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def history(store):
+    """alice: 7 results from 2020 (archived below) and 5 recent ones; pairs share a timestamp to test id order."""
+    recent = datetime.utcnow() - timedelta(hours=1)
+    old = [result(f'old-{i}', f'2020-01-0{1 + i // 2}T00:00:00') for i in range(7)]
+    new = [result(f'new-{i}', (recent + timedelta(minutes=i // 2)).isoformat()) for i in range(5)]
+    store.add_results(old + new)
+    store.add_result(result('other', '2020-01-01T00:00:00', username='bob'))
+    assert store.archive_older_than(30) == 8
+    return sorted(old + new, key=lambda r: (r['timestamp'], r['id']), reverse=True)
+
+
+def all_pages(store, limit):
+    pages, cursor = [], None
+    while True:
+        records, cursor = store.user_results_page('alice', cursor, limit)
+        pages.append([r['id'] for r in records])
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize('limit', [1, 3, 5, 7, 12, 20])
+def test_pages_cross_the_archive_boundary_without_gaps_or_duplicates(store, history, limit):
+    pages = all_pages(store, limit)
+    assert [report_id for page in pages for report_id in page] == [r['id'] for r in history]
+    assert all(len(page) == limit for page in pages[:-1])
+    assert 0 < len(pages[-1]) <= limit
+
+
+def test_pages_are_rehydrated_from_both_stores(store, history):
+    records, cursor = store.user_results_page('alice', None, 20)
+    assert cursor is None
+    assert {r['Report'] for r in records} == {recommended_path(*TRIPLE)}
+    assert records == store.user_results('alice')
+
+
+def test_archived_results_are_still_served(store, history):
+    assert store.stats()['archive']['records'] == 8
+    archived = store.get_result('old-0', 'alice')
+    assert archived['timestamp'] == '2020-01-01T00:00:00' and archived['Report'] == recommended_path(*TRIPLE)
+    assert store.get_result('old-0', 'bob') is None
+    assert store.latest_result('alice')['id'] == history[0]['id']
+    # With nothing left in the hot store the latest result comes from the archive
+    assert store.latest_result('bob')['id'] == 'other'
+
+
+def test_new_user_has_an_empty_last_page(store):
+    assert store.user_results_page('nobody') == ([], None)
+    assert store.latest_result('nobody') is None
+
+
+def test_users_round_trip(store):
+    assert store.add_user({'id': '1', 'username': 'alice', 'password': 'x'})
+    assert not store.add_user({'id': '2', 'username': 'alice', 'password': 'y'})
+    store.update_user({'id': '1', 'username': 'alice', 'password': 'z'})
+    assert store.get_user('alice') == {'id': '1', 'username': 'alice', 'password': 'z'}
+    assert store.get_user('bob') is None
+
+
+def test_unknown_backend_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match='storage backend'):
+        open_storage('csv', 'users.json', 'results.jsonl')
@@ -0,0 +1,55 @@
+"""The plan table against pinned content hashes, and the text round trip used for older reports."""
+import pytest
+
+from treatment_plans import (PLAN_HASHES, PLAN_TABLE, PLAN_VERSION, TreatmentReport, plan_key, report_for_record,
+                             table_hash)
+
+# table_hash() of all 144 plan texts, per plan version. Version 1 is the output of the original generator in
+# app.py; stored reports reference these texts by plan key, so a pinned hash must never change.
+PINNED_HASHES = {
+    1: 'e9080c26f8ece742',
+}
+
+
+def outline(report):
+    return [(section.title, section.style, section.items) for section in report.sections]
+
+
+def test_plan_texts_match_pinned_hash():
+    texts = {triple: report.text for triple, report in PLAN_TABLE.items()}
+    assert len(texts) == 144
+    assert table_hash(texts) == PINNED_HASHES[PLAN_VERSION], \
+        'plan wording changed: bump PLAN_VERSION and pin the new hash here and in PLAN_HASHES'
+
+
+def test_module_hashes_agree_with_pinned():
+    assert PLAN_HASHES == PINNED_HASHES
+
+
+@pytest.mark.parametrize('triple', sorted(PLAN_TABLE), ids=lambda triple: plan_key(*triple))
+def test_text_parses_back_into_sections(triple):
+    report = PLAN_TABLE[triple]
+    assert outline(TreatmentReport.from_text(report.text)) == outline(report)
+
+
+
+def stored(triple, **fields):
+    return {'Depression': triple[0], 'BipolarDisorder': triple[1], 'Anxiety': triple[2], **fields}
+
+
+def test_current_plan_key_uses_the_table():
+    triple = sorted(PLAN_TABLE)[0]
+    record = stored(triple, plan_key=plan_key(*triple), Report='ignored')
+    assert report_for_record(record) is PLAN_TABLE[triple]
+
+
+@pytest.mark.parametrize('key', [None, 'v0:old', 'legacy-0123456789ab:old'])
+def test_older_records_keep_their_stored_text(key):
+    triple = sorted(PLAN_TABLE)[0]
+    text = 'Treatment Plan\n\nAn older wording of this plan.'
+    record = stored(triple, Report=text)
+    if key is not None:
+        record['plan_key'] = key
+    report = report_for_record(record)
+    assert outline(report) == outline(TreatmentReport.from_text(text))
+    assert outline(report) != outline(PLAN_TABLE[triple])
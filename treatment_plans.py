@@ -0,0 +1,643 @@
+"""
+Treatment plan generation.
+
+A treatment plan is a pure function of the (depression, bipolar, anxiety)
+prediction triple, so stored results reference plans by a content key
+(plan version + triple) instead of embedding the full report text.
+Bump PLAN_VERSION whenever the wording or structure of the plans changes.
+
+A plan is a TreatmentReport: ordered sections (heading, list style, items)
+built from generate_treatment_plan_dict(). The results page and the PDF walk
+those sections. The plain-text report, which storage keeps under the plan key,
+is rendered from them only when `text` is first read.
+
+There are only 6 x 4 x 6 = 144 triples, so every report is built once at
+import into PLAN_TABLE, a read-only mapping, and treatment_report() and
+recommended_path() are lookups. A label outside the known sets (a retrained
+model with a new class) is still built on the spot. `python treatment_plans.py
+verify` checks that every text parses back into the same sections and that
+the text hash is the one pinned for the current PLAN_VERSION in PLAN_HASHES,
+and times the generator against the table. tests/test_treatment_plans.py
+makes the same checks against hashes pinned in the test itself, so a wording
+change without a PLAN_VERSION bump fails the tests.
+
+Usage:
+    python treatment_plans.py verify
+"""
+import hashlib
+import itertools
+import sys
+import time
+from types import MappingProxyType
+
+PLAN_VERSION = 1
+
+# Labels each model can predict ("False" means the condition was not detected)
+DEPRESSION_TYPES = ("False", "Major Depressive Disorder", "Persistent Depressive Disorder", "Atypical Depression",
+                    "Psychotic Depression", "Seasonal Affective Disorder")
+BIPOLAR_TYPES = ("False", "BD-I", "BD-II", "Cyclothymia")
+ANXIETY_TYPES = ("False", "Generalized Anxiety Disorder", "Panic Disorder", "Social Anxiety Disorder",
+                 "Agoraphobia", "Specific Phobia")
+
+# Expected PLAN_TABLE_HASH for each plan version
+PLAN_HASHES = {
+    1: 'e9080c26f8ece742',
+}
+
+
+def plan_key(depression_pred, bipolar_pred, anxiety_pred, version=PLAN_VERSION):
+    """Content key for the plan generated for a prediction triple."""
+    return f"v{version}:{depression_pred}|{bipolar_pred}|{anxiety_pred}"
+
+
+# Sections of the report after the overview and conditions: (plan dict key, heading, list style)
+SECTIONS = [
+    ("Genetic_Considerations", "GENETIC CONSIDERATIONS", "bullet"),
+    ("Diagnostic_Confirmation", "DIAGNOSTIC CONFIRMATION STEPS", "bullet"),
+    ("Personalized_Interventions", "PERSONALIZED INTERVENTIONS", "numbered"),
+    ("Pharmacological_Approach", "PHARMACOLOGICAL APPROACH", "numbered"),
+    ("Nutrigenomic_Recommendations", "NUTRIGENOMIC RECOMMENDATIONS", "bullet"),
+    ("Lifestyle_Modifications", "LIFESTYLE MODIFICATIONS", "bullet"),
+    ("Therapeutic_Approaches", "THERAPEUTIC APPROACHES", "numbered"),
+    ("Monitoring_and_Followup", "MONITORING AND FOLLOW-UP PLAN", "bullet"),
+    ("Special_Considerations", "SPECIAL CONSIDERATIONS", "warning"),
+]
+
+# How each list style marks its items in the text report
+MARKERS = {"text": "", "dash": "- ", "bullet": "• ", "warning": "⚠️ "}
+
+REPORT_TITLE = "MINDGEN AI® PERSONALIZED TREATMENT PLAN REPORT"
+
+
+class ReportSection:
+    __slots__ = ('title', 'style', 'items')
+
+    def __init__(self, title, style, items):
+        self.title = title      # heading as printed in the text report
+        self.style = style      # 'text', 'dash', 'bullet', 'numbered' or 'warning'
+        self.items = tuple(items)
+
+    def lines(self):
+        if self.style == "numbered":
+            return [f"{i}. {item}" for i, item in enumerate(self.items, 1)]
+        return [MARKERS[self.style] + item for item in self.items]
+
+
+class TreatmentReport:
+    """
+    A treatment plan as ordered sections, built from generate_treatment_plan_dict(). Renderers (the
+    results page, the PDF) walk `sections`; the plain-text form is only rendered when `text` is read.
+    """
+
+    def __init__(self, sections, triple=None):
+        self.sections = tuple(sections)
+        self.triple = triple    # None for a report parsed from stored text
+        self._text = None
+
+    @classmethod
+    def for_predictions(cls, depression_pred, bipolar_pred, anxiety_pred):
+        treatment_plan = generate_treatment_plan_dict(depression_pred, bipolar_pred, anxiety_pred)
+        conditions = [pred for pred in (depression_pred, bipolar_pred, anxiety_pred) if pred != "False"]
+        sections = [
+            ReportSection("OVERVIEW", "text", [treatment_plan["Overview"]]),
+            ReportSection("CONDITIONS IDENTIFIED", "dash",
+                          conditions or ["No significant mental health conditions detected"]),
+        ]
+        sections.extend(ReportSection(title, style, treatment_plan[key])
+                        for key, title, style in SECTIONS if treatment_plan[key])
+        return cls(sections, (depression_pred, bipolar_pred, anxiety_pred))
+
+    @classmethod
+    def from_text(cls, text):
+        """
+        Best-effort structure for a stored text report that no longer matches the generator (a legacy
+        plan key), recognizing the layout the text renderer produces.
+        """
+        sections = []
+        for line in text.split('\n'):
+            line = line.strip()
+            if not line or line.startswith('===') or line.startswith('---') or line in (REPORT_TITLE, "END OF REPORT"):
+                continue
+            # List markers first: an item such as "- BD-I" is all upper case too
+            for style in ("bullet", "dash", "warning"):
+                if line.startswith(MARKERS[style]):
+                    item = line[len(MARKERS[style]):]
+                    break
+            else:
+                number, dot, rest = line.partition('. ')
+                style, item = ("numbered", rest) if dot and number.isdigit() else ("text", line)
+                if style == "text" and line.isupper() and len(line) > 3:
+                    sections.append(ReportSection(line, "text", []))
+                    continue
+            if not sections:
+                sections.append(ReportSection("", "text", []))
+            section = sections[-1]
+            if not section.items:
+                section.style = style
+            section.items += (item,)
+        return cls(sections)
+
+    @property
+    def text(self):
+        if self._text is None:
+            report = ["=" * 80, REPORT_TITLE, "=" * 80, "\n"]
+            for section in self.sections:
+                report.append(section.title)
+                report.append("-" * 80)
+                report.extend(section.lines())
+                report.append("\n")
+            report.extend(["=" * 80, "END OF REPORT", "=" * 80])
+            self._text = "\n".join(report)
+        return self._text
+
+
+def treatment_report(depression_pred, bipolar_pred, anxiety_pred):
+    """Structured treatment plan for a prediction triple, from the precomputed table when possible."""
+    report = PLAN_TABLE.get((depression_pred, bipolar_pred, anxiety_pred))
+    if report is None:
+        report = TreatmentReport.for_predictions(depression_pred, bipolar_pred, anxiety_pred)
+    return report
+
+
+def report_for_record(record):
+    """
+    Structured plan for a stored assessment: from its predictions when it references the current plan
+    version, otherwise parsed from the text it was stored with. Records saved before plan keys existed
+    keep the text they were saved with, which may differ from what the table generates today.
+    """
+    key = record.get('plan_key')
+    if key is not None and key == plan_key(record['Depression'], record['BipolarDisorder'], record['Anxiety']):
+        return treatment_report(record['Depression'], record['BipolarDisorder'], record['Anxiety'])
+    return TreatmentReport.from_text(record.get('Report', ''))
+
+
+def current_plan_triple(key):
+    """The prediction triple of a plan key from the current PLAN_VERSION, or None for any other key."""
+    version, _, triple = key.partition(':')
+    if version != f"v{PLAN_VERSION}":
+        return None
+    parts = tuple(triple.split('|'))
+    return parts if len(parts) == 3 else None
+
+
+def recommended_path(depression_pred, bipolar_pred, anxiety_pred):
+    """Formatted text treatment plan report for a prediction triple."""
+    return treatment_report(depression_pred, bipolar_pred, anxiety_pred).text
+
+
+def generate_treatment_plan_dict(depression_pred, bipolar_pred, anxiety_pred):
+    """
+    Provides a customized treatment plan based on predicted mental health conditions.
+
+    Parameters:
+    - depression_pred: One of the depression types or 'False'
+    - bipolar_pred: One of the bipolar disorder types or 'False'
+    - anxiety_pred: One of the anxiety types or 'False'
+
+    Returns:
+    - A detailed treatment plan dictionary with sections for each condition and combined recommendations
+    """
+
+    # Initialize the treatment plan
+    treatment_plan = {
+        "Overview": "",
+        "Genetic_Considerations": [],
+        "Diagnostic_Confirmation": [],
+        "Personalized_Interventions": [],
+        "Pharmacological_Approach": [],
+        "Nutrigenomic_Recommendations": [],
+        "Lifestyle_Modifications": [],
+        "Therapeutic_Approaches": [],
+        "Monitoring_and_Followup": [],
+        "Special_Considerations": []
+    }
+
+    # Helper function to add unique items to a section
+    def add_unique(section, items):
+        for item in items:
+            if item not in treatment_plan[section]:
+                treatment_plan[section].append(item)
+
+    # Overview section
+    conditions = []
+    if depression_pred != "False":
+        conditions.append(depression_pred)
+    if bipolar_pred != "False":
+        conditions.append(bipolar_pred)
+    if anxiety_pred != "False":
+        conditions.append(anxiety_pred)
+
+    if not conditions:
+        treatment_plan["Overview"] = "No significant mental health conditions detected. Maintain current wellness practices."
+        return treatment_plan
+    else:
+        treatment_plan["Overview"] = f"Comprehensive treatment plan for: {', '.join(conditions)}"
+
+    # ========================
+    # DEPRESSION RECOMMENDATIONS
+    # ========================
+    if depression_pred != "False":
+        # Genetic considerations for depression
+        dep_genetic = [
+            "Review 5-HTTLPR, COMT, and MAOA genotypes for serotonin metabolism insights",
+            "Assess BDNF levels and genetic variants for neuroplasticity impact",
+            "Evaluate MTHFR status for folate metabolism implications"
+        ]
+        add_unique("Genetic_Considerations", dep_genetic)
+
+        # Diagnostic confirmation for depression
+        dep_diagnostic = [
+            "Confirm diagnosis with structured clinical interview (e.g., SCID)",
+            "Assess severity using PHQ-9 and clinician-rated scales",
+            "Evaluate for comorbid medical conditions affecting mood"
+        ]
+        add_unique("Diagnostic_Confirmation", dep_diagnostic)
+
+        # Depression-specific interventions
+        if depression_pred == "Major Depressive Disorder":
+            dep_interventions = [
+                "Initiate evidence-based psychotherapy (CBT or IPT)",
+                "Consider pharmacogenomic testing for antidepressant selection",
+                "Implement mood monitoring system",
+                "Assess suicide risk and develop safety plan"
+            ]
+        elif depression_pred == "Persistent Depressive Disorder":
+            dep_interventions = [
+                "Long-term psychotherapy approach (CBT or psychodynamic)",
+                "Consider combination treatment with medication and therapy",
+                "Focus on building resilience and coping strategies",
+                "Address chronic stressors and interpersonal factors"
+            ]
+        elif depression_pred == "Atypical Depression":
+            dep_interventions = [
+                "Prioritize MAOIs or SSRIs with noradrenergic effects",
+                "Focus on regulating sleep and appetite patterns",
+                "Behavioral activation to counteract lethargy",
+                "Address rejection sensitivity in therapy"
+            ]
+        elif depression_pred == "Psychotic Depression":
+            dep_interventions = [
+                "Requires combination of antidepressant and antipsychotic",
+                "Close monitoring for safety concerns",
+                "Consider inpatient care if severe",
+                "Family education and support"
+            ]
+        elif depression_pred == "Seasonal Affective Disorder":
+            dep_interventions = [
+                "Light therapy (10,000 lux for 30-45 min daily)",
+                "Consider vitamin D supplementation",
+                "Timed melatonin administration",
+                "Cognitive-behavioral therapy adapted for SAD"
+            ]
+        add_unique("Personalized_Interventions", dep_interventions)
+
+        # Pharmacological approach for depression
+        dep_pharma = [
+            "Select antidepressant based on genetic profile and subtype",
+            "Consider SSRI first-line unless contraindicated",
+            "Monitor for 4-6 weeks before assessing efficacy",
+            "Adjust dose based on therapeutic drug monitoring if available"
+        ]
+        add_unique("Pharmacological_Approach", dep_pharma)
+
+        # Nutrigenomic recommendations for depression
+        dep_nutri = [
+            "Ensure adequate tryptophan intake (precursor to serotonin)",
+            "Optimize omega-3 fatty acids (EPA/DHA 1-2g daily)",
+            "Consider methylfolate if MTHFR variants present",
+            "Address potential micronutrient deficiencies (B12, zinc, magnesium)"
+        ]
+        add_unique("Nutrigenomic_Recommendations", dep_nutri)
+
+        # Lifestyle modifications for depression
+        dep_lifestyle = [
+            "Regular aerobic exercise (3-5x/week)",
+            "Sleep hygiene education and regulation",
+            "Structured daily routine",
+            "Social connection and support system building"
+        ]
+        add_unique("Lifestyle_Modifications", dep_lifestyle)
+
+    # ========================
+    # BIPOLAR DISORDER RECOMMENDATIONS
+    # ========================
+    if bipolar_pred != "False":
+        # Genetic considerations for bipolar
+        bp_genetic = [
+            "Review ANK3, CACNA1C, and ODZ4 variants for calcium channel insights",
+            "Assess circadian gene polymorphisms",
+            "Evaluate mitochondrial DNA variants if dysfunction suspected"
+        ]
+        add_unique("Genetic_Considerations", bp_genetic)
+
+        # Diagnostic confirmation for bipolar
+        bp_diagnostic = [
+            "Confirm diagnosis with MINI or SCID",
+            "Detailed mood episode history and family history",
+            "Rule out substance-induced mood episodes",
+            "Assess for mixed features"
+        ]
+        add_unique("Diagnostic_Confirmation", bp_diagnostic)
+
+        # Bipolar-specific interventions
+        if bipolar_pred == "BD-I":
+            bp_interventions = [
+                "Mood stabilizer as foundation (lithium, valproate, or lamotrigine)",
+                "Monitor for manic/hypomanic symptoms closely",
+                "Psychoeducation about illness course",
+                "Develop relapse prevention plan"
+            ]
+        elif bipolar_pred == "BD-II":
+            bp_interventions = [
+                "Lamotrigine or quetiapine as first-line",
+                "Focus on depression prevention",
+                "Careful monitoring for hypomania with antidepressants",
+                "Address interpersonal and social rhythm disruptions"
+            ]
+        elif bipolar_pred == "Cyclothymia":
+            bp_interventions = [
+                "Consider low-dose mood stabilizer if impairing",
+                "Focus on lifestyle regularity",
+                "Cognitive therapy for mood swings",
+                "Monitor for progression to BD-I or II"
+            ]
+        add_unique("Personalized_Interventions", bp_interventions)
+
+        # Pharmacological approach for bipolar
+        bp_pharma = [
+            "Avoid antidepressants without mood stabilizer in BD-I",
+            "Consider lithium for suicide prevention in BD",
+            "Monitor valproate levels in women of childbearing age",
+            "Adjust treatment based on phase (acute vs maintenance)"
+        ]
+        add_unique("Pharmacological_Approach", bp_pharma)
+
+        # Nutrigenomic recommendations for bipolar
+        bp_nutri = [
+            "Ensure adequate omega-3 intake (may have mood stabilizing effects)",
+            "Consider N-acetylcysteine as adjunctive",
+            "Monitor homocysteine levels (may relate to folate metabolism)",
+            "Address circadian-related nutrition (timed meals, caffeine management)"
+        ]
+        add_unique("Nutrigenomic_Recommendations", bp_nutri)
+
+        # Lifestyle modifications for bipolar
+        bp_lifestyle = [
+            "Strict sleep-wake cycle maintenance",
+            "Social rhythm therapy to stabilize daily patterns",
+            "Stress reduction techniques",
+            "Avoidance of substances and sleep deprivation"
+        ]
+        add_unique("Lifestyle_Modifications", bp_lifestyle)
+
+    # ========================
+    # ANXIETY DISORDER RECOMMENDATIONS
+    # ========================
+    if anxiety_pred != "False":
+        # Genetic considerations for anxiety
+        anx_genetic = [
+            "Review SLC6A4 and other serotonin transporter variants",
+            "Assess COMT Val158Met for stress response impact",
+            "Evaluate GABA receptor polymorphisms if panic features present"
+        ]
+        add_unique("Genetic_Considerations", anx_genetic)
+
+        # Diagnostic confirmation for anxiety
+        anx_diagnostic = [
+            "Confirm diagnosis with ADIS or similar structured interview",
+            "Assess avoidance behaviors and functional impact",
+            "Rule out medical causes (hyperthyroidism, etc.)",
+            "Evaluate for trauma history if relevant"
+        ]
+        add_unique("Diagnostic_Confirmation", anx_diagnostic)
+
+        # Anxiety-specific interventions
+        if anxiety_pred == "Generalized Anxiety Disorder":
+            anx_interventions = [
+                "CBT with worry exposure and cognitive restructuring",
+                "Mindfulness-based stress reduction",
+                "Address intolerance of uncertainty",
+                "Problem-solving skills training"
+            ]
+        elif anxiety_pred == "Panic Disorder":
+            anx_interventions = [
+                "Interoceptive exposure therapy",
+                "Cognitive restructuring of catastrophic interpretations",
+                "Breathing retraining",
+                "Gradual exposure to avoided situations"
+            ]
+        elif anxiety_pred == "Social Anxiety Disorder":
+            anx_interventions = [
+                "Social skills training if deficits present",
+                "Cognitive restructuring of negative beliefs",
+                "Exposure to social situations",
+                "Attention retraining for self-focused attention"
+            ]
+        elif anxiety_pred == "Agoraphobia":
+            anx_interventions = [
+                "In vivo exposure hierarchy development",
+                "Cognitive challenging of safety behaviors",
+                "Gradual expansion of safe zone",
+                "Partner/family involvement if helpful"
+            ]
+        elif anxiety_pred == "Specific Phobia":
+            anx_interventions = [
+                "Exposure therapy tailored to phobic stimulus",
+                "Systematic desensitization",
+                "Cognitive restructuring of threat appraisal",
+                "Modeling and reinforcement techniques"
+            ]
+        add_unique("Personalized_Interventions", anx_interventions)
+
+        # Pharmacological approach for anxiety
+        anx_pharma = [
+            "Consider SSRI/SNRI as first-line pharmacotherapy",
+            "Short-term benzodiazepine only if severe impairment",
+            "Monitor for initial anxiety exacerbation with SSRIs",
+            "Consider buspirone for GAD if SSRI not tolerated"
+        ]
+        add_unique("Pharmacological_Approach", anx_pharma)
+
+        # Nutrigenomic recommendations for anxiety
+        anx_nutri = [
+            "Ensure balanced blood sugar (avoid hypoglycemia triggers)",
+            "Consider L-theanine and magnesium for relaxation",
+            "Monitor caffeine and alcohol intake",
+            "Adequate protein intake for amino acid precursors"
+        ]
+        add_unique("Nutrigenomic_Recommendations", anx_nutri)
+
+        # Lifestyle modifications for anxiety
+        anx_lifestyle = [
+            "Regular exercise (yoga can be particularly helpful)",
+            "Breathing and relaxation practice",
+            "Stimulant reduction (caffeine, nicotine)",
+            "Sleep hygiene optimization"
+        ]
+        add_unique("Lifestyle_Modifications", anx_lifestyle)
+
+    # ========================
+    # COMBINATION CONSIDERATIONS
+    # ========================
+
+    # Special considerations for combinations
+    combo_special = []
+
+    # Depression + Anxiety
+    if depression_pred != "False" and anxiety_pred != "False":
+        combo_special.extend([
+            "Address depression first if severe as it may limit anxiety treatment engagement",
+            "Consider SNRIs that treat both conditions",
+            "Modify CBT to address both disorders simultaneously",
+            "Monitor for increased suicide risk with mixed depression/anxiety"
+        ])
+
+    # Bipolar + Anxiety
+    if bipolar_pred != "False" and anxiety_pred != "False":
+        combo_special.extend([
+            "Stabilize mood first before aggressively treating anxiety",
+            "Avoid benzodiazepines if possible (risk of misuse, worsening depression)",
+            "Consider quetiapine or lurasidone which may help both",
+            "Address anxiety in context of mood stability"
+        ])
+
+    # Bipolar + Depression
+    if bipolar_pred != "False" and depression_pred != "False":
+        combo_special.extend([
+            "Differentiate between unipolar and bipolar depression in treatment approach",
+            "Caution with antidepressants - use only with mood stabilizer",
+            "Consider lamotrigine for bipolar depression",
+            "Monitor closely for switching to hypomania/mania"
+        ])
+
+    # All three conditions
+    if (depression_pred != "False" and bipolar_pred != "False"
+        and anxiety_pred != "False"):
+        combo_special.extend([
+            "Prioritize mood stabilization as foundation",
+            "Sequential treatment approach - bipolar stability first, then depression, then anxiety",
+            "Consider comprehensive DBT approach for emotion regulation",
+            "Multidisciplinary team management essential"
+        ])
+
+    add_unique("Special_Considerations", combo_special)
+
+    # ========================
+    # THERAPEUTIC APPROACHES
+    # ========================
+    therapies = []
+
+    # Common evidence-based therapies
+    therapies.extend([
+        "Cognitive Behavioral Therapy (tailored to primary diagnosis)",
+        "Psychoeducation about condition(s) and treatment",
+        "Mindfulness-based interventions",
+        "Behavioral activation (especially for depression)"
+    ])
+
+    # Condition-specific therapies
+    if bipolar_pred != "False":
+        therapies.extend([
+            "Interpersonal and Social Rhythm Therapy (IPSRT)",
+            "Family-focused therapy for bipolar disorder"
+        ])
+
+    if anxiety_pred != "False":
+        therapies.extend([
+            "Exposure-based therapies",
+            "Acceptance and Commitment Therapy (ACT)"
+        ])
+
+    if depression_pred != "False":
+        therapies.extend([
+            "Behavioral Activation",
+            "Problem-Solving Therapy"
+        ])
+
+    add_unique("Therapeutic_Approaches", therapies)
+
+    # ========================
+    # MONITORING AND FOLLOWUP
+    # ========================
+    monitoring = [
+        "Regular clinical follow-up (frequency depends on severity)",
+        "Standardized symptom tracking (e.g., mood charts, anxiety diaries)",
+        "Routine labs as needed (lithium levels, metabolic monitoring)",
+        "Periodic re-assessment of treatment plan efficacy",
+        "Functional outcome assessment (work, relationships, quality of life)"
+    ]
+
+    if bipolar_pred != "False":
+        monitoring.extend([
+            "Mood episode symptom monitoring",
+            "Early warning sign identification plan"
+        ])
+
+    if depression_pred != "False":
+        monitoring.extend([
+            "Suicide risk reassessment at each contact",
+            "PHQ-9 tracking over time"
+        ])
+
+    if anxiety_pred != "False":
+        monitoring.extend([
+            "Exposure hierarchy progress tracking",
+            "Anxiety diary review"
+        ])
+
+    add_unique("Monitoring_and_Followup", monitoring)
+
+    return treatment_plan
+
+
+def table_hash(texts):
+    """Fingerprint of the plan texts ({triple: text}): SHA-256 over every triple and its report."""
+    h = hashlib.sha256()
+    for triple in sorted(texts):
+        h.update('|'.join(triple).encode('utf-8') + b'\n' + texts[triple].encode('utf-8') + b'\0')
+    return h.hexdigest()[:16]
+
+
+PLAN_TABLE = MappingProxyType({triple: TreatmentReport.for_predictions(*triple)
+                               for triple in itertools.product(DEPRESSION_TYPES, BIPOLAR_TYPES, ANXIETY_TYPES)})
+
+
+def _outline(report):
+    return [(section.title, section.style, section.items) for section in report.sections]
+
+
+def verify():
+    texts = {triple: report.text for triple, report in PLAN_TABLE.items()}
+    start = time.perf_counter()
+    for triple in PLAN_TABLE:
+        TreatmentReport.for_predictions(*triple).text
+    render_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    for triple in PLAN_TABLE:
+        recommended_path(*triple)
+    lookup_seconds = time.perf_counter() - start
+
+    # Reports stored under an older plan version are shown by parsing their text back into sections
+    unparsed = [triple for triple in PLAN_TABLE
+                if _outline(TreatmentReport.from_text(texts[triple])) != _outline(PLAN_TABLE[triple])]
+    for triple in unparsed[:10]:
+        print(f"TEXT DOES NOT PARSE BACK {plan_key(*triple)}")
+    print(f"{len(PLAN_TABLE)} plans checked, {len(unparsed)} do not parse back")
+
+    expected = PLAN_HASHES.get(PLAN_VERSION)
+    hash_ok = table_hash(texts) == expected
+    if not hash_ok:
+        print(f"Plan table hash {table_hash(texts)} does not match {expected} pinned for version {PLAN_VERSION}: "
+              f"if the wording changed, bump PLAN_VERSION and pin the new hash in PLAN_HASHES")
+    else:
+        print(f"Plan table hash {expected} (version {PLAN_VERSION})")
+    print(f"  generator  {render_seconds / len(PLAN_TABLE) * 1e6:>8.1f} us/plan")
+    print(f"  table      {lookup_seconds / len(PLAN_TABLE) * 1e6:>8.1f} us/plan")
+    return not unparsed and hash_ok
+
+
+if __name__ == '__main__':
+    if sys.argv[1:] != ['verify']:
+        print(__doc__)
+        sys.exit(2)
+    sys.exit(0 if verify() else 1)